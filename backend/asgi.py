@@ -2,6 +2,10 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django (async views, such as the summarizer's SSE stream, wait
+on the event loop instead of a thread); WebSocket connections to /ws/proctor/
+go to the proctoring ingest channel. Serve with an ASGI server, e.g.
+``gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +17,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after setup so app models are ready
+from proctoring.ws import proctor_socket  # noqa: E402
+
+websocket_routes = {
+    '/ws/proctor/': proctor_socket,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        handler = websocket_routes.get(scope['path'])
+        if handler is None:
+            await receive()  # websocket.connect
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        return await handler(scope, receive, send)
+    return await django_application(scope, receive, send)
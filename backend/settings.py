@@ -1,5 +1,6 @@
 # settings.py (top)
 import dj_database_url
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -8,10 +9,102 @@ load_dotenv()  # loads .env into environment
 GOOGLE_GENERATIVE_API_KEY = os.getenv("GOOGLE_GENERATIVE_API_KEY")
 SUMMARIZER_SAVE_TO_DB = os.getenv("SUMMARIZER_SAVE_TO_DB", "false").lower() == "true"
 RATE_LIMIT_PER_HOUR = int(os.getenv("RATE_LIMIT_PER_HOUR", "5"))
+# Identical summary requests are answered from the cache (then from saved rows) for this long.
+SUMMARIZER_CACHE_SECONDS = int(os.getenv("SUMMARIZER_CACHE_SECONDS", str(24 * 3600)))
+
+# LLM client (summarizer/llm.py): overall deadline per summary, when to hedge to the fallback model
+# (the primary's recent latency percentile, with a floor and a default until there are samples),
+# and the per-model circuit breaker (open after N consecutive failures, trial call after the cooldown).
+SUMMARIZER_LLM_BASE_URL = os.getenv("SUMMARIZER_LLM_BASE_URL", "https://generativelanguage.googleapis.com")
+SUMMARIZER_LLM_TIMEOUT = float(os.getenv("SUMMARIZER_LLM_TIMEOUT", "20"))
+SUMMARIZER_LLM_POOL_SIZE = int(os.getenv("SUMMARIZER_LLM_POOL_SIZE", "10"))
+SUMMARIZER_HEDGE_PERCENTILE = float(os.getenv("SUMMARIZER_HEDGE_PERCENTILE", "95"))
+SUMMARIZER_HEDGE_MIN_SECONDS = float(os.getenv("SUMMARIZER_HEDGE_MIN_SECONDS", "0.5"))
+SUMMARIZER_HEDGE_DEFAULT_SECONDS = float(os.getenv("SUMMARIZER_HEDGE_DEFAULT_SECONDS", "5"))
+SUMMARIZER_BREAKER_FAILURES = int(os.getenv("SUMMARIZER_BREAKER_FAILURES", "5"))
+SUMMARIZER_BREAKER_COOLDOWN_SECONDS = float(os.getenv("SUMMARIZER_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Long documents (summarizer/mapreduce.py): text over this many (estimated) tokens is summarized
+# in chunks of at most that size, by up to SUMMARIZER_MAP_WORKERS concurrent calls, each chunk
+# to about SUMMARIZER_PARTIAL_TOKENS tokens before the partial summaries are combined.
+SUMMARIZER_CHUNK_TOKENS = int(os.getenv("SUMMARIZER_CHUNK_TOKENS", "3000"))
+SUMMARIZER_MAP_WORKERS = int(os.getenv("SUMMARIZER_MAP_WORKERS", "4"))
+SUMMARIZER_PARTIAL_TOKENS = int(os.getenv("SUMMARIZER_PARTIAL_TOKENS", "200"))
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Proctoring ingest: "sync" writes anomalies in the request, "buffered" only appends
+# them to a write-behind buffer drained by `manage.py drain_proctor_buffer`.
+PROCTOR_INGEST_MODE = os.getenv("PROCTOR_INGEST_MODE", "sync").lower()
+PROCTOR_BUFFER_REDIS_URL = os.getenv("PROCTOR_BUFFER_REDIS_URL")  # unset -> on-disk log
+PROCTOR_BUFFER_STREAM_KEY = os.getenv("PROCTOR_BUFFER_STREAM_KEY", "proctoring:anomalies")
+PROCTOR_BUFFER_DIR = os.getenv("PROCTOR_BUFFER_DIR", str(BASE_DIR / "var" / "proctor_buffer"))
+PROCTOR_BUFFER_MAX_PENDING = int(os.getenv("PROCTOR_BUFFER_MAX_PENDING", "200000"))  # redis entries
+PROCTOR_BUFFER_MAX_BYTES = int(os.getenv("PROCTOR_BUFFER_MAX_BYTES", str(256 * 1024 * 1024)))  # disk log
+# fsync every disk-log append; "false" trades host-crash durability of acked records for latency
+PROCTOR_BUFFER_FSYNC = os.getenv("PROCTOR_BUFFER_FSYNC", "true").lower() in ("true", "1")
+PROCTOR_BUFFER_RETRY_AFTER = int(os.getenv("PROCTOR_BUFFER_RETRY_AFTER", "5"))
+PROCTOR_FLUSH_BATCH_SIZE = int(os.getenv("PROCTOR_FLUSH_BATCH_SIZE", "5000"))
+PROCTOR_FLUSH_INTERVAL = float(os.getenv("PROCTOR_FLUSH_INTERVAL", "1.0"))
+
+# Rollup compaction / retention (`manage.py compact_proctor_anomalies`); 0 days = keep forever.
+PROCTOR_RAW_RETENTION_DAYS = int(os.getenv("PROCTOR_RAW_RETENTION_DAYS", "30"))
+PROCTOR_MINUTE_ROLLUP_RETENTION_DAYS = int(os.getenv("PROCTOR_MINUTE_ROLLUP_RETENTION_DAYS", "14"))
+PROCTOR_COMPACTION_CHUNK_SIZE = int(os.getenv("PROCTOR_COMPACTION_CHUNK_SIZE", "10000"))
+PROCTOR_COMPACTION_SETTLE_SECONDS = int(os.getenv("PROCTOR_COMPACTION_SETTLE_SECONDS", "60"))
+
+# Running suspicion score per (user, exam_id): weight per event type, halved every half-life.
+PROCTOR_RISK_WEIGHTS = json.loads(os.getenv(
+    "PROCTOR_RISK_WEIGHTS",
+    '{"no_face": 1.0, "multiple_faces": 3.0, "phone_detected": 5.0, "looking_away": 0.5}',
+))
+PROCTOR_RISK_HALF_LIFE_SECONDS = float(os.getenv("PROCTOR_RISK_HALF_LIFE_SECONDS", "600"))
+
+# Retried batches carrying the same batch_id within this window are answered from the stored result.
+PROCTOR_DEDUPE_WINDOW_SECONDS = int(os.getenv("PROCTOR_DEDUPE_WINDOW_SECONDS", "900"))
+
+# Reviewer dashboards: per-exam summary cache lifetime and number of latest events shown.
+PROCTOR_SUMMARY_CACHE_SECONDS = int(os.getenv("PROCTOR_SUMMARY_CACHE_SECONDS", "5"))
+PROCTOR_SUMMARY_LATEST_EVENTS = int(os.getenv("PROCTOR_SUMMARY_LATEST_EVENTS", "20"))
+
+# Question bank cache: how long a process trusts its cached bank version before re-reading it
+# from the database, i.e. how stale the bank can be on workers that do not share the cache.
+EXAMS_BANK_VERSION_SECONDS = int(os.getenv("EXAMS_BANK_VERSION_SECONDS", "5"))
+
+# Answer autosave: saves are coalesced per session in the cache and written once this many
+# answers are pending or the oldest pending one is this old (0 seconds = write every save through).
+# Pending answers only live in the cache, so coalescing is off unless it is shared (CACHE_URL):
+# a per-process cache loses them on eviction, restart, or a submit handled by another worker.
+EXAMS_AUTOSAVE_FLUSH_ANSWERS = int(os.getenv("EXAMS_AUTOSAVE_FLUSH_ANSWERS", "20"))
+EXAMS_AUTOSAVE_FLUSH_SECONDS = int(os.getenv("EXAMS_AUTOSAVE_FLUSH_SECONDS", "15" if os.getenv("CACHE_URL") else "0"))
+EXAMS_AUTOSAVE_PENDING_TTL = int(os.getenv("EXAMS_AUTOSAVE_PENDING_TTL", str(6 * 3600)))
+
+# Re-grading (`manage.py regrade_answers`): answers updated per transaction.
+EXAMS_REGRADE_CHUNK_SIZE = int(os.getenv("EXAMS_REGRADE_CHUNK_SIZE", "5000"))
+
+# Item analysis (`manage.py analyze_items`): finished sessions folded per chunk, and how long
+# a finished session waits before it is folded (late commits would otherwise be skipped).
+EXAMS_ANALYSIS_CHUNK_SESSIONS = int(os.getenv("EXAMS_ANALYSIS_CHUNK_SESSIONS", "2000"))
+EXAMS_ANALYSIS_SETTLE_SECONDS = int(os.getenv("EXAMS_ANALYSIS_SETTLE_SECONDS", "60"))
+
+# Session lifecycle (`manage.py close_expired_sessions`): time limit for exams without their own,
+# how long an open session may go without a heartbeat, and the late-submit grace after the limit.
+EXAMS_DEFAULT_TIME_LIMIT_MINUTES = int(os.getenv("EXAMS_DEFAULT_TIME_LIMIT_MINUTES", "120"))
+EXAMS_HEARTBEAT_TIMEOUT_SECONDS = int(os.getenv("EXAMS_HEARTBEAT_TIMEOUT_SECONDS", "600"))
+EXAMS_SUBMIT_GRACE_SECONDS = int(os.getenv("EXAMS_SUBMIT_GRACE_SECONDS", "60"))
+EXAMS_CLOSE_CHUNK_SIZE = int(os.getenv("EXAMS_CLOSE_CHUNK_SIZE", "1000"))
+EXAMS_CLOSE_INTERVAL = float(os.getenv("EXAMS_CLOSE_INTERVAL", "30"))
+
+# Leaderboards: how long an exam's sorted score array is reused for rank lookups before it is
+# rebuilt from the database (standings lag new submissions by up to this long).
+EXAMS_LEADERBOARD_SECONDS = int(os.getenv("EXAMS_LEADERBOARD_SECONDS", "10"))
+
+# Question import (`manage.py import_questions`, POST /api/exams/questions/import/): rows per
+# bulk_create transaction, and how many row errors a report lists in full.
+EXAMS_IMPORT_BATCH_SIZE = int(os.getenv("EXAMS_IMPORT_BATCH_SIZE", "1000"))
+EXAMS_IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("EXAMS_IMPORT_MAX_REPORTED_ERRORS", "100"))
+
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "fallback-secret")
 DEBUG = os.getenv("DJANGO_DEBUG", "False").lower() in ("true","1")
 
@@ -49,6 +142,11 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
 ]
 
+# Load testing only: report per-request DB query counts in an X-DB-Query-Count header.
+PROCTOR_QUERY_COUNT_HEADER = os.getenv("PROCTOR_QUERY_COUNT_HEADER", "False").lower() in ("true", "1")
+if PROCTOR_QUERY_COUNT_HEADER:
+    MIDDLEWARE.append("proctoring.middleware.QueryCountHeaderMiddleware")
+
 CORS_ALLOW_ALL_ORIGINS = True
 
 CSRF_TRUSTED_ORIGINS = [
@@ -75,9 +173,47 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Database connections: by default each worker keeps its connection for DB_CONN_MAX_AGE seconds
+# (checked before reuse) instead of connecting per request. DB_POOL=true switches PostgreSQL to
+# psycopg 3's pool, DB_POOL_MAX_SIZE connections per process (needs psycopg[pool] instead of
+# psycopg2; persistent connections are then off, and it is the option to use under ASGI).
+# Set DB_DISABLE_SERVER_SIDE_CURSORS behind PgBouncer in transaction mode.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DB_CONN_HEALTH_CHECKS = os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() in ("true", "1")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_POOL = os.getenv("DB_POOL", "False").lower() in ("true", "1")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # seconds a request waits for a free connection
+DB_DISABLE_SERVER_SIDE_CURSORS = os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS", "False").lower() in ("true", "1")
+
 DATABASES = {
-    'default': dj_database_url.parse(os.getenv("DATABASE_URL"))
+    'default': dj_database_url.parse(
+        os.getenv("DATABASE_URL"),
+        conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS and not DB_POOL,
+        disable_server_side_cursors=DB_DISABLE_SERVER_SIDE_CURSORS,
+    )
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default'].setdefault('OPTIONS', {})['connect_timeout'] = DB_CONNECT_TIMEOUT
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+
+# Shared cache for multi-worker deployments (autosave coalescing and batch dedupe rely on it);
+# unset -> per-process local memory cache.
+CACHE_URL = os.getenv("CACHE_URL")
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -1,6 +1,30 @@
 from django.contrib import admin
-from .models import Question, ExamSession, Answer
+from .models import Question, Exam, ExamSession, Answer, RegradeJob, ItemAnalysis
 
 admin.site.register(Question)
-admin.site.register(ExamSession)
 admin.site.register(Answer)
+
+
+@admin.register(Exam)
+class ExamAdmin(admin.ModelAdmin):
+    list_display = ('title', 'questions_per_session', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    filter_horizontal = ('questions',)
+
+
+@admin.register(ExamSession)
+class ExamSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'exam', 'started_at', 'ended_at', 'score', 'total')
+    list_filter = ('exam',)
+
+
+@admin.register(RegradeJob)
+class RegradeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'last_answer_id', 'rows_scanned', 'rows_changed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+
+
+@admin.register(ItemAnalysis)
+class ItemAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('exam', 'sessions', 'last_ended_at', 'computed_at')
+    readonly_fields = ('state', 'results')
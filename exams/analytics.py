@@ -0,0 +1,156 @@
+# exams/analytics.py
+"""
+Vectorized item analysis per exam: difficulty (share correct), corrected
+point-biserial discrimination (item vs. rest-of-test score) and option
+frequencies for every question.
+
+Finished sessions are streamed in chunks of whole sessions as
+(session, question, selected_option, is_correct) arrays. Each chunk is
+reduced with np.bincount into additive per-question sums (responses,
+correct, rest-score sums and squares, option counts) that are stored on
+ItemAnalysis, so a later run only folds in sessions finished since the
+(ended_at, id) watermark. Sessions younger than EXAMS_ANALYSIS_SETTLE_SECONDS
+wait for the next run. A re-grade finished after the last run invalidates
+the sums and forces a full rebuild.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Answer, ExamSession, ItemAnalysis, Question, RegradeJob
+
+OPTIONS = ("A", "B", "C", "D")
+SUMS = ("n", "correct", "rest", "rest_sq", "rest_correct")
+
+
+def empty_state():
+    return {"question_ids": [], **{name: [] for name in SUMS}, "options": []}
+
+
+def _state_arrays(state):
+    arrays = {name: np.asarray(state[name], dtype=np.float64) for name in SUMS}
+    arrays["options"] = np.asarray(state["options"], dtype=np.float64).reshape(-1, len(OPTIONS))
+    return arrays
+
+
+def _grow(arrays, size):
+    for name in SUMS:
+        arrays[name] = np.concatenate([arrays[name], np.zeros(size - len(arrays[name]))])
+    arrays["options"] = np.vstack([arrays["options"], np.zeros((size - len(arrays["options"]), len(OPTIONS)))])
+
+
+def fold_chunk(state, arrays, session_ids, question_ids, selected, correct):
+    """Add one chunk of answer tuples (NumPy arrays, whole sessions only) to the running sums."""
+    # index questions by first appearance; new ids are appended to the state
+    known = state["question_ids"]
+    new = np.setdiff1d(np.unique(question_ids), np.asarray(known, dtype=np.int64))
+    if len(new):
+        known.extend(int(q) for q in new)
+        _grow(arrays, len(known))
+    order = np.argsort(known)
+    sorted_known = np.asarray(known, dtype=np.int64)[order]
+    q_idx = order[np.searchsorted(sorted_known, question_ids)]
+
+    _, s_idx = np.unique(session_ids, return_inverse=True)
+    x = correct.astype(np.float64)
+    rest = np.bincount(s_idx, weights=x)[s_idx] - x  # session score without this item
+    size = len(known)
+
+    arrays["n"] += np.bincount(q_idx, minlength=size)
+    arrays["correct"] += np.bincount(q_idx, weights=x, minlength=size)
+    arrays["rest"] += np.bincount(q_idx, weights=rest, minlength=size)
+    arrays["rest_sq"] += np.bincount(q_idx, weights=rest * rest, minlength=size)
+    arrays["rest_correct"] += np.bincount(q_idx, weights=rest * x, minlength=size)
+    for col, option in enumerate(OPTIONS):
+        hits = (selected == option).astype(np.float64)
+        arrays["options"][:, col] += np.bincount(q_idx, weights=hits, minlength=size)
+
+
+def item_statistics(state):
+    """Per-question results from the running sums, all questions at once."""
+    a = _state_arrays(state)
+    n, c = a["n"], a["correct"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = c / n
+        mean_rest = a["rest"] / n
+        sd_rest = np.sqrt(np.maximum(a["rest_sq"] / n - mean_rest ** 2, 0))
+        mean_correct = a["rest_correct"] / c
+        mean_wrong = (a["rest"] - a["rest_correct"]) / (n - c)
+        r_pb = (mean_correct - mean_wrong) / sd_rest * np.sqrt(p * (1 - p))
+        shares = a["options"] / n[:, None]
+
+    keys = dict(Question.objects.filter(id__in=state["question_ids"]).values_list("id", "correct_option"))
+    results = []
+    for i, question_id in enumerate(state["question_ids"]):
+        results.append({
+            "question": question_id,
+            "correct_option": keys.get(question_id),
+            "responses": int(n[i]),
+            "difficulty": _clean(p[i]),
+            "discrimination": _clean(r_pb[i]),
+            "options": {
+                option: {"count": int(a["options"][i, col]), "share": _clean(shares[i, col])}
+                for col, option in enumerate(OPTIONS)
+            },
+        })
+    return sorted(results, key=lambda r: r["question"])
+
+
+def _clean(value):
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+def analyze_exam(exam, full=False, chunk_sessions=None):
+    """
+    Fold newly finished sessions of `exam` into its ItemAnalysis (all of them
+    when `full`) and refresh the stored results. Returns the ItemAnalysis.
+    """
+    chunk_sessions = chunk_sessions or settings.EXAMS_ANALYSIS_CHUNK_SESSIONS
+    analysis, _ = ItemAnalysis.objects.get_or_create(exam=exam, defaults={"state": empty_state()})
+    if not full and analysis.computed_at and RegradeJob.objects.filter(
+        status=RegradeJob.DONE, finished_at__gt=analysis.computed_at,
+    ).exists():
+        full = True  # grades changed under the stored sums
+    if full:
+        analysis.state, analysis.sessions = empty_state(), 0
+        analysis.last_ended_at, analysis.last_session_id = None, 0
+
+    state = analysis.state
+    arrays = _state_arrays(state)
+    settled = timezone.now() - timedelta(seconds=settings.EXAMS_ANALYSIS_SETTLE_SECONDS)
+    while True:
+        sessions = ExamSession.objects.filter(exam=exam, ended_at__isnull=False, ended_at__lte=settled)
+        if analysis.last_ended_at:
+            sessions = sessions.filter(
+                Q(ended_at__gt=analysis.last_ended_at)
+                | Q(ended_at=analysis.last_ended_at, id__gt=analysis.last_session_id)
+            )
+        batch = list(sessions.order_by("ended_at", "id").values_list("id", "ended_at")[:chunk_sessions])
+        if not batch:
+            break
+
+        rows = list(Answer.objects.filter(session_id__in=[s for s, _ in batch])
+                    .values_list("session_id", "question_id", "selected_option", "is_correct"))
+        if rows:
+            sids, qids, selected, correct = zip(*rows)
+            fold_chunk(
+                state, arrays,
+                np.fromiter(sids, dtype=np.int64, count=len(rows)),
+                np.fromiter(qids, dtype=np.int64, count=len(rows)),
+                np.array(selected, dtype="<U1"),
+                np.fromiter(correct, dtype=bool, count=len(rows)),
+            )
+        analysis.sessions += len(batch)
+        analysis.last_session_id, analysis.last_ended_at = batch[-1]
+
+    for name in SUMS:
+        state[name] = arrays[name].tolist()
+    state["options"] = arrays["options"].tolist()
+    analysis.results = item_statistics(state)
+    analysis.computed_at = timezone.now()
+    # sums and watermark are saved together, so a racing run can only make the next one repeat work
+    analysis.save()
+    return analysis
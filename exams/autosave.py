@@ -0,0 +1,109 @@
+# exams/autosave.py
+"""
+Write coalescing for answer autosave.
+
+Each PATCH merges its answers into a per-session entry in the cache
+(question id -> selected option, later saves win). The entry is written to
+the database in one upsert once EXAMS_AUTOSAVE_FLUSH_ANSWERS answers are
+pending or the oldest has waited EXAMS_AUTOSAVE_FLUSH_SECONDS, and whatever
+is still pending is folded into the final submission. Answer writes are
+spread over the exam instead of piling up at the deadline.
+
+Entries are updated under a short per-session cache lock. Pending answers
+exist only in the cache, so coalescing needs a shared one (CACHE_URL): with
+the per-process default, every save is written through
+(EXAMS_AUTOSAVE_FLUSH_SECONDS defaults to 0). A pending entry lives for
+EXAMS_AUTOSAVE_PENDING_TTL, which must outlast the session.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_SECONDS = 10
+LOCK_WAIT_SECONDS = 1.0
+
+
+class AutosaveBusy(Exception):
+    """Another save for the same session holds the lock; the client should retry."""
+
+
+def pending_key(session_id):
+    return f"exams:autosave:{session_id}"
+
+
+@contextmanager
+def _session_lock(session_id):
+    key = f"{pending_key(session_id)}:lock"
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while not cache.add(key, True, timeout=LOCK_SECONDS):
+        if time.monotonic() >= deadline:
+            raise AutosaveBusy(session_id)
+        time.sleep(0.01)
+    try:
+        yield
+    finally:
+        cache.delete(key)
+
+
+@contextmanager
+def pending_answers(session_id):
+    """
+    Hold the session lock and yield its pending {question_id: option}; the
+    entry is dropped only if the block completes, so a failed write keeps it.
+    """
+    with _session_lock(session_id):
+        entry = cache.get(pending_key(session_id))
+        yield dict(entry["answers"]) if entry else {}
+        cache.delete(pending_key(session_id))
+
+
+def save_answers(session_id, selections):
+    """
+    Merge {question_id: option} into the session's pending answers, writing
+    them through when a flush threshold is reached.
+    Returns {"pending": n, "flushed": bool}.
+    """
+    from .grading import upsert_answers  # grading imports this module
+
+    if settings.EXAMS_AUTOSAVE_FLUSH_SECONDS <= 0:
+        upsert_answers(session_id, selections)
+        return {"pending": 0, "flushed": True}
+
+    with _session_lock(session_id):
+        key = pending_key(session_id)
+        entry = cache.get(key) or {"answers": {}, "since": time.time()}
+        entry["answers"].update(selections)
+        if (len(entry["answers"]) >= settings.EXAMS_AUTOSAVE_FLUSH_ANSWERS
+                or time.time() - entry["since"] >= settings.EXAMS_AUTOSAVE_FLUSH_SECONDS):
+            upsert_answers(session_id, entry["answers"])
+            cache.delete(key)
+            return {"pending": 0, "flushed": True}
+        cache.set(key, entry, timeout=settings.EXAMS_AUTOSAVE_PENDING_TTL)
+        return {"pending": len(entry["answers"]), "flushed": False}
+
+
+def flush_session(session_id):
+    """Write a session's pending answers now (e.g. when closing it server-side). Returns rows written."""
+    from .grading import upsert_answers
+
+    with pending_answers(session_id) as pending:
+        return len(upsert_answers(session_id, pending)) if pending else 0
+
+
+def flush_sessions(session_ids):
+    """
+    flush_session for many sessions; only those with pending answers cost
+    more than the one get_many. Returns the ids skipped because a save for
+    them was in progress.
+    """
+    pending = cache.get_many([pending_key(sid) for sid in session_ids])
+    busy = set()
+    for sid in session_ids:
+        if pending_key(sid) in pending:
+            try:
+                flush_session(sid)
+            except AutosaveBusy:
+                busy.add(sid)
+    return busy
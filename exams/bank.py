@@ -0,0 +1,119 @@
+# exams/bank.py
+"""
+Cached, versioned question bank.
+
+The serialized question list is rendered once per bank version and kept as
+pre-encoded JSON bytes with a strong ETag (a hash of those bytes). The
+version is a counter row in the database (QuestionBankVersion) that
+Question save/delete signals increment after commit (see exams/signals.py),
+so a stale payload is never served under the new version. Code that changes
+questions without signals (queryset.update, bulk_create) must call
+bump_bank_version() itself.
+
+Each exam's pool of question ids is cached the same way, keyed by exam and
+bank version, and dropped when the exam or its question set changes.
+
+The version is cached for EXAMS_BANK_VERSION_SECONDS. A bump clears it, which
+is immediate with a shared cache (CACHE_URL); with per-process caches, other
+workers pick up the new version within that many seconds.
+
+Concurrent misses for the same version are collapsed: one worker takes a
+short build lock and renders, the others wait for its result, so a burst of
+candidates at exam start costs one query per version.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.renderers import JSONRenderer
+
+from .models import Question, QuestionBankVersion
+from .serializers import QuestionSerializer
+
+VERSION_KEY = "exams:bank:version"
+BUILD_LOCK_SECONDS = 10
+BUILD_WAIT_SECONDS = 2.0
+BUILD_POLL_SECONDS = 0.05
+
+# name -> last (version, value) seen by this process, so hits skip fetching it from the cache
+_memo = {}
+
+
+def bump_bank_version():
+    if not QuestionBankVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        QuestionBankVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    cache.delete(VERSION_KEY)
+
+
+def bank_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # the memo never outlives the cached version: a rolled-back or restored database reuses numbers
+        _memo.clear()
+        version = QuestionBankVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+        cache.set(VERSION_KEY, version, timeout=settings.EXAMS_BANK_VERSION_SECONDS)
+    return version
+
+
+def _for_version(name, build):
+    """build() once per bank version; concurrent misses wait for a single builder."""
+    version = bank_version()
+    memo = _memo.get(name)
+    if memo and memo[0] == version:
+        return memo[1]
+
+    key = f"exams:bank:{version}:{name}"
+    value = cache.get(key)
+    if value is None:
+        if cache.add(f"{key}:lock", True, timeout=BUILD_LOCK_SECONDS):
+            try:
+                value = build()
+                cache.set(key, value, timeout=None)
+            finally:
+                cache.delete(f"{key}:lock")
+        else:
+            deadline = time.monotonic() + BUILD_WAIT_SECONDS
+            while value is None and time.monotonic() < deadline:
+                time.sleep(BUILD_POLL_SECONDS)
+                value = cache.get(key)
+            if value is None:
+                value = build()  # builder is slow or died; serve a fresh build uncached
+
+    _memo[name] = (version, value)
+    return value
+
+
+def render_bank():
+    """(etag, body) for the current Question table."""
+    body = JSONRenderer().render(QuestionSerializer(Question.objects.order_by("id"), many=True).data)
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"', body
+
+
+def question_bank():
+    """(etag, body) for the current bank version, rendering it at most once per version."""
+    return _for_version("payload", render_bank)
+
+
+def question_ids():
+    """Ids of every question in the current bank version (for validating answers without a query)."""
+    return _for_version("ids", lambda: frozenset(Question.objects.values_list("id", flat=True)))
+
+
+def _pool_key(exam_id):
+    return f"exams:pool:{exam_id}:{bank_version()}"
+
+
+def exam_pool_ids(exam):
+    """Ids of the questions in the exam's pool; one query per exam and bank version."""
+    key = _pool_key(exam.pk)
+    pool = cache.get(key)
+    if pool is None:
+        pool = list(exam.questions.order_by("id").values_list("id", flat=True))
+        cache.set(key, pool, timeout=None)
+    return pool
+
+
+def invalidate_exam_pool(exam_id):
+    cache.delete(_pool_key(exam_id))
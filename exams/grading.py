@@ -0,0 +1,91 @@
+# exams/grading.py
+"""
+Bulk grading for submitted and autosaved answers.
+
+All referenced questions are loaded with one in_bulk, answers are graded in
+memory and upserted on the (session, question) constraint with one
+statement, so a write costs the same number of queries however many answers
+it holds. bulk_create skips Answer.save(), so is_correct is set here;
+single-row saves (admin edits) still grade themselves in Answer.save().
+"""
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .autosave import pending_answers
+from .bank import question_ids
+from .models import Answer, ExamSession, Question
+
+
+class SessionClosed(Exception):
+    """The session was submitted or closed by the closer in the meantime."""
+
+
+def grade(question, selected_option):
+    return selected_option == question.correct_option
+
+
+def check_questions(selections, session):
+    """
+    Raise ValidationError for question ids that are not in the bank (checked
+    against the cached id set) or not in the session's drawn question set.
+    """
+    missing = sorted(set(selections) - question_ids())
+    if missing:
+        raise ValidationError({'question': [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]})
+    if session.question_ids:
+        foreign = sorted(set(selections) - set(session.question_ids))
+        if foreign:
+            raise ValidationError({'question': [f'Question {pk} is not part of this session.' for pk in foreign]})
+
+
+def upsert_answers(session_id, selections):
+    """
+    selections: {question_id: selected_option}. Inserts or overwrites the
+    session's answers, graded; ids of deleted questions are skipped.
+    Returns the rows written.
+    """
+    questions = Question.objects.in_bulk(list(selections))
+    rows = [
+        Answer(
+            session_id=session_id,
+            question_id=question_id,
+            selected_option=selected_option,
+            is_correct=grade(questions[question_id], selected_option),
+        )
+        for question_id, selected_option in selections.items()
+        if question_id in questions
+    ]
+    if rows:
+        Answer.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['session', 'question'],
+            update_fields=['selected_option', 'is_correct'],
+        )
+    return rows
+
+
+def grade_submission(session, answers):
+    """
+    answers: validated AnswerSubmissionSerializer data. Writes them together
+    with any autosaved answers still pending for the session, closes the
+    session, stores its score and returns {"correct": n, "total": n} over
+    all its answers.
+    Raises ValidationError if any question id does not exist, SessionClosed
+    if the session has already ended (nothing is written then).
+    """
+    submitted = {a['question']: a['selected_option'] for a in answers}
+    check_questions(submitted, session)
+
+    with pending_answers(session.id) as pending, transaction.atomic():
+        upsert_answers(session.id, {**pending, **submitted})
+        result = session.answers.aggregate(
+            correct=Count('id', filter=Q(is_correct=True)), total=Count('id'),
+        )
+        ended_at = timezone.now()
+        # ended_at null guard: a concurrent submit or the closer ended it first; roll the answers back
+        if not ExamSession.objects.filter(id=session.id, ended_at__isnull=True).update(
+                ended_at=ended_at, score=result['correct'], total=result['total']):
+            raise SessionClosed(session.id)
+        session.ended_at, session.score, session.total = ended_at, result['correct'], result['total']
+        return result
@@ -0,0 +1,99 @@
+# exams/leaderboard.py
+"""
+Stored scores and per-exam leaderboards.
+
+A session's score (correct answers) and total (answers) are written to
+ExamSession when it is finalized: by grade_submission, by the closer for
+abandoned sessions, and again by a re-grade that changes its answers.
+Nothing reads the Answer table to rank candidates.
+
+Each exam's scores are cached as one sorted NumPy array for
+EXAMS_LEADERBOARD_SECONDS, so rank and percentile lookups are a binary
+search, O(log n), and the array is rebuilt at most once per that period
+however many candidates submit meanwhile. Submissions do not invalidate it:
+standings lag new scores by up to that long. The closer and re-grades,
+which change many scores at once, drop the exam's array after commit (in
+this process's cache, or every worker's with a shared CACHE_URL). The top of
+the board is read straight from the (exam, -score) partial index.
+"""
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Answer, ExamSession
+
+
+def _count_answers(**filters):
+    counts = (
+        Answer.objects.filter(session=OuterRef('pk'), **filters)
+        .order_by().values('session').annotate(n=Count('id')).values('n')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def score_fields():
+    """score/total as expressions for queryset.update(), so many sessions are scored in one UPDATE."""
+    return {'score': _count_answers(is_correct=True), 'total': _count_answers()}
+
+
+def scores_key(exam_id):
+    return f"exams:leaderboard:{exam_id}:scores"
+
+
+def bump_leaderboards(exam_ids):
+    """Drop the cached scores of these exams once the current transaction commits."""
+    keys = [scores_key(exam_id) for exam_id in set(exam_ids) if exam_id is not None]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def exam_scores(exam_id):
+    """Sorted scores of every scored session of the exam (cached for EXAMS_LEADERBOARD_SECONDS)."""
+    scores = cache.get(scores_key(exam_id))
+    if scores is None:
+        scores = np.sort(np.fromiter(
+            ExamSession.objects.filter(exam_id=exam_id, score__isnull=False).values_list('score', flat=True),
+            dtype=np.int32,
+        ))
+        cache.set(scores_key(exam_id), scores, timeout=settings.EXAMS_LEADERBOARD_SECONDS)
+    return scores
+
+
+def standing(exam_id, score):
+    """
+    {"rank": n, "percentile": x, "candidates": n} for a score on the exam.
+    Rank is competition style (ties share the best rank); percentile is the
+    share of candidates who scored lower.
+    """
+    scores = exam_scores(exam_id)
+    below = int(np.searchsorted(scores, score, side='left'))
+    above = len(scores) - int(np.searchsorted(scores, score, side='right'))
+    return {
+        'rank': above + 1,
+        'percentile': round(100 * below / len(scores), 1) if len(scores) else None,
+        'candidates': len(scores),
+    }
+
+
+def top(exam_id, limit):
+    """The best `limit` sessions of the exam, ranked; earlier finishers first on ties."""
+    rows = (
+        ExamSession.objects.filter(exam_id=exam_id, score__isnull=False)
+        .order_by('-score', 'ended_at', 'id')
+        .values('id', 'user__username', 'score', 'total', 'ended_at')[:limit]
+    )
+    scores = exam_scores(exam_id)
+    return [
+        {
+            'rank': len(scores) - int(np.searchsorted(scores, row['score'], side='right')) + 1,
+            'session': row['id'],
+            'user': row['user__username'],
+            'score': row['score'],
+            'total': row['total'],
+            'ended_at': row['ended_at'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,83 @@
+# exams/lifecycle.py
+"""
+Session lifecycle: time limits, heartbeats and closing abandoned sessions.
+
+Every open session carries expires_at = min(deadline_at, last heartbeat +
+EXAMS_HEARTBEAT_TIMEOUT_SECONDS), maintained by start_exam and each
+heartbeat. Sessions started before time limits existed have no deadline_at:
+no limit is enforced on them, and they expire by heartbeat alone (or at the
+expires_at their migration gave them). A partial index on expires_at over open sessions only lets the
+closer find expired sessions (and callers count open ones) without touching
+finished sessions, however many accumulate. The closer works in chunks:
+pending autosaved answers are written, then one UPDATE closes the chunk and
+stores the sessions' scores. ended_at is the time of closing, never earlier,
+so a closer that fell behind cannot end sessions behind the item analysis
+watermark; expires_at keeps the time the session was abandoned.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .autosave import flush_sessions
+from .leaderboard import bump_leaderboards, score_fields
+from .models import ExamSession
+
+
+def time_limit(exam):
+    minutes = (exam.time_limit_minutes if exam else None) or settings.EXAMS_DEFAULT_TIME_LIMIT_MINUTES
+    return timedelta(minutes=minutes)
+
+
+def lifecycle_fields(exam, now=None):
+    """deadline_at / last_heartbeat_at / expires_at for a session starting now."""
+    now = now or timezone.now()
+    deadline = now + time_limit(exam)
+    return {
+        'deadline_at': deadline,
+        'last_heartbeat_at': now,
+        'expires_at': min(deadline, now + timedelta(seconds=settings.EXAMS_HEARTBEAT_TIMEOUT_SECONDS)),
+    }
+
+
+def heartbeat(session_id, user, now=None):
+    """Push an open session's expiry forward (one UPDATE). False if it is not open or not the user's."""
+    now = now or timezone.now()
+    alive_until = Value(now + timedelta(seconds=settings.EXAMS_HEARTBEAT_TIMEOUT_SECONDS))
+    return bool(ExamSession.objects.filter(id=session_id, user=user, ended_at__isnull=True).update(
+        last_heartbeat_at=now,
+        # LEAST with a null deadline is null on SQLite, so a session without one uses the heartbeat alone
+        expires_at=Least(Coalesce(F('deadline_at'), alive_until), alive_until),
+    ))
+
+
+def open_sessions(exam=None):
+    qs = ExamSession.objects.filter(ended_at__isnull=True)
+    return qs.filter(exam=exam) if exam is not None else qs
+
+
+def close_expired_chunk(chunk_size, now=None):
+    """Close up to `chunk_size` expired open sessions. Returns how many were closed."""
+    now = now or timezone.now()
+    rows = list(
+        open_sessions().filter(expires_at__lte=now).order_by('expires_at').values_list('id', 'exam_id')[:chunk_size]
+    )
+    if not rows:
+        return 0
+    busy = flush_sessions([sid for sid, _ in rows])  # a session mid-save is evidently alive; the next pass sees it again
+    # ended_at null guard: a submit that raced the closer keeps its own ended_at and score
+    closed = ExamSession.objects.filter(
+        id__in=[sid for sid, _ in rows if sid not in busy], ended_at__isnull=True,
+    ).update(ended_at=now, **score_fields())
+    bump_leaderboards(exam_id for _, exam_id in rows)
+    return closed
+
+
+def submission_too_late(session, now=None):
+    """True once the time limit (plus EXAMS_SUBMIT_GRACE_SECONDS) has passed."""
+    if session.deadline_at is None:
+        return False
+    grace = timedelta(seconds=settings.EXAMS_SUBMIT_GRACE_SECONDS)
+    return (now or timezone.now()) > session.deadline_at + grace
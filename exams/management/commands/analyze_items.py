@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.analytics import analyze_exam
+from exams.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Compute item statistics (difficulty, discrimination, option frequencies) per exam."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--exam", type=int, action="append", help="Exam id (repeatable; default: all exams).")
+        parser.add_argument("--full", action="store_true", help="Rebuild from scratch instead of folding in new sessions.")
+        parser.add_argument("--chunk-sessions", type=int, default=settings.EXAMS_ANALYSIS_CHUNK_SESSIONS,
+                            help="Finished sessions loaded per chunk.")
+
+    def handle(self, *args, **opts):
+        exams = Exam.objects.order_by("id")
+        if opts["exam"]:
+            exams = exams.filter(id__in=opts["exam"])
+            if len(exams) != len(set(opts["exam"])):
+                raise CommandError("unknown exam id")
+
+        for exam in exams:
+            before = getattr(getattr(exam, "item_analysis", None), "sessions", 0)
+            start = time.perf_counter()
+            analysis = analyze_exam(exam, full=opts["full"], chunk_sessions=opts["chunk_sessions"])
+            folded = analysis.sessions if opts["full"] else analysis.sessions - before
+            self.stdout.write(
+                f"exam {exam.id}: folded {folded} sessions ({analysis.sessions} total, "
+                f"{len(analysis.results)} questions) in {time.perf_counter() - start:.2f}s"
+            )
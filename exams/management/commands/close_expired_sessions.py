@@ -0,0 +1,35 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from exams.lifecycle import close_expired_chunk
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Close exam sessions past their time limit or heartbeat timeout, in chunked bulk updates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.EXAMS_CLOSE_CHUNK_SIZE,
+                            help="Sessions closed per UPDATE.")
+        parser.add_argument("--interval", type=float, default=settings.EXAMS_CLOSE_INTERVAL,
+                            help="Seconds to sleep between passes.")
+        parser.add_argument("--once", action="store_true", help="Run one pass and exit instead of looping.")
+
+    def handle(self, *args, **opts):
+        while True:
+            closed = 0
+            while True:
+                n = close_expired_chunk(opts["chunk_size"])
+                closed += n
+                if n < opts["chunk_size"]:
+                    break
+            logger.info("closed %s expired exam sessions", closed)
+            if opts["verbosity"] > 1 or opts["once"]:
+                self.stdout.write(f"closed {closed} expired sessions")
+            if opts["once"]:
+                return
+            time.sleep(opts["interval"])
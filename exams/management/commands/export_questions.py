@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from exams.transfer import FORMATS, export_lines, guess_format
+
+
+class Command(BaseCommand):
+    help = "Stream the question bank to a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="Output file (default: stdout).")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension (csv otherwise).")
+
+    def handle(self, *args, **opts):
+        fmt = opts["format"] or guess_format(opts["path"])
+        if opts["path"] == "-":
+            for chunk in export_lines(fmt):
+                self.stdout.write(chunk.decode(), ending="")
+            return
+        with open(opts["path"], "wb") as out:
+            for chunk in export_lines(fmt):
+                out.write(chunk)
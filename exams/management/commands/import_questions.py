@@ -0,0 +1,46 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.transfer import FORMATS, ImportFormatError, guess_format, import_questions
+
+
+class Command(BaseCommand):
+    help = "Bulk-import questions from a CSV or JSONL file, validating row by row."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import ('-' for stdin).")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension (csv otherwise).")
+        parser.add_argument("--batch-size", type=int, default=settings.EXAMS_IMPORT_BATCH_SIZE,
+                            help="Questions inserted per transaction.")
+        parser.add_argument("--dry-run", action="store_true", help="Validate only; write nothing.")
+
+    def handle(self, *args, **opts):
+        self.verbosity = opts["verbosity"]
+        fmt = opts["format"] or guess_format(opts["path"])
+        started = time.monotonic()
+        try:
+            if opts["path"] == "-":
+                report = import_questions(sys.stdin, fmt, opts["batch_size"], opts["dry_run"], self.progress)
+            else:
+                with open(opts["path"], encoding="utf-8-sig", newline="") as stream:
+                    report = import_questions(stream, fmt, opts["batch_size"], opts["dry_run"], self.progress)
+        except (OSError, ImportFormatError) as exc:
+            raise CommandError(str(exc))
+        elapsed = time.monotonic() - started
+
+        for error in report["errors"]:
+            details = "; ".join(f"{field}: {message}" for field, message in error["errors"].items())
+            self.stderr.write(f"line {error['line']}: {details}")
+        if report["error_count"] > len(report["errors"]):
+            self.stderr.write(f"... {report['error_count'] - len(report['errors'])} more errors")
+        self.stdout.write(
+            f"{'validated' if opts['dry_run'] else 'imported'} {report['created']} of {report['rows']} rows "
+            f"({report['error_count']} errors) in {elapsed:.1f}s, rows/s={report['rows'] / elapsed:.0f}"
+        )
+
+    def progress(self, report):
+        if self.verbosity > 1:
+            self.stdout.write(f"  {report['created']} written, {report['error_count']} errors")
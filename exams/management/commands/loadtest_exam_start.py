@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from proctoring.management.commands.loadtest_proctor_ingest import git_revision, summarize
+
+LOGIN = "/api/accounts/login/"
+START = "/api/exams/start/"
+SESSION_QUESTIONS = "/api/exams/{}/questions/"
+
+# PostgreSQL only: client connections to this database other than the monitor's own, and
+# the database's lifetime session count (PostgreSQL 14+), whose delta is connections opened
+CONNECTIONS_SQL = (
+    "SELECT count(*) FROM pg_stat_activity "
+    "WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+)
+SESSIONS_SQL = "SELECT sessions FROM pg_stat_database WHERE datname = current_database()"
+
+
+class ConnectionMonitor(threading.Thread):
+    """Samples the server's open connections to the database while the burst runs."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.samples = []
+        self.sessions = []
+
+    def run(self):
+        try:
+            self.sessions.append(self.query(SESSIONS_SQL))
+            while not self.stopped.is_set():
+                self.samples.append(self.query(CONNECTIONS_SQL))
+                self.stopped.wait(self.interval)
+            self.sessions.append(self.query(SESSIONS_SQL))
+        finally:
+            connection.close()
+
+    @staticmethod
+    def query(sql):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchone()[0]
+        except Exception:  # pg_stat_database.sessions needs PostgreSQL 14
+            return None
+
+    def results(self):
+        samples = [s for s in self.samples if s is not None]
+        opened = (self.sessions[-1] - self.sessions[0]
+                  if len(self.sessions) == 2 and None not in self.sessions else None)
+        return {
+            "peak": max(samples) if samples else None,
+            "mean": round(sum(samples) / len(samples), 1) if samples else None,
+            "opened": opened,
+        }
+
+
+class Candidate(threading.Thread):
+    """Logs in, waits for the others at `ready`, then starts `rounds` exams and fetches their first page."""
+
+    def __init__(self, opts, username, ready, record):
+        super().__init__(daemon=True)
+        self.opts = opts
+        self.username = username
+        self.ready = ready
+        self.record = record
+        self.http = requests.Session()
+        self.error = None
+
+    def call(self, endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            res = self.http.request(method, self.opts["base_url"] + path, timeout=self.opts["timeout"], **kwargs)
+        except requests.RequestException:
+            self.record(endpoint, (time.perf_counter() - start, 0, None))
+            return None
+        self.record(endpoint, (time.perf_counter() - start, res.status_code, None))
+        return res
+
+    def run(self):
+        try:
+            res = self.call("login", "POST", LOGIN,
+                            json={"username": self.username, "password": self.opts["password"]})
+            if res is None or res.status_code != 200:
+                raise RuntimeError("login failed")
+            self.http.headers["Authorization"] = f"Bearer {res.json()['access']}"
+        except Exception as exc:  # reported once the run is over
+            self.error = f"{self.username}: {exc}"
+        self.ready.wait()
+        if self.error:
+            return
+        body = {"exam_id": self.opts["exam"]} if self.opts["exam"] else None
+        for _ in range(self.opts["rounds"]):
+            res = self.call("start_exam", "POST", START, json=body)
+            if res is not None and res.status_code == 200:
+                self.call("session_questions", "GET", SESSION_QUESTIONS.format(res.json()["id"]))
+
+
+class Command(BaseCommand):
+    help = (
+        "Burst-test exam start against a running server: N candidates log in, then all at once "
+        "start an exam and fetch its first page of questions. Reports p50/p95/p99 latency per endpoint and, "
+        "on PostgreSQL, the peak number of open connections and how many were opened during the "
+        "burst. Run it before and after changing DB_CONN_MAX_AGE / DB_POOL and diff with --compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--candidates", type=int, default=100)
+        parser.add_argument("--rounds", type=int, default=1, help="Exam starts per candidate.")
+        parser.add_argument("--exam", type=int, default=None, help="Exam id to start (default: no exam).")
+        parser.add_argument("--user-prefix", default="loadcand")
+        parser.add_argument("--password", default="loadtest-pw")
+        parser.add_argument("--create-users", action="store_true",
+                            help="Create the candidate accounts first (server must share this DATABASE_URL).")
+        parser.add_argument("--sample-interval", type=float, default=0.05,
+                            help="Seconds between connection-count samples.")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--output", default=None,
+                            help="Results file (default var/bench/exam-start-<timestamp>.json).")
+        parser.add_argument("--compare", default=None, help="Earlier results file to diff against.")
+        parser.add_argument("--revision", default=None,
+                            help="Revision the server runs, when it is not this checkout (default: git HEAD).")
+
+    def handle(self, *args, **opts):
+        usernames = [f"{opts['user_prefix']}{i:04d}" for i in range(opts["candidates"])]
+        if opts["create_users"]:
+            self.create_users(usernames, opts["password"])
+
+        samples = {}
+        lock = threading.Lock()
+
+        def record(endpoint, sample):
+            with lock:
+                samples.setdefault(endpoint, []).append(sample)
+
+        monitor = ConnectionMonitor(opts["sample_interval"])
+        clock = SimpleNamespace(burst_at=None)
+
+        def begin_burst():
+            monitor.start()
+            clock.burst_at = time.monotonic()
+
+        ready = threading.Barrier(len(usernames), action=begin_burst)
+        workers = [Candidate(opts, name, ready, record) for name in usernames]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        burst_s = time.monotonic() - clock.burst_at
+        monitor.stopped.set()
+        monitor.join()
+
+        failures = [w.error for w in workers if w.error]
+        db = settings.DATABASES["default"]
+        results = {
+            "revision": opts["revision"] or git_revision(),
+            "recorded_at": timezone.now().isoformat(),
+            "database": db["ENGINE"].rsplit(".", 1)[-1],
+            # this process's view of the settings; run it with the server's environment
+            "db_settings": {
+                "conn_max_age": db.get("CONN_MAX_AGE"),
+                "conn_health_checks": db.get("CONN_HEALTH_CHECKS"),
+                "pool": db.get("OPTIONS", {}).get("pool"),
+            },
+            "config": {k: opts[k] for k in ("base_url", "candidates", "rounds", "exam")},
+            "burst_s": round(burst_s, 2),
+            "failed_candidates": len(failures),
+            "connections": monitor.results(),
+            "endpoints": {
+                name: summarize(s, burst_s) for name, s in sorted(samples.items()) if name != "login"
+            },
+        }
+        for message in failures[:5]:
+            self.stderr.write(message)
+
+        path = opts["output"] or os.path.join(
+            settings.BASE_DIR, "var", "bench", f"exam-start-{timezone.now():%Y%m%dT%H%M%S}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+        self.report(results)
+        if opts["compare"]:
+            self.compare(results, opts["compare"])
+        self.stdout.write(f"results written to {path}")
+
+    def create_users(self, usernames, password):
+        User = get_user_model()
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        for name in usernames:
+            if name not in existing:
+                User.objects.create_user(name, password=password)
+        self.stdout.write(f"created {len(usernames) - len(existing)} candidate accounts")
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':<15} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} "
+                          f"{'p95 ms':>8} {'p99 ms':>8}")
+        for name, r in results["endpoints"].items():
+            lat = r["latency_ms"]
+            self.stdout.write(
+                f"{name:<15} {r['requests']:>6} {r['errors']:>5} {r['throughput_rps']!s:>8} "
+                f"{lat['p50']!s:>8} {lat['p95']!s:>8} {lat['p99']!s:>8}"
+            )
+        conns = results["connections"]
+        self.stdout.write(f"db connections: peak={conns['peak']} mean={conns['mean']} opened={conns['opened']}")
+
+    def compare(self, results, baseline_path):
+        try:
+            with open(baseline_path) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"cannot read baseline {baseline_path}: {exc}")
+
+        self.stdout.write(f"vs {baseline.get('revision') or baseline_path}:")
+        rows = []
+        for name in ("start_exam", "session_questions"):
+            before = baseline.get("endpoints", {}).get(name)
+            after = results["endpoints"].get(name)
+            if before and after:
+                rows += [(f"{name} {p} ms", before["latency_ms"][p], after["latency_ms"][p]) for p in ("p50", "p99")]
+        for key in ("peak", "opened"):
+            rows.append((f"connections {key}", baseline.get("connections", {}).get(key), results["connections"][key]))
+        for label, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+            self.stdout.write(f"  {label:<25} {old!s:>10} -> {new!s:>10} {change:>8}")
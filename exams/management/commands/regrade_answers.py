@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from exams.models import RegradeJob
+from exams.regrade import claim, run_job
+
+
+class Command(BaseCommand):
+    help = "Re-grade stored answers against the current correct options, in resumable chunks."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--questions", help="Comma-separated question ids whose correct option changed.")
+        target.add_argument("--all", action="store_true", help="Re-grade every answer.")
+        target.add_argument("--job", type=int, help="Resume this RegradeJob.")
+        target.add_argument("--pending", action="store_true", help="Run every queued job (e.g. from the API).")
+        parser.add_argument("--chunk-size", type=int, default=settings.EXAMS_REGRADE_CHUNK_SIZE,
+                            help="Answers re-graded per transaction.")
+        parser.add_argument("--max-chunks", type=int, default=0,
+                            help="Stop after this many chunks, leaving the job resumable (0 = run to the end).")
+        parser.add_argument("--force", action="store_true",
+                            help="With --job, take over a job left 'running' by a worker that died.")
+
+    def handle(self, *args, **opts):
+        self.verbosity = opts["verbosity"]
+        if opts["pending"]:
+            jobs = list(RegradeJob.objects.filter(status=RegradeJob.PENDING).order_by("id"))
+        elif opts["job"]:
+            job = RegradeJob.objects.filter(pk=opts["job"]).first()
+            if job is None:
+                raise CommandError(f"no regrade job {opts['job']}")
+            if opts["force"] and job.status == RegradeJob.RUNNING:
+                RegradeJob.objects.filter(pk=job.pk).update(status=RegradeJob.PENDING)
+            jobs = [job]
+        else:
+            question_ids = [] if opts["all"] else [int(x) for x in opts["questions"].split(",") if x]
+            jobs = [RegradeJob.objects.create(question_ids=question_ids)]
+
+        for job in jobs:
+            if not claim(job):
+                self.stderr.write(f"regrade #{job.pk} is {job.status}; skipped")
+                continue
+            self.stdout.write(f"regrade #{job.pk}: resuming after answer {job.last_answer_id}")
+            job = run_job(job, opts["chunk_size"], opts["max_chunks"], progress=self.progress)
+            self.stdout.write(
+                f"regrade #{job.pk} {job.status}: scanned={job.rows_scanned} changed={job.rows_changed} "
+                f"rows/s={job.rows_per_second}"
+            )
+
+    def progress(self, job):
+        if self.verbosity > 1:
+            self.stdout.write(f"  #{job.pk} @ answer {job.last_answer_id}: scanned={job.rows_scanned} "
+                              f"changed={job.rows_changed}")
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 05:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    # repeated submissions could store a question twice; keep the latest answer
+    Answer = apps.get_model('exams', 'Answer')
+    duplicates = (
+        Answer.objects.values('session_id', 'question_id')
+        .annotate(n=Count('id'), keep=Max('id'))
+        .filter(n__gt=1)
+    )
+    for row in duplicates.iterator():
+        Answer.objects.filter(
+            session_id=row['session_id'], question_id=row['question_id'],
+        ).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('session', 'question'), name='exams_answer_session_question_uniq'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 05:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_answer_unique_session_question'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='Exam',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('questions_per_session', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('questions', models.ManyToManyField(blank=True, related_name='exams', to='exams.question')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='exam',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='exams.exam'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 05:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_regradejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sessions', models.IntegerField(default=0)),
+                ('last_ended_at', models.DateTimeField(blank=True, null=True)),
+                ('last_session_id', models.BigIntegerField(default=0)),
+                ('state', models.JSONField(default=dict)),
+                ('results', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='item_analysis', to='exams.exam')),
+            ],
+        ),
+    ]
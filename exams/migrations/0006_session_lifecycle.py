@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 05:17
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_open_sessions(apps, schema_editor):
+    """
+    Sessions already open were started without a time limit, so they keep
+    none (deadline_at stays null). They get the default limit's length from
+    now to finish or start sending heartbeats before the closer treats them
+    as abandoned.
+    """
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    limit = timedelta(minutes=getattr(settings, 'EXAMS_DEFAULT_TIME_LIMIT_MINUTES', 120))
+    ExamSession.objects.filter(ended_at__isnull=True).update(expires_at=timezone.now() + limit)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_itemanalysis'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='time_limit_minutes',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='deadline_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='last_heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_open_sessions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['expires_at'], name='exams_session_open_expiry'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('ended_at__isnull', True)), fields=['exam'], name='exams_session_open_exam'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 05:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def score_finished_sessions(apps, schema_editor):
+    # one UPDATE: finished sessions get the score their answers add up to today
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    Answer = apps.get_model('exams', 'Answer')
+
+    def count(**filters):
+        counts = (
+            Answer.objects.filter(session=OuterRef('pk'), **filters)
+            .order_by().values('session').annotate(n=Count('id')).values('n')
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    ExamSession.objects.filter(ended_at__isnull=False).update(score=count(is_correct=True), total=count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_session_lifecycle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='score',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='total',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(score_finished_sessions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('score__isnull', False)), fields=['exam', '-score'], name='exams_session_exam_score'),
+        ),
+    ]
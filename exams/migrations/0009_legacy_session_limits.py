@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 07:20
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import F
+from django.utils import timezone
+
+
+def lift_backfilled_deadlines(apps, schema_editor):
+    """
+    The first version of 0006 gave sessions open at the time a deadline of
+    started_at + the default limit, so long-running ones were closed (and
+    their submissions rejected) as soon as the closer ran. Those still open
+    lose that deadline, as 0006 does now.
+    """
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    limit = timedelta(minutes=getattr(settings, 'EXAMS_DEFAULT_TIME_LIMIT_MINUTES', 120))
+    ExamSession.objects.filter(ended_at__isnull=True, deadline_at=F('started_at') + limit).update(
+        deadline_at=None, expires_at=timezone.now() + limit,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_question_bank_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(lift_backfilled_deadlines, migrations.RunPython.noop),
+    ]
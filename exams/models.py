@@ -1,6 +1,10 @@
+import random
+
 from django.db import models
 from django.contrib.auth.models import User
 
+_rng = random.SystemRandom()
+
 
 class Question(models.Model):
     text = models.TextField()
@@ -14,10 +18,62 @@ class Question(models.Model):
         return self.text[:50]
 
 
+class QuestionBankVersion(models.Model):
+    """Single row (pk=1) counting question bank edits; the bank cache is keyed by it (see exams/bank.py)."""
+    version = models.BigIntegerField(default=0)
+
+
+class Exam(models.Model):
+    """
+    An exam draws each session's questions from its pool: `questions_per_session`
+    picked at random (0 = the whole pool), in a shuffled order.
+    """
+    title = models.CharField(max_length=255)
+    questions = models.ManyToManyField(Question, related_name='exams', blank=True)
+    questions_per_session = models.PositiveIntegerField(default=0)
+    time_limit_minutes = models.PositiveIntegerField(null=True, blank=True)  # None = EXAMS_DEFAULT_TIME_LIMIT_MINUTES
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+    def draw_question_ids(self):
+        """A fresh random selection from the pool, in presentation order (pool ids are cached)."""
+        from .bank import exam_pool_ids
+
+        pool = exam_pool_ids(self)
+        k = self.questions_per_session or len(pool)
+        return _rng.sample(pool, min(k, len(pool)))
+
+
 class ExamSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, on_delete=models.PROTECT, null=True, blank=True, related_name='sessions')
+    # the session's questions in presentation order, drawn once in start_exam; empty for sessions without an exam
+    question_ids = models.JSONField(default=list, blank=True)
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+    # lifecycle (see exams/lifecycle.py): the time limit ends at deadline_at (null for sessions
+    # started before limits existed); an open session is abandoned at expires_at =
+    # min(deadline_at, last heartbeat + timeout)
+    deadline_at = models.DateTimeField(null=True, blank=True)
+    last_heartbeat_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    # set when the session is finalized (see exams/leaderboard.py): correct answers / answers
+    score = models.IntegerField(null=True, blank=True)
+    total = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # only open sessions are indexed, so both stay as small as the set of running exams
+            models.Index(fields=['expires_at'], condition=models.Q(ended_at__isnull=True),
+                         name='exams_session_open_expiry'),
+            models.Index(fields=['exam'], condition=models.Q(ended_at__isnull=True),
+                         name='exams_session_open_exam'),
+            models.Index(fields=['exam', '-score'], condition=models.Q(score__isnull=False),
+                         name='exams_session_exam_score'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.started_at}"
@@ -29,6 +85,64 @@ class Answer(models.Model):
     selected_option = models.CharField(max_length=1)
     is_correct = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # one row per question per session: autosave and final submission upsert on it
+            models.UniqueConstraint(fields=['session', 'question'], name='exams_answer_session_question_uniq'),
+        ]
+
     def save(self, *args, **kwargs):
         self.is_correct = (self.selected_option == self.question.correct_option)
         super().save(*args, **kwargs)
+
+
+class RegradeJob(models.Model):
+    """
+    Re-grades stored answers after correct options change (see exams/regrade.py).
+    Progress is checkpointed by answer id, so an interrupted job resumes
+    where it stopped; answers created after the job first ran were graded
+    against the current options already and are not revisited.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    question_ids = models.JSONField(default=list, blank=True)  # empty = every question
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    last_answer_id = models.BigIntegerField(default=0)
+    max_answer_id = models.BigIntegerField(null=True, blank=True)
+    rows_scanned = models.BigIntegerField(default=0)
+    rows_changed = models.BigIntegerField(default=0)
+    elapsed_seconds = models.FloatField(default=0)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"regrade #{self.pk} ({self.status}) @ answer {self.last_answer_id}"
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows_scanned / self.elapsed_seconds, 1) if self.elapsed_seconds else None
+
+
+class ItemAnalysis(models.Model):
+    """
+    Cached item statistics for one exam (see exams/analytics.py). `state`
+    holds additive per-question sums so later runs only fold in sessions
+    finished after the (last_ended_at, last_session_id) watermark.
+    """
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name='item_analysis')
+    sessions = models.IntegerField(default=0)
+    last_ended_at = models.DateTimeField(null=True, blank=True)
+    last_session_id = models.BigIntegerField(default=0)
+    state = models.JSONField(default=dict)
+    results = models.JSONField(default=list)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"item analysis for {self.exam} ({self.sessions} sessions)"
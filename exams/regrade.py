@@ -0,0 +1,113 @@
+# exams/regrade.py
+"""
+Set-based re-grading of stored answers.
+
+A RegradeJob walks Answer rows in id order, one bounded chunk per
+transaction. Each chunk is one UPDATE that flips is_correct only on rows
+whose stored grade no longer matches their question's correct_option, and
+the job's checkpoint (last_answer_id, counters) is saved in the same
+transaction, so a crash loses at most the chunk in flight and a rerun
+resumes from the checkpoint. Chunks that change grades also refresh the
+stored scores of the sessions they touch, in the same transaction.
+"""
+import time
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .leaderboard import bump_leaderboards, score_fields
+from .models import Answer, ExamSession, Question, RegradeJob
+
+
+def _regrade_sql(n_questions):
+    answers = connection.ops.quote_name(Answer._meta.db_table)
+    questions = connection.ops.quote_name(Question._meta.db_table)
+    sql = (
+        f"UPDATE {answers} SET is_correct = NOT is_correct "
+        f"WHERE id > %s AND id <= %s "
+        f"AND is_correct <> (selected_option = ("
+        f"SELECT q.correct_option FROM {questions} q WHERE q.id = {answers}.question_id))"
+    )
+    if n_questions:
+        sql += f" AND question_id IN ({', '.join(['%s'] * n_questions)})"
+    return sql
+
+
+def rescore_sessions(answers):
+    """Refresh the stored score of finished sessions owning any of `answers` (one UPDATE)."""
+    sessions = ExamSession.objects.filter(id__in=answers.values('session_id'), score__isnull=False)
+    bump_leaderboards(sessions.values_list('exam_id', flat=True).distinct())
+    sessions.update(**score_fields())
+
+
+def regrade_chunk(job, chunk_size):
+    """
+    Re-grade the next chunk of the job's answers and advance its checkpoint.
+    Returns the number of answers scanned (0 when the job is finished).
+    """
+    answers = Answer.objects.filter(id__gt=job.last_answer_id, id__lte=job.max_answer_id)
+    if job.question_ids:
+        answers = answers.filter(question_id__in=job.question_ids)
+    ids = list(answers.order_by('id').values_list('id', flat=True)[:chunk_size])
+    if not ids:
+        return 0
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                _regrade_sql(len(job.question_ids)),
+                [job.last_answer_id, ids[-1], *job.question_ids],
+            )
+            changed = cursor.rowcount
+        if changed:
+            rescore_sessions(answers.filter(id__lte=ids[-1]))
+        job.last_answer_id = ids[-1]
+        job.rows_scanned += len(ids)
+        job.rows_changed += changed
+        job.save(update_fields=['last_answer_id', 'rows_scanned', 'rows_changed', 'updated_at'])
+    return len(ids)
+
+
+def claim(job):
+    """Mark a pending or failed job as running; False if another worker already holds it."""
+    claimed = RegradeJob.objects.filter(
+        pk=job.pk, status__in=[RegradeJob.PENDING, RegradeJob.FAILED],
+    ).update(status=RegradeJob.RUNNING, error='')
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def run_job(job, chunk_size, max_chunks=0, progress=None):
+    """
+    Run a claimed job until it finishes (or `max_chunks` chunks ran, leaving
+    it resumable). `progress(job)` is called after every chunk.
+    Returns the job, marked done or failed.
+    """
+    if job.max_answer_id is None:
+        # answers written after this point are graded against the current options already
+        job.max_answer_id = Answer.objects.aggregate(m=Max('id'))['m'] or 0
+        job.save(update_fields=['max_answer_id', 'updated_at'])
+
+    chunks = 0
+    started = time.monotonic()
+    try:
+        while not max_chunks or chunks < max_chunks:
+            if not regrade_chunk(job, chunk_size):
+                job.status = RegradeJob.DONE
+                job.finished_at = timezone.now()
+                break
+            chunks += 1
+            if progress:
+                progress(job)
+        else:
+            job.status = RegradeJob.PENDING  # stopped early; picked up again by the next run
+    except Exception as exc:
+        job.status = RegradeJob.FAILED
+        job.error = str(exc)
+        raise
+    finally:
+        job.elapsed_seconds += time.monotonic() - started
+        job.save(update_fields=['status', 'finished_at', 'error', 'elapsed_seconds', 'updated_at'])
+    return job
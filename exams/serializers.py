@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Question, ExamSession, Answer
+from .models import Question, ExamSession, Answer, RegradeJob
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -15,6 +15,32 @@ class AnswerSerializer(serializers.ModelSerializer):
 
 
 class ExamSessionSerializer(serializers.ModelSerializer):
+    question_count = serializers.SerializerMethodField()
+
     class Meta:
         model = ExamSession
-        fields = ['id', 'started_at', 'ended_at']
+        fields = ['id', 'exam', 'question_count', 'started_at', 'ended_at', 'score', 'total']
+
+    def get_question_count(self, obj):
+        return len(obj.question_ids)
+
+
+class AnswerSubmissionSerializer(serializers.Serializer):
+    # question is a plain id here; grading resolves all of them with one in_bulk
+    question = serializers.IntegerField()
+    selected_option = serializers.CharField(max_length=1)
+
+
+class RegradeJobSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = RegradeJob
+        fields = ['id', 'question_ids', 'status', 'last_answer_id', 'max_answer_id', 'rows_scanned',
+                  'rows_changed', 'rows_per_second', 'error', 'created_at', 'finished_at']
+        read_only_fields = [f for f in fields if f != 'question_ids']
+
+    def validate_question_ids(self, value):
+        if not isinstance(value, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in value):
+            raise serializers.ValidationError('Expected a list of question ids.')
+        return sorted(set(value))
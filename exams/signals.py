@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .bank import bump_bank_version, invalidate_exam_pool
+from .models import Exam, Question
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_bank(sender, **kwargs):
+    # after commit, so a concurrent rebuild cannot cache pre-commit rows under the new version
+    transaction.on_commit(bump_bank_version)
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def invalidate_exam(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_exam_pool, instance.pk))
+
+
+@receiver(m2m_changed, sender=Exam.questions.through)
+def invalidate_exam_questions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        transaction.on_commit(partial(invalidate_exam_pool, instance.pk))
+    elif pk_set:
+        for exam_id in pk_set:
+            transaction.on_commit(partial(invalidate_exam_pool, exam_id))
+    else:
+        # question.exams.clear(): the affected exams are unknown, so drop every pool
+        transaction.on_commit(bump_bank_version)
@@ -1,3 +1,616 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+import numpy as np
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .analytics import analyze_exam
+from .bank import VERSION_KEY, question_ids
+from .grading import SessionClosed, grade_submission
+from .leaderboard import scores_key
+from .models import Answer, Exam, ExamSession, Question, QuestionBankVersion, RegradeJob
+
+QUESTIONS_URL = '/api/exams/questions/'
+
+
+class QuestionBankTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', password='pw', is_staff=True))
+        Question.objects.create(text='2 + 2?', option_a='3', option_b='4', correct_option='B')
+
+    def test_candidates_cannot_list_the_bank(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('cand', password='pw'))
+        self.assertEqual(client.get(QUESTIONS_URL).status_code, 403)
+
+    def test_one_query_per_bank_version(self):
+        with self.assertNumQueries(2):  # the version row, then the bank
+            first = self.client.get(QUESTIONS_URL)
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                again = self.client.get(QUESTIONS_URL)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(again.content, first.content)
+        self.assertEqual(first.json()[0]['text'], '2 + 2?')
+        self.assertNotIn('correct_option', first.json()[0])
+
+    def test_unchanged_bank_returns_304(self):
+        etag = self.client.get(QUESTIONS_URL)['ETag']
+        res = self.client.get(QUESTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_question_save_invalidates_after_commit(self):
+        etag = self.client.get(QUESTIONS_URL)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(text='Capital of France?', option_a='Paris', option_b='Rome', correct_option='A')
+
+        res = self.client.get(QUESTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()), 2)
+        self.assertNotEqual(res['ETag'], etag)
+
+
+    def test_bump_from_another_worker_is_seen_once_the_version_expires(self):
+        etag = self.client.get(QUESTIONS_URL)['ETag']
+        # another process edits the bank: its bump reaches the database, not this process's cache
+        Question.objects.bulk_create([Question(text='New', option_a='x', option_b='y', correct_option='A')])
+        QuestionBankVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        self.assertEqual(self.client.get(QUESTIONS_URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        cache.delete(VERSION_KEY)  # EXAMS_BANK_VERSION_SECONDS elapsed
+        res = self.client.get(QUESTIONS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((res.status_code, len(res.json())), (200, 2))
+
+
+class QuestionTransferTests(TestCase):
+    CSV = (
+        'text,option_a,option_b,option_c,option_d,correct_option\n'
+        '"Capital of France?",Paris,Rome,,,a\n'
+        'Missing key,x,y,,,\n'
+        '"2 + 2?",3,4,5,,B\n'
+        'Empty option C,x,y,,,C\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = APIClient()
+        self.admin.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+
+    def test_command_imports_valid_rows_in_batches_and_reports_bad_lines(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'bank.csv')
+        with open(path, 'w') as f:
+            f.write(self.CSV)
+        etag = self.admin.get(QUESTIONS_URL)['ETag']
+
+        out, err = io.StringIO(), io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_questions', path, '--batch-size', '1', stdout=out, stderr=err)
+
+        self.assertEqual(list(Question.objects.order_by('id').values_list('correct_option', flat=True)), ['A', 'B'])
+        self.assertIsNone(Question.objects.get(text='2 + 2?').option_d)
+        self.assertIn('imported 2 of 4 rows (2 errors)', out.getvalue())
+        self.assertIn('line 3: correct_option: Must be one of A, B, C, D.', err.getvalue())
+        self.assertIn('line 5: correct_option: Option C is empty.', err.getvalue())
+        self.assertNotEqual(self.admin.get(QUESTIONS_URL)['ETag'], etag)
+
+    def test_api_round_trip_through_streaming_export(self):
+        upload = SimpleUploadedFile('bank.csv', self.CSV.encode())
+        res = self.admin.post('/api/exams/questions/import/', {'file': upload}, format='multipart')
+        self.assertEqual((res.status_code, res.data['created'], res.data['error_count']), (201, 2, 2))
+
+        res = self.admin.get('/api/exams/questions/export/', {'fmt': 'jsonl'})
+        self.assertTrue(res.streaming)
+        rows = [json.loads(line) for line in b''.join(res.streaming_content).splitlines()]
+        self.assertEqual([r['text'] for r in rows], ['Capital of France?', '2 + 2?'])
+
+        Question.objects.all().delete()
+        upload = SimpleUploadedFile('bank.jsonl', b'\n'.join(json.dumps(r).encode() for r in rows) + b'\n{oops\n')
+        res = self.admin.post('/api/exams/questions/import/', {'file': upload}, format='multipart')
+        self.assertEqual((res.data['created'], res.data['errors'][0]['line']), (2, 3))
+        self.assertEqual(Question.objects.get(text='2 + 2?').option_c, '5')
+
+    def test_candidates_cannot_export_the_answer_keys(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('cand', password='pw'))
+        self.assertEqual(client.get('/api/exams/questions/export/').status_code, 403)
+
+
+class SubmitAnswersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user('cand', password='pw')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        Question.objects.bulk_create([
+            Question(text=f'Q{i}', option_a='a', option_b='b', correct_option='A' if i % 2 else 'B')
+            for i in range(100)
+        ])
+        self.questions = list(Question.objects.order_by('id'))
+        question_ids()  # warm the bank's id set so every submission below costs the same
+
+    def submit(self, n):
+        session = self.client.post('/api/exams/start/').json()
+        answers = [{'question': q.id, 'selected_option': 'A'} for q in self.questions[:n]]
+        return self.client.post(f"/api/exams/{session['id']}/submit/", {'answers': answers}, format='json')
+
+    def test_grades_in_memory(self):
+        res = self.submit(10)
+
+        self.assertEqual(res.data, {'correct': 5, 'total': 10})
+        self.assertEqual(Answer.objects.filter(is_correct=True).count(), 5)
+        self.assertIsNotNone(ExamSession.objects.get().ended_at)
+
+    def test_query_count_does_not_grow_with_answers(self):
+        counts = []
+        for n in (1, 10, 100):
+            session = self.client.post('/api/exams/start/').json()
+            answers = [{'question': q.id, 'selected_option': 'A'} for q in self.questions[:n]]
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(f"/api/exams/{session['id']}/submit/", {'answers': answers}, format='json')
+            self.assertEqual(res.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+
+        # session + in_bulk + savepoint + upsert + session update + score aggregate + release
+        self.assertEqual(counts, [7, 7, 7])
+
+    def test_unknown_question_is_rejected_without_writes(self):
+        session = self.client.post('/api/exams/start/').json()
+        res = self.client.post(f"/api/exams/{session['id']}/submit/",
+                               {'answers': [{'question': 999999, 'selected_option': 'A'}]}, format='json')
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_admin_save_still_grades(self):
+        session = ExamSession.objects.create(user=self.user)
+        answer = Answer.objects.create(session=session, question=self.questions[0], selected_option='B')
+        self.assertTrue(answer.is_correct)
+
+
+@override_settings(EXAMS_AUTOSAVE_FLUSH_ANSWERS=3, EXAMS_AUTOSAVE_FLUSH_SECONDS=60)
+class AutosaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('cand', password='pw'))
+        Question.objects.bulk_create([
+            Question(text=f'Q{i}', option_a='a', option_b='b', correct_option='A') for i in range(5)
+        ])
+        self.questions = [q.id for q in Question.objects.order_by('id')]
+        self.session_id = self.client.post('/api/exams/start/').json()['id']
+
+    def save(self, *pairs):
+        answers = [{'question': self.questions[i], 'selected_option': opt} for i, opt in pairs]
+        return self.client.patch(f'/api/exams/{self.session_id}/answers/', {'answers': answers}, format='json')
+
+    def test_saves_are_coalesced_until_threshold(self):
+        self.assertEqual(self.save((0, 'B')).data, {'saved': 1, 'pending': 1})
+        self.assertEqual(self.save((0, 'A'), (1, 'A')).data, {'saved': 2, 'pending': 2})
+        self.assertFalse(Answer.objects.exists())
+
+        self.assertEqual(self.save((2, 'B')).data, {'saved': 1, 'pending': 0})
+        stored = dict(Answer.objects.values_list('question_id', 'selected_option'))
+        self.assertEqual(stored, {self.questions[0]: 'A', self.questions[1]: 'A', self.questions[2]: 'B'})
+
+    def test_submit_folds_pending_and_flushed_answers_into_score(self):
+        self.save((0, 'A'), (1, 'A'), (2, 'B'))  # flushed
+        self.save((3, 'A'))  # pending
+        res = self.client.post(f'/api/exams/{self.session_id}/submit/',
+                               {'answers': [{'question': self.questions[2], 'selected_option': 'A'}]},
+                               format='json')
+
+        self.assertEqual(res.data, {'correct': 4, 'total': 4})
+        self.assertEqual(Answer.objects.count(), 4)
+        self.assertIsNone(cache.get(f'exams:autosave:{self.session_id}'))
+
+    def test_submit_during_a_save_is_retried(self):
+        self.save((3, 'A'))
+        cache.add(f'exams:autosave:{self.session_id}:lock', True)  # a save in flight
+        res = self.client.post(f'/api/exams/{self.session_id}/submit/', {'answers': []}, format='json')
+        self.assertEqual((res.status_code, res['Retry-After']), (429, '1'))
+        self.assertIsNone(ExamSession.objects.get(id=self.session_id).ended_at)
+
+    def test_submitted_session_rejects_autosave(self):
+        self.client.post(f'/api/exams/{self.session_id}/submit/', {'answers': []}, format='json')
+        self.assertEqual(self.save((0, 'A')).status_code, 409)
+
+    def test_unknown_question_is_rejected(self):
+        res = self.client.patch(f'/api/exams/{self.session_id}/answers/',
+                                {'answers': [{'question': 999999, 'selected_option': 'A'}]}, format='json')
+        self.assertEqual(res.status_code, 400)
+
+
+class ExamSessionQuestionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('cand', password='pw'))
+        Question.objects.bulk_create([
+            Question(text=f'Q{i}', option_a='a', option_b='b', correct_option='A') for i in range(30)
+        ])
+        self.exam = Exam.objects.create(title='Midterm', questions_per_session=12)
+        self.exam.questions.set(Question.objects.all()[:25])
+
+    def start(self):
+        return self.client.post('/api/exams/start/', {'exam_id': self.exam.id}, format='json')
+
+    def test_session_draws_its_question_set_once(self):
+        res = self.start()
+        session = ExamSession.objects.get(id=res.data['id'])
+
+        self.assertEqual(res.data['question_count'], 12)
+        self.assertEqual(len(set(session.question_ids)), 12)
+        pool = set(self.exam.questions.values_list('id', flat=True))
+        self.assertTrue(set(session.question_ids) <= pool)
+
+    def test_questions_are_paginated_in_session_order(self):
+        session_id = self.start().data['id']
+        order = ExamSession.objects.get(id=session_id).question_ids
+
+        seen, page = [], 1
+        while page:
+            with self.assertNumQueries(2):
+                res = self.client.get(f'/api/exams/{session_id}/questions/', {'page': page, 'page_size': 5})
+            seen.extend(q['id'] for q in res.data['results'])
+            page = res.data['next_page']
+
+        self.assertEqual(seen, order)
+        self.assertNotIn('correct_option', res.data['results'][0])
+
+    def test_answers_outside_the_session_set_are_rejected(self):
+        session_id = self.start().data['id']
+        drawn = set(ExamSession.objects.get(id=session_id).question_ids)
+        outsider = Question.objects.exclude(id__in=drawn).first()
+
+        res = self.client.patch(f'/api/exams/{session_id}/answers/',
+                                {'answers': [{'question': outsider.id, 'selected_option': 'A'}]}, format='json')
+        self.assertEqual(res.status_code, 400)
+
+    def test_pool_is_cached_until_the_exam_changes(self):
+        self.start()
+        with self.assertNumQueries(2):  # the exam and the session insert; no pool query
+            self.start()
+
+        extra = Question.objects.exclude(exams=self.exam)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exam.questions.add(*extra)
+            self.exam.questions_per_session = 30
+            self.exam.save()
+        drawn = ExamSession.objects.get(id=self.start().data['id']).question_ids
+        self.assertEqual(sorted(drawn), sorted(Question.objects.values_list('id', flat=True)))
+
+    def test_unknown_or_inactive_exam_is_404(self):
+        self.exam.is_active = False
+        self.exam.save()
+        self.assertEqual(self.start().status_code, 404)
+
+
+@override_settings(EXAMS_HEARTBEAT_TIMEOUT_SECONDS=600, EXAMS_SUBMIT_GRACE_SECONDS=60)
+class SessionLifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user('cand', password='pw')
+        self.client.force_authenticate(self.user)
+        self.question = Question.objects.create(text='Q', option_a='a', option_b='b', correct_option='A')
+        self.exam = Exam.objects.create(title='Quiz', time_limit_minutes=30)
+        self.exam.questions.add(self.question)
+
+    def start(self):
+        return ExamSession.objects.get(id=self.client.post(
+            '/api/exams/start/', {'exam_id': self.exam.id}, format='json').data['id'])
+
+    def age(self, session, **delta):
+        """Shift a session's clock back as if it started `delta` ago."""
+        shift = timedelta(**delta)
+        ExamSession.objects.filter(id=session.id).update(
+            deadline_at=F('deadline_at') - shift,
+            last_heartbeat_at=F('last_heartbeat_at') - shift,
+            expires_at=F('expires_at') - shift,
+        )
+
+    def test_heartbeat_extends_expiry_up_to_the_deadline(self):
+        session = self.start()
+        self.assertEqual(session.deadline_at - session.last_heartbeat_at, timedelta(minutes=30))
+        self.assertEqual(session.expires_at - session.last_heartbeat_at, timedelta(seconds=600))
+
+        self.age(session, minutes=25)
+        res = self.client.post(f'/api/exams/{session.id}/heartbeat/')
+        session.refresh_from_db()
+
+        self.assertEqual(res.status_code, 204)
+        self.assertEqual(session.expires_at, session.deadline_at)
+
+    def test_closer_closes_expired_sessions_and_keeps_pending_answers(self):
+        live, idle = self.start(), self.start()
+        self.client.patch(f'/api/exams/{idle.id}/answers/',
+                          {'answers': [{'question': self.question.id, 'selected_option': 'A'}]}, format='json')
+        self.age(idle, minutes=11)
+
+        out = io.StringIO()
+        call_command('close_expired_sessions', '--once', '--chunk-size', '1', stdout=out)
+        live.refresh_from_db()
+        idle.refresh_from_db()
+
+        self.assertIn('closed 1', out.getvalue())
+        self.assertIsNone(live.ended_at)
+        self.assertGreater(idle.ended_at, idle.expires_at)  # closed now; expires_at records when it was abandoned
+        self.assertEqual((idle.score, idle.total), (1, 1))
+        self.assertTrue(Answer.objects.get(session=idle).is_correct)
+        self.assertEqual(self.client.post(f'/api/exams/{idle.id}/heartbeat/').status_code, 409)
+
+    def test_closed_session_cannot_be_submitted_again(self):
+        session = self.start()
+        answer = {'answers': [{'question': self.question.id, 'selected_option': 'A'}]}
+        self.assertEqual(self.client.post(f'/api/exams/{session.id}/submit/', answer, format='json').status_code, 200)
+        ended = ExamSession.objects.get(id=session.id).ended_at
+
+        res = self.client.post(f'/api/exams/{session.id}/submit/',
+                               {'answers': [{'question': self.question.id, 'selected_option': 'B'}]}, format='json')
+        session.refresh_from_db()
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual((session.ended_at, session.score), (ended, 1))
+
+        stale = ExamSession.objects.get(id=session.id)
+        stale.ended_at = None  # as read by a submit that raced the first one
+        with self.assertRaises(SessionClosed):
+            grade_submission(stale, [{'question': self.question.id, 'selected_option': 'B'}])
+        self.assertEqual(Answer.objects.get(session=session).selected_option, 'A')
+
+    def legacy_session(self, **started_ago):
+        """An open session from before time limits existed, started `started_ago` back."""
+        session = ExamSession.objects.create(user=self.user, exam=self.exam, question_ids=[self.question.id])
+        ExamSession.objects.filter(id=session.id).update(started_at=timezone.now() - timedelta(**started_ago))
+        return session
+
+    def test_legacy_sessions_keep_no_time_limit(self):
+        session = self.legacy_session(hours=5)
+        importlib.import_module('exams.migrations.0006_session_lifecycle').backfill_open_sessions(django_apps, None)
+
+        call_command('close_expired_sessions', '--once', stdout=io.StringIO())
+        session.refresh_from_db()
+        self.assertIsNone(session.ended_at)
+        self.assertIsNone(session.deadline_at)
+
+        self.assertEqual(self.client.post(f'/api/exams/{session.id}/heartbeat/').status_code, 204)
+        session.refresh_from_db()
+        self.assertEqual(session.expires_at - session.last_heartbeat_at, timedelta(seconds=600))
+        res = self.client.post(f'/api/exams/{session.id}/submit/',
+                               {'answers': [{'question': self.question.id, 'selected_option': 'A'}]}, format='json')
+        self.assertEqual(res.status_code, 200)
+
+    def test_deadlines_backfilled_from_the_start_time_are_lifted(self):
+        legacy, current = self.legacy_session(hours=5), self.start()
+        limit = timedelta(minutes=120)  # as the first version of 0006 set them
+        ExamSession.objects.filter(id=legacy.id).update(
+            deadline_at=F('started_at') + limit, expires_at=F('started_at') + limit,
+        )
+        deadline = current.deadline_at
+
+        importlib.import_module('exams.migrations.0009_legacy_session_limits').lift_backfilled_deadlines(
+            django_apps, None,
+        )
+        legacy.refresh_from_db()
+        current.refresh_from_db()
+        self.assertIsNone(legacy.deadline_at)
+        self.assertGreater(legacy.expires_at, timezone.now())
+        self.assertEqual(current.deadline_at, deadline)
+
+    def test_submission_after_the_time_limit_is_rejected(self):
+        session = self.start()
+        self.age(session, minutes=32)
+        res = self.client.post(f'/api/exams/{session.id}/submit/',
+                               {'answers': [{'question': self.question.id, 'selected_option': 'A'}]}, format='json')
+
+        self.assertEqual(res.status_code, 409)
+        self.assertFalse(Answer.objects.filter(session=session).exists())
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.questions = Question.objects.bulk_create([
+            Question(text=f'Q{i}', option_a='a', option_b='b', correct_option='A') for i in range(4)
+        ])
+        self.exam = Exam.objects.create(title='Final')
+        self.exam.questions.set(self.questions)
+        self.clients = {}
+        for name, n_correct in [('ann', 4), ('bob', 2), ('cy', 2), ('dee', 0)]:
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user(name, password='pw'))
+            session_id = client.post('/api/exams/start/', {'exam_id': self.exam.id}, format='json').data['id']
+            answers = [{'question': q.id, 'selected_option': 'A' if i < n_correct else 'B'}
+                       for i, q in enumerate(self.questions)]
+            with self.captureOnCommitCallbacks(execute=True):
+                client.post(f'/api/exams/{session_id}/submit/', {'answers': answers}, format='json')
+            self.clients[name] = (client, session_id)
+
+    def result(self, name):
+        client, session_id = self.clients[name]
+        return client.get(f'/api/exams/{session_id}/result/').data
+
+    def test_submit_stores_score_and_ranks_ties_together(self):
+        self.assertEqual(ExamSession.objects.get(id=self.clients['ann'][1]).score, 4)
+        self.assertEqual(self.result('ann'), {'score': 4, 'total': 4, 'rank': 1, 'percentile': 75.0, 'candidates': 4})
+        self.assertEqual((self.result('bob')['rank'], self.result('cy')['rank']), (2, 2))
+        self.assertEqual(self.result('dee')['rank'], 4)
+
+    def test_rank_lookup_reads_the_cached_scores(self):
+        self.result('bob')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.result('cy')['percentile'], 25.0)
+
+    def test_submit_burst_reuses_the_scores_until_they_expire(self):
+        self.result('bob')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('eve', password='pw'))
+        session_id = client.post('/api/exams/start/', {'exam_id': self.exam.id}, format='json').data['id']
+        answers = [{'question': q.id, 'selected_option': 'A'} for q in self.questions]
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(f'/api/exams/{session_id}/submit/', {'answers': answers}, format='json')
+
+        with self.assertNumQueries(1):  # the session only; no rebuild for the new score
+            self.assertEqual(self.result('bob')['candidates'], 4)
+        cache.delete(scores_key(self.exam.id))  # EXAMS_LEADERBOARD_SECONDS elapsed
+        self.assertEqual(self.result('bob'), {'score': 2, 'total': 4, 'rank': 3, 'percentile': 20.0, 'candidates': 5})
+
+    def test_regrade_refreshes_scores_and_leaderboard(self):
+        Question.objects.filter(id=self.questions[3].id).update(correct_option='B')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('regrade_answers', '--all', stdout=io.StringIO())
+
+        self.assertEqual(self.result('ann')['score'], 3)
+        self.assertEqual(self.result('bob')['rank'], 1)  # 3 of 4 now, tied with ann and cy
+
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        board = admin.get(f'/api/exams/leaderboard/{self.exam.id}/', {'limit': 3}).data['results']
+        self.assertEqual([(r['user'], r['rank'], r['score']) for r in board],
+                         [('ann', 1, 3), ('bob', 1, 3), ('cy', 1, 3)])
+
+
+@override_settings(EXAMS_REGRADE_CHUNK_SIZE=7)
+class RegradeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cand', password='pw')
+        self.q1 = Question.objects.create(text='Q1', option_a='a', option_b='b', correct_option='A')
+        self.q2 = Question.objects.create(text='Q2', option_a='a', option_b='b', correct_option='A')
+        sessions = ExamSession.objects.bulk_create([ExamSession(user=self.user) for _ in range(20)])
+        Answer.objects.bulk_create([
+            Answer(session=s, question=q, selected_option=opt, is_correct=(opt == 'A'))
+            for s, opt in zip(sessions, 'AB' * 10) for q in (self.q1, self.q2)
+        ])
+        # fix the key without re-saving answers, as an admin edit would
+        Question.objects.filter(id=self.q1.id).update(correct_option='B')
+
+    def test_set_based_regrade_only_touches_affected_questions(self):
+        out = io.StringIO()
+        call_command('regrade_answers', '--questions', str(self.q1.id), stdout=out)
+
+        job = RegradeJob.objects.get()
+        self.assertEqual(job.status, RegradeJob.DONE)
+        self.assertEqual((job.rows_scanned, job.rows_changed), (20, 20))
+        self.assertEqual(Answer.objects.filter(question=self.q1, is_correct=True, selected_option='B').count(), 10)
+        self.assertEqual(Answer.objects.filter(question=self.q2, is_correct=True).count(), 10)
+        self.assertIn('rows/s=', out.getvalue())
+
+    def test_interrupted_job_resumes_from_checkpoint(self):
+        call_command('regrade_answers', '--all', '--max-chunks', '2', stdout=io.StringIO())
+        job = RegradeJob.objects.get()
+        self.assertEqual(job.status, RegradeJob.PENDING)
+        self.assertEqual(job.rows_scanned, 14)
+
+        call_command('regrade_answers', '--job', str(job.id), stdout=io.StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, RegradeJob.DONE)
+        self.assertEqual((job.rows_scanned, job.rows_changed), (40, 20))
+        self.assertFalse(Answer.objects.filter(question=self.q1, selected_option='A', is_correct=True).exists())
+
+    def test_api_queues_job_for_worker(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        res = client.post('/api/exams/regrade/', {'question_ids': [self.q1.id]}, format='json')
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.data['status'], 'pending')
+
+        call_command('regrade_answers', '--pending', stdout=io.StringIO())
+        res = client.get(f"/api/exams/regrade/{res.data['id']}/")
+        self.assertEqual(res.data['status'], 'done')
+        self.assertEqual(res.data['rows_changed'], 20)
+
+
+@override_settings(EXAMS_ANALYSIS_SETTLE_SECONDS=0)
+class ItemAnalysisTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cand', password='pw')
+        self.questions = Question.objects.bulk_create([
+            Question(text=f'Q{i}', option_a='a', option_b='b', option_c='c', correct_option='A') for i in range(4)
+        ])
+        self.exam = Exam.objects.create(title='Quiz')
+        self.exam.questions.set(self.questions)
+        self.rng = np.random.default_rng(7)
+
+    def add_sessions(self, n):
+        ended = timezone.now() - timedelta(minutes=5)
+        sessions = ExamSession.objects.bulk_create([
+            ExamSession(user=self.user, exam=self.exam, ended_at=ended) for _ in range(n)
+        ])
+        Answer.objects.bulk_create([
+            Answer(session=s, question=q, selected_option=opt, is_correct=(opt == 'A'))
+            for s in sessions for q in self.questions
+            for opt in [str(self.rng.choice(['A', 'A', 'B', 'C']))]
+        ])
+
+    def expected(self):
+        """Naive per-item statistics straight from the Answer table."""
+        rows = list(Answer.objects.values_list('session_id', 'question_id', 'is_correct'))
+        totals = {}
+        for sid, _, ok in rows:
+            totals[sid] = totals.get(sid, 0) + ok
+        stats = {}
+        for q in self.questions:
+            item = [(ok, totals[sid] - ok) for sid, qid, ok in rows if qid == q.id]
+            x, rest = np.array(item, dtype=float).T
+            stats[q.id] = (x.mean(), np.corrcoef(x, rest)[0, 1])
+        return stats
+
+    def test_statistics_match_naive_computation(self):
+        self.add_sessions(60)
+        analysis = analyze_exam(self.exam)
+
+        expected = self.expected()
+        for item in analysis.results:
+            p, r = expected[item['question']]
+            self.assertAlmostEqual(item['difficulty'], p, places=4)
+            self.assertAlmostEqual(item['discrimination'], r, places=3)
+            counts = Answer.objects.filter(question_id=item['question'], selected_option='B').count()
+            self.assertEqual(item['options']['B']['count'], counts)
+        self.assertEqual(analysis.sessions, 60)
+
+    def test_incremental_run_matches_full_rebuild(self):
+        self.add_sessions(25)
+        analyze_exam(self.exam, chunk_sessions=7)
+        self.add_sessions(30)
+        incremental = analyze_exam(self.exam, chunk_sessions=7)
+
+        self.assertEqual(incremental.sessions, 55)
+        self.assertEqual(incremental.results, analyze_exam(self.exam, full=True).results)
+
+    def test_endpoint_serves_cached_results(self):
+        self.add_sessions(10)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        first = client.get(f'/api/exams/item-analysis/{self.exam.id}/')
+        self.assertEqual(first.data['sessions'], 10)
+
+        self.add_sessions(5)
+        self.assertEqual(client.get(f'/api/exams/item-analysis/{self.exam.id}/').data['sessions'], 10)
+        self.assertEqual(client.get(f'/api/exams/item-analysis/{self.exam.id}/', {'refresh': 1}).data['sessions'], 15)
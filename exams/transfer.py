@@ -0,0 +1,172 @@
+# exams/transfer.py
+"""
+Streaming bulk import and export of questions, as CSV or JSONL.
+
+Import reads rows one at a time from a text stream, validates each on its
+own (errors are reported with their line number and do not stop the run)
+and writes valid rows with bulk_create, one transaction per batch, so
+memory stays bounded by the batch size and a failure loses at most the
+batch in flight. Imported rows are always new questions; an `id` column is
+ignored.
+
+Export walks the bank in id order with a server-side iterator and yields
+chunks of encoded lines, so neither side ever holds the whole bank.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+
+from .bank import bump_bank_version
+from .models import Question
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ("text", "option_a", "option_b", "option_c", "option_d", "correct_option")
+OPTION_FIELDS = {"A": "option_a", "B": "option_b", "C": "option_c", "D": "option_d"}
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def guess_format(name, default="csv"):
+    suffix = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(suffix, default)
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row_dict_or_None, error_or_None) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        missing = {"text", "option_a", "option_b", "correct_option"} - set(reader.fieldnames or ())
+        if missing:
+            raise ImportFormatError(f"CSV header is missing: {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_number, None, f"invalid JSON: {exc}"
+                continue
+            if isinstance(row, dict):
+                yield line_number, row, None
+            else:
+                yield line_number, None, "expected a JSON object"
+    else:
+        raise ImportFormatError(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def clean_row(row):
+    """(Question, None) for a valid row, else (None, {field: message})."""
+    values = {field: _text(row.get(field)) for field in FIELDS}
+    values["correct_option"] = values["correct_option"].upper()
+    errors = {}
+    for field in ("text", "option_a", "option_b"):
+        if not values[field]:
+            errors[field] = "This field is required."
+    for field in ("option_a", "option_b", "option_c", "option_d"):
+        if len(values[field]) > 255:
+            errors[field] = "Ensure this field has no more than 255 characters."
+    key = values["correct_option"]
+    if key not in OPTION_FIELDS:
+        errors["correct_option"] = "Must be one of A, B, C, D."
+    elif not values[OPTION_FIELDS[key]]:
+        errors["correct_option"] = f"Option {key} is empty."
+    if errors:
+        return None, errors
+    return Question(
+        text=values["text"],
+        option_a=values["option_a"],
+        option_b=values["option_b"],
+        option_c=values["option_c"] or None,
+        option_d=values["option_d"] or None,
+        correct_option=key,
+    ), None
+
+
+def import_questions(stream, fmt, batch_size=None, dry_run=False, progress=None):
+    """
+    Validate and insert every row of `stream`. With `dry_run` nothing is
+    written. `progress(report)` is called after each batch.
+    Returns {"rows", "created", "error_count", "errors": [{"line", "errors"}]};
+    only the first EXAMS_IMPORT_MAX_REPORTED_ERRORS errors are listed.
+    """
+    batch_size = batch_size or settings.EXAMS_IMPORT_BATCH_SIZE
+    report = {"rows": 0, "created": 0, "error_count": 0, "errors": []}
+    batch = []
+
+    def flush():
+        if not dry_run:
+            with transaction.atomic():
+                Question.objects.bulk_create(batch, batch_size=batch_size)
+        report["created"] += len(batch)
+        batch.clear()
+        if progress:
+            progress(report)
+
+    try:
+        for line_number, row, error in read_rows(stream, fmt):
+            report["rows"] += 1
+            question, errors = clean_row(row) if row is not None else (None, {"row": error})
+            if errors:
+                report["error_count"] += 1
+                if len(report["errors"]) < settings.EXAMS_IMPORT_MAX_REPORTED_ERRORS:
+                    report["errors"].append({"line": line_number, "errors": errors})
+                continue
+            batch.append(question)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if report["created"] and not dry_run:
+            # bulk_create sends no signals
+            transaction.on_commit(bump_bank_version)
+    return report
+
+
+class _Echo:
+    """File-like object whose write() hands back the line, for csv.writer in a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _lines(fmt, columns, rows):
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+
+
+def export_lines(fmt):
+    """
+    Yield the whole bank as CSV (with header) or JSONL, in id order, as
+    UTF-8 chunks of up to EXPORT_CHUNK_SIZE lines.
+    """
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    columns = ("id",) + FIELDS
+    rows = Question.objects.order_by("id").values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    chunk = []
+    for line in _lines(fmt, columns, rows):
+        chunk.append(line)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield "".join(chunk).encode()
+            chunk.clear()
+    if chunk:
+        yield "".join(chunk).encode()
@@ -1,8 +1,23 @@
 from django.urls import path
-from .views import questions_list, start_exam, submit_answers
+from .views import (
+    questions_list, start_exam, submit_answers, autosave_answers, session_questions, start_regrade, regrade_status,
+    item_analysis, session_heartbeat, active_sessions, session_result, leaderboard, questions_import,
+    questions_export,
+)
 
 urlpatterns = [
     path('questions/', questions_list),
+    path('questions/import/', questions_import),
+    path('questions/export/', questions_export),
     path('start/', start_exam),
     path('<int:session_id>/submit/', submit_answers),
+    path('<int:session_id>/answers/', autosave_answers),
+    path('<int:session_id>/questions/', session_questions),
+    path('<int:session_id>/heartbeat/', session_heartbeat),
+    path('<int:session_id>/result/', session_result),
+    path('active-sessions/', active_sessions),
+    path('regrade/', start_regrade),
+    path('regrade/<int:job_id>/', regrade_status),
+    path('item-analysis/<int:exam_id>/', item_analysis),
+    path('leaderboard/<int:exam_id>/', leaderboard),
 ]
@@ -1,29 +1,153 @@
+import io
+
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
-from .models import Question, ExamSession, Answer
-from .serializers import QuestionSerializer, AnswerSerializer, ExamSessionSerializer
+from .autosave import AutosaveBusy, save_answers
+from .analytics import analyze_exam
+from .bank import question_bank
+from .leaderboard import standing, top
+from .lifecycle import heartbeat, lifecycle_fields, open_sessions, submission_too_late
+from .grading import SessionClosed, check_questions, grade_submission
+from .models import Exam, ExamSession, ItemAnalysis, Question, RegradeJob
+from .serializers import AnswerSubmissionSerializer, ExamSessionSerializer, QuestionSerializer, RegradeJobSerializer
+from .transfer import FORMATS, ImportFormatError, export_lines, guess_format, import_questions
+
+QUESTIONS_PAGE_SIZE = 20
+QUESTIONS_MAX_PAGE_SIZE = 100
+LEADERBOARD_SIZE = 20
+LEADERBOARD_MAX_SIZE = 100
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAdminUser])
 def questions_list(request):
-    qs = Question.objects.all()
-    serializer = QuestionSerializer(qs, many=True)
-    return Response(serializer.data)
+    """
+    Question bank (staff only), served as pre-rendered JSON cached per bank version.
+    Send the returned ETag back as If-None-Match to get a 304 while the bank is unchanged.
+    Candidates get their own questions from /api/exams/<session_id>/questions/.
+    """
+    etag, body = question_bank()
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def questions_import(request):
+    """
+    Multipart upload: file=<questions.csv | questions.jsonl>, optional fmt=csv|jsonl, dry_run=1
+    Rows are validated one by one and inserted in batches; invalid rows are
+    reported by line and skipped. Response: {"rows", "created", "error_count", "errors"}
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'detail': 'Upload the questions as "file"'}, status=400)
+    fmt = request.data.get('fmt') or guess_format(upload.name)
+    dry_run = request.data.get('dry_run') in ('1', 'true')
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    try:
+        report = import_questions(stream, fmt, dry_run=dry_run)
+    except (ImportFormatError, UnicodeDecodeError) as exc:
+        return Response({'detail': str(exc)}, status=400)
+    return Response(report, status=200 if dry_run else 201)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def questions_export(request):
+    """
+    GET /api/exams/questions/export/?fmt=csv|jsonl
+    The whole bank, streamed in id order (answer keys included).
+    """
+    fmt = request.query_params.get('fmt', 'csv')
+    if fmt not in FORMATS:
+        return Response({'detail': f'fmt must be one of {", ".join(FORMATS)}'}, status=400)
+    content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_lines(fmt), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="questions.{fmt}"'
+    return response
 
 
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def start_exam(request):
-    session = ExamSession.objects.create(user=request.user)
+    """
+    Expect (optional): {"exam_id": 3}
+    With an exam, the session's questions are drawn from its pool and
+    shuffled once here; fetch them from /api/exams/<session_id>/questions/.
+    """
+    exam_id = request.data.get('exam_id')
+    if exam_id is None:
+        session = ExamSession.objects.create(user=request.user, **lifecycle_fields(None))
+        return Response(ExamSessionSerializer(session).data)
+
+    try:
+        exam = Exam.objects.get(id=exam_id, is_active=True)
+    except (Exam.DoesNotExist, ValueError, TypeError):
+        return Response({'detail': 'Exam not found'}, status=404)
+    session = ExamSession.objects.create(
+        user=request.user, exam=exam, question_ids=exam.draw_question_ids(), **lifecycle_fields(exam),
+    )
     return Response(ExamSessionSerializer(session).data)
 
 
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def session_heartbeat(request, session_id):
+    """
+    Keeps an open session alive; the client sends one every 30 seconds or so.
+    A session that misses heartbeats for EXAMS_HEARTBEAT_TIMEOUT_SECONDS, or
+    runs past its time limit, is closed by `manage.py close_expired_sessions`.
+    """
+    if not heartbeat(session_id, request.user):
+        return Response({'detail': 'Session not found or already closed'}, status=409)
+    return Response(status=204)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def session_questions(request, session_id):
+    """
+    GET /api/exams/<session_id>/questions/?page=<n>&page_size=<n>
+    The session's own questions in their shuffled order, one page at a time.
+    Response: {"count": n, "page": n, "next_page": n | null, "results": [...]}
+    """
+    session = ExamSession.objects.filter(id=session_id, user=request.user).only('question_ids').first()
+    if session is None:
+        return Response({'detail': 'Session not found'}, status=404)
+
+    try:
+        page = max(1, int(request.query_params.get('page', 1)))
+        page_size = int(request.query_params.get('page_size', QUESTIONS_PAGE_SIZE))
+    except ValueError:
+        return Response({'detail': 'page and page_size must be integers'}, status=400)
+    page_size = max(1, min(page_size, QUESTIONS_MAX_PAGE_SIZE))
+
+    ids = session.question_ids[(page - 1) * page_size:page * page_size]
+    questions = Question.objects.in_bulk(ids)
+    has_next = page * page_size < len(session.question_ids)
+    return Response({
+        'count': len(session.question_ids),
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'results': QuestionSerializer([questions[i] for i in ids if i in questions], many=True).data,
+    })
+
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -36,25 +160,159 @@ def submit_answers(request, session_id):
         ...
       ]
     }
+    Answers already sent to the autosave endpoint may be left out; the
+    score covers every answer stored for the session.
     """
     try:
         session = ExamSession.objects.get(id=session_id, user=request.user)
     except ExamSession.DoesNotExist:
         return Response({'detail': 'Session not found'}, status=404)
+    if session.ended_at:
+        return Response({'detail': 'Session already submitted'}, status=409)
+    if submission_too_late(session):
+        return Response({'detail': 'Time limit exceeded'}, status=409)
+
+    serializer = AnswerSubmissionSerializer(data=request.data.get('answers', []), many=True)
+    serializer.is_valid(raise_exception=True)
+    try:
+        return Response(grade_submission(session, serializer.validated_data))
+    except AutosaveBusy:
+        return Response({'detail': 'Another save is in progress, retry'}, status=429, headers={'Retry-After': '1'})
+    except SessionClosed:
+        return Response({'detail': 'Session already submitted'}, status=409)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def session_result(request, session_id):
+    """
+    GET /api/exams/<session_id>/result/
+    The stored score of a finished session and, for exam sessions, its
+    standing: {"score": n, "total": n, "rank": n, "percentile": x, "candidates": n}
+    """
+    session = ExamSession.objects.filter(id=session_id, user=request.user).only('exam', 'score', 'total').first()
+    if session is None:
+        return Response({'detail': 'Session not found'}, status=404)
+    if session.score is None:
+        return Response({'detail': 'Session not finished yet'}, status=409)
+
+    result = {'score': session.score, 'total': session.total}
+    if session.exam_id:
+        result.update(standing(session.exam_id, session.score))
+    return Response(result)
+
+
+@csrf_exempt
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def autosave_answers(request, session_id):
+    """
+    Expect:
+    {
+      "answers": [
+        {"question": 1, "selected_option": "B"},
+        ...
+      ]
+    }
+    Saves (or changes) individual answers while the exam is running. Saves
+    are coalesced per session and written in batches; submit_answers writes
+    whatever is still pending.
+    Response: {"saved": n, "pending": n}
+    """
+    try:
+        session = ExamSession.objects.only('ended_at', 'deadline_at', 'question_ids').get(id=session_id, user=request.user)
+    except ExamSession.DoesNotExist:
+        return Response({'detail': 'Session not found'}, status=404)
+    if session.ended_at:
+        return Response({'detail': 'Session already submitted'}, status=409)
+    if submission_too_late(session):
+        return Response({'detail': 'Time limit exceeded'}, status=409)
+
+    serializer = AnswerSubmissionSerializer(data=request.data.get('answers', []), many=True)
+    serializer.is_valid(raise_exception=True)
+    selections = {a['question']: a['selected_option'] for a in serializer.validated_data}
+    check_questions(selections, session)
+
+    try:
+        result = save_answers(session.id, selections)
+    except AutosaveBusy:
+        return Response({'detail': 'Another save is in progress, retry'}, status=429, headers={'Retry-After': '1'})
+    return Response({'saved': len(selections), 'pending': result['pending']})
+
+
+@csrf_exempt
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def start_regrade(request):
+    """
+    Expect: {"question_ids": [4, 9]}   (empty list = every question)
+    Queues a re-grading job for `manage.py regrade_answers --pending`;
+    poll /api/exams/regrade/<job_id>/ for progress.
+    """
+    serializer = RegradeJobSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    job = serializer.save(created_by=request.user)
+    return Response(RegradeJobSerializer(job).data, status=202)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def regrade_status(request, job_id):
+    job = RegradeJob.objects.filter(id=job_id).first()
+    if job is None:
+        return Response({'detail': 'Regrade job not found'}, status=404)
+    return Response(RegradeJobSerializer(job).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def item_analysis(request, exam_id):
+    """
+    GET /api/exams/item-analysis/<exam_id>/?refresh=1
+    Cached per-question statistics for an exam. `refresh=1` (or no cached
+    result yet) first folds in the sessions finished since the last run.
+    """
+    exam = Exam.objects.filter(id=exam_id).first()
+    if exam is None:
+        return Response({'detail': 'Exam not found'}, status=404)
 
-    answers_data = request.data.get('answers', [])
-    for ans in answers_data:
-        serializer = AnswerSerializer(data=ans)
-        serializer.is_valid(raise_exception=True)
-        Answer.objects.create(
-            session=session,
-            question=serializer.validated_data['question'],
-            selected_option=serializer.validated_data['selected_option'],
-        )
-
-    session.ended_at = timezone.now()
-    session.save()
-
-    correct_count = session.answers.filter(is_correct=True).count()
-    total = session.answers.count()
-    return Response({'correct': correct_count, 'total': total})
+    analysis = ItemAnalysis.objects.filter(exam=exam).first()
+    if analysis is None or analysis.computed_at is None or request.query_params.get('refresh') in ('1', 'true'):
+        analysis = analyze_exam(exam)
+    return Response({
+        'exam_id': exam.id,
+        'sessions': analysis.sessions,
+        'computed_at': analysis.computed_at,
+        'items': analysis.results,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def active_sessions(request):
+    """
+    GET /api/exams/active-sessions/?exam=<id>
+    Open sessions (overall or for one exam), and how many of those are past
+    their expiry and waiting for the closer. Both counts use the open-session indexes.
+    """
+    exam_id = request.query_params.get('exam')
+    if exam_id is not None and not exam_id.isdigit():
+        return Response({'detail': 'exam must be an id'}, status=400)
+    qs = open_sessions(int(exam_id) if exam_id else None)
+    return Response({'open': qs.count(), 'expired': qs.filter(expires_at__lte=timezone.now()).count()})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def leaderboard(request, exam_id):
+    """
+    GET /api/exams/leaderboard/<exam_id>/?limit=<n>
+    The exam's best finished sessions by stored score (limit defaults to 20, max 100).
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', LEADERBOARD_SIZE)), LEADERBOARD_MAX_SIZE))
+    except ValueError:
+        return Response({'detail': 'limit must be an integer'}, status=400)
+    if not Exam.objects.filter(id=exam_id).exists():
+        return Response({'detail': 'Exam not found'}, status=404)
+    return Response({'exam_id': exam_id, 'results': top(exam_id, limit)})
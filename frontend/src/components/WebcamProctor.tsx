@@ -8,11 +8,37 @@ import "../styles/webcamProctor.css";
 
 const FRAME_INTERVAL_MS = 1200; 
 const AGGREGATION_WINDOW_MS = 30_000; 
+// socket reconnects back off (1, 2, 4... flush ticks) and stop for the session after this many
+// failed attempts in a row; batches keep going over HTTP meanwhile
+const MAX_SOCKET_FAILURES = 5;
 
 function nowIso() {
   return new Date().toISOString();
 }
 
+// idempotency key for one flush; a retry reuses it so the server applies it once
+function newBatchId(): string {
+  if (typeof crypto !== "undefined" && "randomUUID" in crypto) return crypto.randomUUID();
+  return "xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx".replace(/[xy]/g, (c) => {
+    const r = (Math.random() * 16) | 0;
+    return (c === "x" ? r : (r & 0x3) | 0x8).toString(16);
+  });
+}
+
+type BatchPayload = {
+  exam_id: number;
+  batch_id: string;
+  events: { event_type: string; count: number; first_ts: string; last_ts: string }[];
+};
+
+// ws(s)://<api host>/ws/proctor/ derived from the axios baseURL
+function proctorSocketUrl() {
+  const base = new URL(client.defaults.baseURL || window.location.origin, window.location.origin);
+  base.protocol = base.protocol === "https:" ? "wss:" : "ws:";
+  base.pathname = "/ws/proctor/";
+  return base.toString();
+}
+
 type WebcamProctorProps = {
   sessionId: number | null;
   onAnomaly?: (a: any) => void; 
@@ -37,6 +63,17 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
   const batchMapRef = useRef<Record<string, any>>({});
   const flushTimerRef = useRef<number | null>(null);
 
+  // streaming ingest channel; HTTP batch POST is the fallback while it is not ready
+  const socketRef = useRef<WebSocket | null>(null);
+  const socketReadyRef = useRef(false);
+  const seqRef = useRef(0);
+  const socketFailuresRef = useRef(0);
+  const socketRetryAtRef = useRef(0);
+
+  // flushes not yet acknowledged; retried on the next tick with the same batch_id
+  const pendingRef = useRef<BatchPayload[]>([]);
+  const inflightRef = useRef<Record<number, BatchPayload>>({}); // websocket seq -> payload
+
   const [cameraOn, setCameraOn] = useState(false);
   const [modelsReady, setModelsReady] = useState(false);
   const [loadingModels, setLoadingModels] = useState(true);
@@ -88,6 +125,7 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
       setCameraOn(true);
       onCameraStatusChange?.(true);
       startFrameLoop();
+      openSocket();
       startFlushTimer(); // start 30s aggregation timer
     } catch (err) {
       console.error("Error starting camera", err);
@@ -107,7 +145,61 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
     stopFrameLoop();
     stopFlushTimer();
     // flush any remaining batch immediately when camera stops
-    flushBatch().catch((e) => console.error("flushBatch on stop failed:", e));
+    flushBatch()
+      .catch((e) => console.error("flushBatch on stop failed:", e))
+      .finally(closeSocket);
+  };
+
+  // websocket: authenticate once, then stream batches and receive aggregates back
+  const openSocket = () => {
+    if (socketRef.current || typeof WebSocket === "undefined") return;
+    if (socketFailuresRef.current >= MAX_SOCKET_FAILURES || Date.now() < socketRetryAtRef.current) return;
+    const token = localStorage.getItem("accessToken");
+    if (!token) return;
+    const socketFailed = () => {
+      socketFailuresRef.current += 1;
+      socketRetryAtRef.current = Date.now() + AGGREGATION_WINDOW_MS * 2 ** (socketFailuresRef.current - 1);
+    };
+    try {
+      const ws = new WebSocket(proctorSocketUrl());
+      socketRef.current = ws;
+      ws.onopen = () => ws.send(JSON.stringify({ type: "auth", token }));
+      ws.onmessage = (msg) => {
+        const data = JSON.parse(msg.data);
+        if (data.type === "ready") {
+          socketReadyRef.current = true;
+          socketFailuresRef.current = 0;
+          return;
+        }
+        const payload = data.seq != null ? inflightRef.current[data.seq] : undefined;
+        if (data.seq != null) delete inflightRef.current[data.seq];
+        if (data.type === "ack" && data.aggregates) {
+          onAnomalyAggregated?.(data.aggregates);
+        } else if (data.type === "error") {
+          console.error("Proctor socket error", data);
+          // transient server failure: resend with the same batch_id on the next tick
+          if (data.retry && payload) pendingRef.current.push(payload);
+        }
+      };
+      ws.onclose = () => {
+        // closed before it was ever ready (no ASGI server, proxy without upgrades...): back off
+        if (!socketReadyRef.current && socketRef.current === ws) socketFailed();
+        socketRef.current = null;
+        socketReadyRef.current = false;
+        // unacknowledged batches go back to the retry queue
+        pendingRef.current.push(...Object.values(inflightRef.current));
+        inflightRef.current = {};
+      };
+    } catch (err) {
+      console.error("Proctor socket failed to open", err);
+      socketRef.current = null;
+      socketFailed();
+    }
+  };
+  const closeSocket = () => {
+    socketRef.current?.close();
+    socketRef.current = null;
+    socketReadyRef.current = false;
   };
 
   // frame loop
@@ -126,6 +218,7 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
   const startFlushTimer = () => {
     if (flushTimerRef.current != null) return;
     flushTimerRef.current = window.setInterval(() => {
+      openSocket(); // reconnect if the socket dropped; no-op while it is open
       flushBatch().catch((e) => console.error("flushBatch failed:", e));
     }, AGGREGATION_WINDOW_MS);
   };
@@ -182,7 +275,10 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
   const flushBatch = async () => {
     const map = batchMapRef.current;
     const keys = Object.keys(map);
-    if (keys.length === 0) return; // nothing to do
+    if (keys.length === 0) {
+      await sendPending(); // nothing new, but retry anything still unacknowledged
+      return;
+    }
 
     // prepare events array
     const events = keys.map((k) => ({
@@ -197,18 +293,47 @@ const WebcamProctor: React.FC<WebcamProctorProps> = ({
 
     if (!sessionId) return;
 
+    pendingRef.current.push({
+      exam_id: sessionId, // <-- use sessionId here
+      batch_id: newBatchId(),
+      events,
+    });
+    await sendPending();
+  };
+
+  // send queued batches in order; stop at the first one that fails and keep the rest for next tick
+  const sendPending = async () => {
+    const queue = pendingRef.current;
+    pendingRef.current = [];
+    for (let i = 0; i < queue.length; i++) {
+      if (!(await sendBatch(queue[i]))) {
+        pendingRef.current.push(...queue.slice(i));
+        return;
+      }
+    }
+  };
+
+  // true when the batch is delivered (or rejected as invalid, which a retry won't fix)
+  const sendBatch = async (payload: BatchPayload): Promise<boolean> => {
+    const ws = socketRef.current;
+    if (ws && socketReadyRef.current && ws.readyState === WebSocket.OPEN) {
+      seqRef.current += 1;
+      inflightRef.current[seqRef.current] = payload;
+      ws.send(JSON.stringify({ type: "batch", seq: seqRef.current, ...payload }));
+      return true;
+    }
+
     try {
-      const payload = {
-        exam_id: sessionId, // <-- use sessionId here
-        events,
-      };
       // IMPORTANT: do not prefix with /api (axios baseURL already includes it)
       const res = await client.post("/proctor/anomaly/batch/", payload);
       if (res && res.data) {
         onAnomalyAggregated?.(res.data.aggregates || []);
       }
-    } catch (err) {
+      return true;
+    } catch (err: any) {
       console.error("Error flushing anomaly batch", err);
+      const code = err?.response?.status;
+      return code != null && code >= 400 && code < 500 && code !== 408 && code !== 429;
     }
   };
 
@@ -1,5 +1,6 @@
 // src/pages/ExamDashboard.tsx
 import { useEffect, useState } from "react";
+import { useSearchParams } from "react-router-dom";
 import client from "../api/axiosClient";
 import WebcamProctor from "../components/WebcamProctor";
 import AnomalyAlertBox from "../components/AnomalyAlertBox";
@@ -14,7 +15,12 @@ interface Question {
   option_d?: string;
 }
 
+const HEARTBEAT_INTERVAL_MS = 30000;
+const QUESTIONS_PAGE_SIZE = 50;
+
 const ExamDashboard: React.FC = () => {
+  const [searchParams] = useSearchParams();
+  const examId = Number(searchParams.get("exam")) || null; // /exam?exam=<id>
   const [questions, setQuestions] = useState<Question[]>([]);
   const [sessionId, setSessionId] = useState<number | null>(null);
   const [anomalies, setAnomalies] = useState<any[]>([]);
@@ -22,16 +28,36 @@ const ExamDashboard: React.FC = () => {
   useEffect(() => {
     const initExam = async () => {
       try {
-        const qRes = await client.get("/exams/questions/");
-        setQuestions(qRes.data || []);
-        const sRes = await client.post("/exams/start/");
-        setSessionId(sRes.data.id);
+        const sRes = await client.post("/exams/start/", examId ? { exam_id: examId } : {});
+        const id: number = sRes.data.id;
+        setSessionId(id);
+
+        // only this session's drawn questions, page by page in their shuffled order
+        const drawn: Question[] = [];
+        let page: number | null = 1;
+        while (page) {
+          const qRes = await client.get(`/exams/${id}/questions/`, {
+            params: { page, page_size: QUESTIONS_PAGE_SIZE },
+          });
+          drawn.push(...qRes.data.results);
+          page = qRes.data.next_page;
+        }
+        setQuestions(drawn);
       } catch (err) {
         console.error("initExam error", err);
       }
     };
     initExam();
-  }, []);
+  }, [examId]);
+
+  // keeps the session open server-side; without it the session is auto-closed
+  useEffect(() => {
+    if (!sessionId) return;
+    const timer = window.setInterval(() => {
+      client.post(`/exams/${sessionId}/heartbeat/`).catch((err) => console.error("heartbeat error", err));
+    }, HEARTBEAT_INTERVAL_MS);
+    return () => window.clearInterval(timer);
+  }, [sessionId]);
 
   const handleNewAnomaly = (anomaly: any) => {
     setAnomalies((prev) => [anomaly, ...prev]);
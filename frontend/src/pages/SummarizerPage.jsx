@@ -3,6 +3,10 @@ import { useLocation } from "react-router-dom";
 import client from "../api/axiosClient";
 import "../styles/summarizerPage.css";
 
+// streaming needs the backend served by backend.asgi; enable it per deployment
+// with VITE_SUMMARIZER_STREAMING=true (the server answers 501 under WSGI)
+const STREAMING = import.meta.env.VITE_SUMMARIZER_STREAMING === "true";
+
 function useQuery() {
   return new URLSearchParams(useLocation().search);
 }
@@ -15,16 +19,51 @@ const SummarizerPage = () => {
   const [summary, setSummary] = useState("");
   const [loading, setLoading] = useState(false);
 
+  const summarizeOnce = async () => {
+    const res = await client.post("/summarizer/summarize/", {
+      email,
+      text,
+      tokens,
+    });
+    setSummary(res.data.summary);
+  };
+
+  // Server-Sent Events from the streaming endpoint: "delta" pieces as the
+  // model writes them, then "done" whose summary is final (it replaces the
+  // pieces when the server fell back to an extractive summary).
+  // Returns false when the server cannot stream, before anything was shown.
+  const summarizeStreaming = async () => {
+    const res = await fetch(`${client.defaults.baseURL}/summarizer/summarize/stream/`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ email, text, tokens }),
+    });
+    if (res.status === 501 || res.status === 404) return false;
+    if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      let end;
+      while ((end = buffer.indexOf("\n\n")) >= 0) {
+        const lines = buffer.slice(0, end).split("\n");
+        buffer = buffer.slice(end + 2);
+        const event = lines.find((l) => l.startsWith("event: "))?.slice(7);
+        const data = JSON.parse(lines.find((l) => l.startsWith("data: "))?.slice(6) || "{}");
+        if (event === "delta") setSummary((prev) => prev + data.text);
+        if (event === "done") setSummary(data.summary);
+      }
+    }
+    return true;
+  };
+
   const handleSummarize = async () => {
     setLoading(true);
     setSummary("");
     try {
-      const res = await client.post("/summarizer/summarize/", {
-        email,
-        text,
-        tokens,
-      });
-      setSummary(res.data.summary);
+      if (!STREAMING || !(await summarizeStreaming())) await summarizeOnce();
     } catch (err) {
       setSummary("Error while summarizing.");
     } finally {
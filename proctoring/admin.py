@@ -1,13 +1,30 @@
 from django.contrib import admin
-from .models import ProctorAnomaly, ProctorAnomalyAggregate
+from .models import ProctorAnomaly, ProctorAnomalyAggregate, ProctorAnomalyRollup, ProctorRiskScore, ProctorExamCounter
 
 @admin.register(ProctorAnomaly)
 class ProctorAnomalyAdmin(admin.ModelAdmin):
     list_display = ("user", "exam_id", "event_type", "timestamp", "created_at")
     list_filter = ("event_type", "exam_id")
     search_fields = ("user__username", "message")
+    ordering = ("-created_at",)
 
 @admin.register(ProctorAnomalyAggregate)
 class ProctorAnomalyAggregateAdmin(admin.ModelAdmin):
     list_display = ("user", "exam_id", "event_type", "count", "last_seen")
     search_fields = ("user__username",)
+
+@admin.register(ProctorAnomalyRollup)
+class ProctorAnomalyRollupAdmin(admin.ModelAdmin):
+    list_display = ("user", "exam_id", "event_type", "granularity", "bucket_start", "count")
+    list_filter = ("granularity", "event_type")
+    search_fields = ("user__username",)
+
+@admin.register(ProctorRiskScore)
+class ProctorRiskScoreAdmin(admin.ModelAdmin):
+    list_display = ("user", "exam_id", "log_score", "event_count", "last_event_at")
+    search_fields = ("user__username",)
+
+@admin.register(ProctorExamCounter)
+class ProctorExamCounterAdmin(admin.ModelAdmin):
+    list_display = ("exam_id", "event_type", "shard", "count", "candidates", "last_seen")
+    list_filter = ("event_type",)
@@ -0,0 +1,249 @@
+# proctoring/buffer.py
+"""
+Write-behind ingest buffer for proctoring anomalies.
+
+With PROCTOR_INGEST_MODE = "buffered" the anomaly views only validate and
+append records here; `manage.py drain_proctor_buffer` moves them into the
+database in large coalesced batches (see proctoring.ingest.apply_records).
+
+Two backends share the same small interface:
+  - RedisStreamBuffer: a Redis stream, used when PROCTOR_BUFFER_REDIS_URL is
+    set and the `redis` package is installed.
+  - FileBuffer: an append-only JSON-lines log on local disk.
+
+Delivery is at-least-once: a drainer that dies between the DB commit and the
+ack will replay the last chunk on restart. An acknowledged record survives a
+host crash only if the backend persisted it: FileBuffer fsyncs each append
+while PROCTOR_BUFFER_FSYNC is on (off = best-effort, process crashes only);
+for Redis that depends on the server's AOF/fsync configuration.
+"""
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+
+class BufferFull(Exception):
+    """Raised by append() when the buffer is over its configured limit."""
+
+
+def buffering_enabled():
+    return getattr(settings, "PROCTOR_INGEST_MODE", "sync") == "buffered"
+
+
+# XLEN check and XADD in one script, so concurrent writers cannot overshoot max_pending
+# (XADD MAXLEN would trim undrained records instead of refusing new ones)
+APPEND_SCRIPT = """
+local limit = tonumber(ARGV[1])
+if limit > 0 and redis.call('XLEN', KEYS[1]) >= limit then
+    return false
+end
+return redis.call('XADD', KEYS[1], '*', 'r', ARGV[2])
+"""
+
+
+class RedisStreamBuffer:
+    backend = "redis"
+
+    def __init__(self, url, stream_key, max_pending):
+        self.client = redis.Redis.from_url(url)
+        self.stream_key = stream_key
+        self.max_pending = max_pending
+        self._append = self.client.register_script(APPEND_SCRIPT)
+
+    def append(self, record):
+        added = self._append(keys=[self.stream_key], args=[self.max_pending or 0, json.dumps(record)])
+        if added is None:
+            raise BufferFull()
+
+    def read(self, limit):
+        entries = self.client.xrange(self.stream_key, "-", "+", count=limit)
+        ids = [entry_id for entry_id, _ in entries]
+        records = [json.loads(fields[b"r"]) for _, fields in entries]
+        return ids, records
+
+    def ack(self, token):
+        if token:
+            self.client.xdel(self.stream_key, *token)
+
+    def stats(self):
+        pending = self.client.xlen(self.stream_key)
+        lag = 0.0
+        if pending:
+            oldest = self.client.xrange(self.stream_key, "-", "+", count=1)
+            if oldest:
+                # stream ids are "<ms since epoch>-<seq>"
+                oldest_ms = int(oldest[0][0].split(b"-")[0])
+                lag = max(0.0, time.time() - oldest_ms / 1000)
+        return {"backend": self.backend, "pending": pending, "lag_seconds": round(lag, 3)}
+
+
+class FileBuffer:
+    """
+    Writers append one JSON line per record to `current.log` under a shared
+    lock. The drainer takes the exclusive lock only to rename `current.log`
+    into a sealed `segment-*.log`, then reads sealed segments in order,
+    checkpointing its byte offset after every committed chunk.
+    """
+    backend = "file"
+
+    CURRENT = "current.log"
+
+    def __init__(self, directory, max_bytes, fsync=True):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock_path = self.dir / ".lock"
+
+    def _lock(self, mode):
+        fh = open(self.lock_path, "a")
+        fcntl.flock(fh, mode)
+        return fh
+
+    def _segments(self):
+        return sorted(p for p in self.dir.glob("segment-*.log"))
+
+    def _pending_bytes(self):
+        total = 0
+        for entry in os.scandir(self.dir):
+            if entry.name.endswith(".log"):
+                total += entry.stat().st_size
+        return total
+
+    def append(self, record):
+        if self.max_bytes and self._pending_bytes() >= self.max_bytes:
+            raise BufferFull()
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode()
+        lock = self._lock(fcntl.LOCK_SH)
+        try:
+            path = self.dir / self.CURRENT
+            created = not path.exists()
+            # O_APPEND keeps concurrent single-write appends from interleaving
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                if self.fsync:
+                    os.fsync(fd)  # on disk before the request is acknowledged
+            finally:
+                os.close(fd)
+            if self.fsync and created:
+                self._fsync_dir()  # and the new file's directory entry with it
+        finally:
+            lock.close()
+
+    def _fsync_dir(self):
+        fd = os.open(self.dir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _seal_current(self):
+        current = self.dir / self.CURRENT
+        lock = self._lock(fcntl.LOCK_EX)
+        try:
+            if current.exists() and current.stat().st_size:
+                current.rename(self.dir / f"segment-{time.time_ns():020d}.log")
+        finally:
+            lock.close()
+
+    def _checkpoint_path(self, segment):
+        return segment.with_suffix(".ckpt")
+
+    def _read_offset(self, segment):
+        try:
+            return int(self._checkpoint_path(segment).read_text() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, limit):
+        segments = self._segments()
+        if not segments:
+            self._seal_current()
+            segments = self._segments()
+        if not segments:
+            return None, []
+
+        segment = segments[0]
+        offset = self._read_offset(segment)
+        records = []
+        with open(segment, "rb") as fh:
+            fh.seek(offset)
+            while len(records) < limit:
+                line = fh.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):
+                    # torn tail from a crash mid-write; drop it
+                    fh.seek(0, os.SEEK_END)
+                    break
+                records.append(json.loads(line))
+            end = fh.tell()
+            at_eof = not fh.read(1)
+        return (segment, end, at_eof), records
+
+    def ack(self, token):
+        if not token:
+            return
+        segment, end, at_eof = token
+        if at_eof:
+            segment.unlink(missing_ok=True)
+            self._checkpoint_path(segment).unlink(missing_ok=True)
+        else:
+            tmp = self._checkpoint_path(segment).with_suffix(".ckpt.tmp")
+            tmp.write_text(str(end))
+            os.replace(tmp, self._checkpoint_path(segment))
+
+    def stats(self):
+        files = self._segments()
+        current = self.dir / self.CURRENT
+        if current.exists():
+            files.append(current)
+        lag = 0.0
+        for path in files:
+            offset = self._read_offset(path) if path != current else 0
+            with open(path, "rb") as fh:
+                fh.seek(offset)
+                line = fh.readline()
+            if line.endswith(b"\n"):
+                lag = max(0.0, time.time() - json.loads(line).get("ts", time.time()))
+                break
+        return {"backend": self.backend, "pending_bytes": self._pending_bytes(), "lag_seconds": round(lag, 3)}
+
+
+_buffer = None
+
+
+def get_buffer():
+    """Process-wide buffer chosen from settings (Redis when configured and importable)."""
+    global _buffer
+    if _buffer is None:
+        url = getattr(settings, "PROCTOR_BUFFER_REDIS_URL", None)
+        if url and redis is not None:
+            _buffer = RedisStreamBuffer(
+                url,
+                getattr(settings, "PROCTOR_BUFFER_STREAM_KEY", "proctoring:anomalies"),
+                getattr(settings, "PROCTOR_BUFFER_MAX_PENDING", 200_000),
+            )
+        else:
+            _buffer = FileBuffer(
+                getattr(settings, "PROCTOR_BUFFER_DIR", settings.BASE_DIR / "var" / "proctor_buffer"),
+                getattr(settings, "PROCTOR_BUFFER_MAX_BYTES", 256 * 1024 * 1024),
+                getattr(settings, "PROCTOR_BUFFER_FSYNC", True),
+            )
+    return _buffer
+
+
+def reset_buffer():
+    """Drop the cached backend (tests / settings changes)."""
+    global _buffer
+    _buffer = None
@@ -0,0 +1,433 @@
+# proctoring/ingest.py
+"""
+Set-based write path for proctoring anomaly batches.
+
+A flush from the webcam proctor is folded into one entry per event type and
+written with a fixed number of statements inside a single transaction:
+a locking read of the candidate's existing aggregates, one conflict-aware
+upsert on ProctorAnomalyAggregate, one upsert of the sharded per-exam
+counters (see proctoring.summary) and one bulk insert of ProctorAnomaly log
+rows.
+
+Whether a batch brings a new event type or a new candidate to the exam
+counters is decided by INSERT ... ON CONFLICT DO NOTHING RETURNING (see
+insert_missing) rather than by reading first. Two flushes racing on the same
+new key then still count it once.
+"""
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ProctorAnomaly, ProctorAnomalyAggregate, ProctorBatchReceipt, ProctorExamCandidate
+from .scoring import update_scores
+from .summary import bump_counters, counter_rows
+
+# keeps each upsert statement well under the bind-parameter limit
+UPSERT_CHUNK_SIZE = 500
+
+
+def _earliest(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a, b)
+
+
+def _latest(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+def coalesce_events(events):
+    """
+    Merge validated batch events sharing an event_type (counts summed,
+    window widened) so one upsert never has to touch the same row twice.
+    First-seen order is kept for the response.
+    """
+    merged = {}
+    for ev in events:
+        event_type = ev["event_type"]
+        cur = merged.get(event_type)
+        if cur is None:
+            merged[event_type] = {
+                "event_type": event_type,
+                "count": ev.get("count") or 0,
+                "first_ts": ev.get("first_ts"),
+                "last_ts": ev.get("last_ts"),
+            }
+            continue
+        cur["count"] += ev.get("count") or 0
+        cur["first_ts"] = _earliest(cur["first_ts"], ev.get("first_ts"))
+        cur["last_ts"] = _latest(cur["last_ts"], ev.get("last_ts"))
+    return list(merged.values())
+
+
+def upsert_increment(model, key_fields, rows, now=None, add_fields=("count",)):
+    """
+    rows: iterable of (*key_values, *add_values, last_seen) for `model`, which
+    must have the `add_fields` columns, a `last_seen` column and a unique
+    constraint on `key_fields`.
+
+    Inserts missing rows and, on conflict, adds each of `add_fields` and
+    moves `last_seen` forward (never back). Keys must be unique within one
+    call. A `created_at` column, if the model has one, is filled with `now`
+    on insert.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    now = now or timezone.now()
+
+    opts = model._meta
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    with_created = any(f.name == "created_at" for f in opts.concrete_fields)
+    table = qn(opts.db_table)
+    key_cols = [qn(opts.get_field(name).column) for name in key_fields]
+    add_cols = [qn(opts.get_field(name).column) for name in add_fields]
+    seen_col = qn("last_seen")
+    cols = key_cols + add_cols + [seen_col] + ([qn("created_at")] if with_created else [])
+
+    sql_head = f"INSERT INTO {table} ({', '.join(cols)}) VALUES "
+    sql_tail = (
+        f" ON CONFLICT ({', '.join(key_cols)}) DO UPDATE SET "
+        + "".join(f"{col} = {table}.{col} + EXCLUDED.{col}, " for col in add_cols)
+        + f"{seen_col} = CASE "
+        f"WHEN EXCLUDED.{seen_col} IS NULL THEN {table}.{seen_col} "
+        f"WHEN {table}.{seen_col} IS NULL OR EXCLUDED.{seen_col} > {table}.{seen_col} "
+        f"THEN EXCLUDED.{seen_col} "
+        f"ELSE {table}.{seen_col} END"
+    )
+    placeholder = "(" + ", ".join(["%s"] * len(cols)) + ")"
+    n_keys = len(key_fields)
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+            params = []
+            for row in chunk:
+                keys, adds, last_seen = row[:n_keys], row[n_keys:-1], row[-1]
+                params.extend(adapt(k) if isinstance(k, datetime) else k for k in keys)
+                params.extend(adds)
+                params.append(adapt(last_seen))
+                if with_created:
+                    params.append(adapt(now))
+            sql = sql_head + ", ".join([placeholder] * len(chunk)) + sql_tail
+            cursor.execute(sql, params)
+
+
+def insert_missing(model, key_fields, keys, values=None):
+    """
+    Insert a `model` row for each of `keys` (tuples of `key_fields` values,
+    unique within the call) that does not exist yet, with the other columns
+    from `values` ({field name: value}). Returns the set of keys this call
+    inserted. A concurrent insert of the same key waits for this transaction,
+    so exactly one of them gets the key back.
+    """
+    keys = list(keys)
+    if not keys:
+        return set()
+    values = values or {}
+
+    opts = model._meta
+    qn = connection.ops.quote_name
+    adapt = connection.ops.adapt_datetimefield_value
+    key_cols = [qn(opts.get_field(name).column) for name in key_fields]
+    value_cols = [qn(opts.get_field(name).column) for name in values]
+    value_params = [adapt(v) if isinstance(v, datetime) else v for v in values.values()]
+    placeholder = "(" + ", ".join(["%s"] * (len(key_cols) + len(value_cols))) + ")"
+    table = qn(opts.db_table)
+
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), UPSERT_CHUNK_SIZE):
+            chunk = keys[start:start + UPSERT_CHUNK_SIZE]
+            params = []
+            for key in chunk:
+                params.extend(key)
+                params.extend(value_params)
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(key_cols + value_cols)}) VALUES "
+                + ", ".join([placeholder] * len(chunk))
+                + f" ON CONFLICT ({', '.join(key_cols)}) DO NOTHING RETURNING {', '.join(key_cols)}",
+                params,
+            )
+            inserted.update(tuple(row) for row in cursor.fetchall())
+    return inserted
+
+
+def claim_new_keys(pairs, type_keys, now=None):
+    """
+    pairs: (user_id, exam_id) with events in this write; type_keys: their
+    (user_id, exam_id, event_type). Creates the missing aggregate rows (count
+    0, incremented right after) and ProctorExamCandidate rows, and returns
+    (new type keys, new pairs): what this write is the first to bring.
+    """
+    now = now or timezone.now()
+    new_types = insert_missing(
+        ProctorAnomalyAggregate, ("user", "exam_id", "event_type"), type_keys,
+        values={"count": 0, "created_at": now},
+    )
+    return new_types, insert_missing(ProctorExamCandidate, ("user", "exam_id"), pairs)
+
+
+def upsert_aggregates(rows, now=None):
+    """
+    rows: iterable of (user_id, exam_id, event_type, count, last_seen),
+    applied to ProctorAnomalyAggregate on its (user, exam_id, event_type) key.
+    """
+    upsert_increment(ProctorAnomalyAggregate, ("user", "exam_id", "event_type"), rows, now=now)
+
+
+def build_log_row(user_id, exam_id, ev):
+    """One ProctorAnomaly log row per coalesced event (None if it has no timestamp)."""
+    if not ev.get("last_ts"):
+        return None
+    first_ts = ev["first_ts"].isoformat() if ev.get("first_ts") else None
+    return ProctorAnomaly(
+        user_id=user_id,
+        exam_id=exam_id,
+        event_type=ev["event_type"],
+        timestamp=ev["last_ts"],
+        count=ev["count"],
+        message=f"Batch reported: count={ev['count']}, window_first={first_ts}, "
+                f"window_last={ev['last_ts'].isoformat()}",
+    )
+
+
+def receipt_cache_key(user_id, exam_id, batch_id, suffix="done"):
+    return f"proctor:batch:{user_id}:{exam_id}:{batch_id}:{suffix}"
+
+
+def record_batch(user, exam_id, events, batch_id=None):
+    """
+    Apply one client flush for `user` in a single transaction and return the
+    updated aggregates payload, one entry per event type in first-seen order.
+    Also folds the batch into the candidate's running risk score and the
+    exam's summary counters.
+    Costs the same number of queries however many events the batch holds.
+
+    With a `batch_id` the flush is idempotent: a replay is answered from the
+    cache, or, once that has expired, from its ProctorBatchReceipt (the
+    receipt insert conflicts and the replayed writes roll back).
+    """
+    if batch_id:
+        cache_key = receipt_cache_key(user.pk, exam_id, batch_id)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return stored
+
+    events = coalesce_events(events)
+    if not events:
+        return []
+
+    try:
+        with transaction.atomic():
+            # read before writing: the locked rows are the base of the response
+            existing = {
+                agg.event_type: agg
+                for agg in ProctorAnomalyAggregate.objects.select_for_update().filter(user=user, exam_id=exam_id)
+            }
+            new_types, new_pairs = claim_new_keys(
+                [(user.pk, exam_id)], [(user.pk, exam_id, ev["event_type"]) for ev in events],
+            )
+            upsert_aggregates(
+                (user.pk, exam_id, ev["event_type"], ev["count"], ev["last_ts"]) for ev in events
+            )
+            update_scores({(user.pk, exam_id): [(ev["event_type"], ev["count"]) for ev in events]})
+            bump_counters(counter_rows(
+                user.pk, exam_id, events, {key[2] for key in new_types}, bool(new_pairs),
+            ))
+            logs = [row for row in (build_log_row(user.pk, exam_id, ev) for ev in events) if row]
+            if logs:
+                ProctorAnomaly.objects.bulk_create(logs)
+            result = []
+            for ev in events:
+                agg = existing.get(ev["event_type"])
+                last_seen = _latest(agg.last_seen if agg else None, ev["last_ts"])
+                result.append({
+                    "event_type": ev["event_type"],
+                    "count": (agg.count if agg else 0) + ev["count"],
+                    "last_seen": last_seen.isoformat() if last_seen else None,
+                })
+            if batch_id:
+                # unique (user, exam_id, batch_id): a concurrent or late replay fails here
+                ProctorBatchReceipt.objects.create(
+                    user=user, exam_id=exam_id, batch_id=batch_id, response=result,
+                )
+    except IntegrityError:
+        receipt = batch_id and ProctorBatchReceipt.objects.filter(
+            user=user, exam_id=exam_id, batch_id=batch_id,
+        ).first()
+        if not receipt:
+            raise
+        result = receipt.response
+
+    if batch_id:
+        cache.set(cache_key, result, timeout=settings.PROCTOR_DEDUPE_WINDOW_SECONDS)
+    return result
+
+
+def claim_buffered_batch(user_id, exam_id, batch_id):
+    """
+    Buffered mode: True if this batch_id has not been queued within the
+    dedupe window (the drainer also skips batch_ids that already have a receipt).
+    """
+    if not batch_id:
+        return True
+    return cache.add(
+        receipt_cache_key(user_id, exam_id, batch_id, "queued"), True,
+        timeout=settings.PROCTOR_DEDUPE_WINDOW_SECONDS,
+    )
+
+
+def release_buffered_batch(user_id, exam_id, batch_id):
+    """Undo claim_buffered_batch when the record could not be queued, so the retry is accepted."""
+    if batch_id:
+        cache.delete(receipt_cache_key(user_id, exam_id, batch_id, "queued"))
+
+
+# --- write-behind records (see proctoring.buffer) ---
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def batch_record(user_id, exam_id, events, batch_id=None):
+    """JSON-safe buffer record for a validated batch flush."""
+    return {
+        "kind": "batch",
+        "user_id": user_id,
+        "exam_id": exam_id,
+        "batch_id": str(batch_id) if batch_id else None,
+        "events": [
+            {"event_type": ev["event_type"], "count": ev["count"],
+             "first_ts": _iso(ev.get("first_ts")), "last_ts": _iso(ev.get("last_ts"))}
+            for ev in events
+        ],
+        "ts": time.time(),
+    }
+
+
+def anomaly_record(user_id, validated):
+    """JSON-safe buffer record for a single validated anomaly."""
+    return {
+        "kind": "anomaly",
+        "user_id": user_id,
+        "exam_id": validated["exam_id"],
+        "event_type": validated["event_type"],
+        "timestamp": _iso(validated["timestamp"]),
+        "message": validated.get("message", ""),
+        "ts": time.time(),
+    }
+
+
+def _parse(value):
+    return parse_datetime(value) if value else None
+
+
+def _group_types(totals):
+    """Folded totals -> {(user_id, exam_id): [coalesced event dicts]} for counter_rows."""
+    grouped = {}
+    for (user_id, exam_id, event_type), (count, last_ts) in totals.items():
+        grouped.setdefault((user_id, exam_id), []).append(
+            {"event_type": event_type, "count": count, "last_ts": last_ts}
+        )
+    return grouped
+
+
+def apply_records(records):
+    """
+    Drain a chunk of buffered records in one transaction. Batches from every
+    candidate are folded per (user, exam_id, event_type), so the whole chunk
+    costs one upsert plus one bulk insert of log rows (and one score update
+    and one summary counter upsert).
+    Records for users that no longer exist are dropped.
+    Returns (aggregates_touched, log_rows_written).
+    """
+    user_ids = {rec["user_id"] for rec in records}
+    live_users = set(
+        get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+    ) if user_ids else set()
+
+    # batch ids already applied (receipt exists) or repeated within this chunk are skipped
+    batch_ids = {rec["batch_id"] for rec in records if rec.get("batch_id")}
+    seen = {
+        (user_id, exam_id, str(batch_id))
+        for user_id, exam_id, batch_id in ProctorBatchReceipt.objects.filter(
+            batch_id__in=batch_ids
+        ).values_list("user_id", "exam_id", "batch_id")
+    } if batch_ids else set()
+    receipts = []
+
+    totals = {}
+    scores = {}
+    logs = []
+    for rec in records:
+        user_id = rec["user_id"]
+        if user_id not in live_users:
+            continue
+        if rec.get("batch_id"):
+            key = (user_id, rec["exam_id"], rec["batch_id"])
+            if key in seen:
+                continue
+            seen.add(key)
+            receipts.append(ProctorBatchReceipt(user_id=user_id, exam_id=rec["exam_id"], batch_id=rec["batch_id"]))
+        if rec.get("kind") == "anomaly":
+            logs.append(ProctorAnomaly(
+                user_id=user_id,
+                exam_id=rec["exam_id"],
+                event_type=rec["event_type"],
+                timestamp=_parse(rec["timestamp"]),
+                message=rec.get("message", ""),
+            ))
+            continue
+
+        events = coalesce_events([
+            {"event_type": ev["event_type"], "count": ev["count"],
+             "first_ts": _parse(ev.get("first_ts")), "last_ts": _parse(ev.get("last_ts"))}
+            for ev in rec["events"]
+        ])
+        scores.setdefault((user_id, rec["exam_id"]), []).extend(
+            (ev["event_type"], ev["count"]) for ev in events
+        )
+        for ev in events:
+            key = (user_id, rec["exam_id"], ev["event_type"])
+            cur = totals.get(key)
+            if cur is None:
+                totals[key] = [ev["count"], ev["last_ts"]]
+            else:
+                cur[0] += ev["count"]
+                cur[1] = _latest(cur[1], ev["last_ts"])
+            row = build_log_row(user_id, rec["exam_id"], ev)
+            if row:
+                logs.append(row)
+
+    with transaction.atomic():
+        grouped = _group_types(totals)
+        new_types, new_pairs = claim_new_keys(list(grouped), list(totals))
+        fresh = {}
+        for user_id, exam_id, event_type in new_types:
+            fresh.setdefault((user_id, exam_id), set()).add(event_type)
+        counters = []
+        for pair, types in grouped.items():
+            counters.extend(counter_rows(*pair, types, fresh.get(pair, set()), pair in new_pairs))
+
+        upsert_aggregates(key + tuple(val) for key, val in totals.items())
+        update_scores(scores)
+        bump_counters(counters)
+        if logs:
+            ProctorAnomaly.objects.bulk_create(logs, batch_size=1000)
+        if receipts:
+            ProctorBatchReceipt.objects.bulk_create(receipts, batch_size=1000, ignore_conflicts=True)
+    return len(totals), len(logs)
@@ -0,0 +1,108 @@
+import io
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from proctoring import wire
+from proctoring.serializers import AnomalyBatchSerializer
+
+
+def make_batch(n):
+    now = timezone.now()
+    types = list(wire.EVENT_TYPE_CODES)
+    return [
+        {
+            "event_type": types[i % len(types)],
+            "count": 25,
+            "first_ts": now - timedelta(seconds=30, milliseconds=i),
+            "last_ts": now - timedelta(milliseconds=i),
+        }
+        for i in range(n)
+    ]
+
+
+def as_json_body(exam_id, events):
+    # what the frontend sends today: ISO strings with a trailing Z
+    return json.dumps({
+        "exam_id": exam_id,
+        "events": [
+            {**ev, "first_ts": ev["first_ts"].isoformat().replace("+00:00", "Z"),
+             "last_ts": ev["last_ts"].isoformat().replace("+00:00", "Z")}
+            for ev in events
+        ],
+    }).encode()
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+class Command(BaseCommand):
+    help = "Compare JSON and packed binary anomaly batches: bytes on the wire and parse/validate time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,4,16,64,256", help="Comma-separated events per batch.")
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--json", action="store_true", help="Emit machine-readable results.")
+
+    def handle(self, *args, **opts):
+        iterations = opts["iterations"]
+        json_parser, bin_parser = JSONParser(), wire.ProctorBatchParser()
+        json_renderer, bin_renderer = JSONRenderer(), wire.ProctorBatchRenderer()
+        results = []
+
+        for n in [int(x) for x in opts["sizes"].split(",") if x]:
+            events = make_batch(n)
+            json_body = as_json_body(123, events)
+            bin_body = wire.encode_batch(123, events)
+            aggregates = {"aggregates": [
+                {"event_type": ev["event_type"], "count": ev["count"], "last_seen": ev["last_ts"].isoformat()}
+                for ev in events[:len(wire.EVENT_TYPE_CODES)]
+            ]}
+
+            def validate(parsed):
+                s = AnomalyBatchSerializer(data=parsed)
+                s.is_valid(raise_exception=True)
+
+            results.append({
+                "events": n,
+                "request_bytes": {"json": len(json_body), "binary": len(bin_body)},
+                "response_bytes": {
+                    "json": len(json_renderer.render(aggregates)),
+                    "binary": len(bin_renderer.render(aggregates)),
+                },
+                "parse_us": {
+                    "json": round(per_call_us(lambda: json_parser.parse(io.BytesIO(json_body)), iterations), 2),
+                    "binary": round(per_call_us(lambda: bin_parser.parse(io.BytesIO(bin_body)), iterations), 2),
+                },
+                "parse_validate_us": {
+                    "json": round(per_call_us(
+                        lambda: validate(json_parser.parse(io.BytesIO(json_body))), max(1, iterations // 10)), 2),
+                    "binary": round(per_call_us(
+                        lambda: validate(bin_parser.parse(io.BytesIO(bin_body))), max(1, iterations // 10)), 2),
+                },
+            })
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({"iterations": iterations, "results": results}, indent=2))
+            return
+
+        self.stdout.write(f"{'events':>6} {'req json':>9} {'req bin':>8} {'resp json':>9} {'resp bin':>8} "
+                          f"{'parse json us':>13} {'parse bin us':>12} {'+validate json':>14} {'+validate bin':>13}")
+        for r in results:
+            self.stdout.write(
+                f"{r['events']:>6} {r['request_bytes']['json']:>9} {r['request_bytes']['binary']:>8} "
+                f"{r['response_bytes']['json']:>9} {r['response_bytes']['binary']:>8} "
+                f"{r['parse_us']['json']:>13} {r['parse_us']['binary']:>12} "
+                f"{r['parse_validate_us']['json']:>14} {r['parse_validate_us']['binary']:>13}"
+            )
+        self.stdout.write("note: binary parse already decodes timestamps to datetimes; "
+                          "JSON defers that to validation, so compare the +validate columns for CPU.")
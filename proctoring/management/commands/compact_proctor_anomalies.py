@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from proctoring.rollups import apply_retention, compact_chunk
+
+
+class Command(BaseCommand):
+    help = "Fold new ProctorAnomaly rows into minute/hour rollups and apply raw-row retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=settings.PROCTOR_COMPACTION_CHUNK_SIZE,
+                            help="Raw rows folded (or deleted) per transaction.")
+        parser.add_argument("--max-chunks", type=int, default=0,
+                            help="Stop compacting after this many chunks (0 = until caught up).")
+        parser.add_argument("--skip-retention", action="store_true",
+                            help="Only compact; do not delete expired rows.")
+
+    def handle(self, *args, **opts):
+        chunk_size = opts["chunk_size"]
+        folded = chunks = 0
+        while not opts["max_chunks"] or chunks < opts["max_chunks"]:
+            n = compact_chunk(chunk_size)
+            if not n:
+                break
+            folded += n
+            chunks += 1
+        self.stdout.write(f"compacted {folded} raw rows in {chunks} chunks")
+
+        if not opts["skip_retention"]:
+            raw_deleted, minute_deleted, receipts_deleted = apply_retention(chunk_size)
+            self.stdout.write(f"retention deleted {raw_deleted} raw rows, {minute_deleted} minute buckets, "
+                              f"{receipts_deleted} expired batch receipts")
@@ -0,0 +1,49 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from proctoring.buffer import get_buffer
+from proctoring.ingest import apply_records
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Drain the proctoring write-behind buffer into ProctorAnomaly / ProctorAnomalyAggregate."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.PROCTOR_FLUSH_BATCH_SIZE,
+                            help="Records folded into one transaction.")
+        parser.add_argument("--interval", type=float, default=settings.PROCTOR_FLUSH_INTERVAL,
+                            help="Seconds to sleep when the buffer is drained.")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is pending and exit instead of looping.")
+
+    def handle(self, *args, **opts):
+        buf = get_buffer()
+        batch_size = opts["batch_size"]
+        self.stdout.write(f"draining {buf.backend} buffer, batch_size={batch_size}")
+
+        while True:
+            drained = self.drain(buf, batch_size)
+            stats = buf.stats()
+            logger.info("proctor buffer drained=%s stats=%s", drained, stats)
+            if opts["verbosity"] > 1 or opts["once"]:
+                self.stdout.write(f"drained={drained} {stats}")
+            if opts["once"]:
+                return
+            time.sleep(opts["interval"])
+
+    def drain(self, buf, batch_size):
+        """Apply chunks until the buffer reports nothing left to read."""
+        drained = 0
+        while True:
+            token, records = buf.read(batch_size)
+            if records:
+                apply_records(records)
+                drained += len(records)
+            buf.ack(token)
+            if not token:
+                return drained
@@ -0,0 +1,293 @@
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from types import SimpleNamespace
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from proctoring import wire
+from proctoring.middleware import QUERY_COUNT_HEADER
+
+LOGIN = "/api/accounts/login/"
+START = "/api/exams/start/"
+BATCH = "/api/proctor/anomaly/batch/"
+
+# WebcamProctor.tsx: FRAME_INTERVAL_MS and AGGREGATION_WINDOW_MS
+FRAME_INTERVAL = 1.2
+FLUSH_INTERVAL = 30.0
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list (None when empty)."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples, elapsed):
+    """samples: (latency_s, status, queries or None) per request -> one endpoint's results."""
+    latencies = sorted(s[0] * 1000 for s in samples)
+    queries = [s[2] for s in samples if s[2] is not None]
+    ok = sum(1 for s in samples if 200 <= s[1] < 300)
+    return {
+        "requests": len(samples),
+        "ok": ok,
+        "errors": len(samples) - ok,
+        "status": dict(sorted(Counter(str(s[1]) for s in samples).items())),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "queries_per_request": {
+            "mean": round(sum(queries) / len(queries), 2) if queries else None,
+            "max": max(queries) if queries else None,
+        },
+    }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def simulate_window(window, rate, now):
+    """
+    Events one WebcamProctor flush would carry: every frame in the window is
+    an anomaly with probability `rate`, folded per event type like addToBatch.
+    """
+    types = list(wire.EVENT_TYPE_CODES)
+    frames = max(1, int(window / FRAME_INTERVAL))
+    events = {}
+    for i in range(frames):
+        if random.random() >= rate:
+            continue
+        ts = now - timedelta(seconds=window) + timedelta(seconds=i * FRAME_INTERVAL)
+        ev = events.setdefault(random.choice(types), {"count": 0, "first_ts": ts})
+        ev["count"] += 1
+        ev["last_ts"] = ts
+    return [{"event_type": t, **ev} for t, ev in events.items()]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Candidate(threading.Thread):
+    """
+    One simulated examinee: log in and start an exam, wait for every other
+    candidate at `ready`, then flush batches until `clock.deadline`.
+    """
+
+    def __init__(self, opts, username, ready, clock, record):
+        super().__init__(daemon=True)
+        self.opts = opts
+        self.username = username
+        self.ready = ready
+        self.clock = clock
+        self.record = record
+        self.http = requests.Session()
+        self.error = None
+
+    def call(self, endpoint, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            res = self.http.post(self.opts["base_url"] + path, timeout=self.opts["timeout"], **kwargs)
+        except requests.RequestException:
+            self.record(endpoint, (time.perf_counter() - start, 0, None))
+            return None
+        queries = res.headers.get(QUERY_COUNT_HEADER)
+        self.record(endpoint, (time.perf_counter() - start, res.status_code, int(queries) if queries else None))
+        return res
+
+    def run(self):
+        exam_id = None
+        try:
+            exam_id = self.setup()
+        except Exception as exc:  # reported once the run is over
+            self.error = f"{self.username}: {exc}"
+        self.ready.wait()
+        if exam_id is not None:
+            self.flush_loop(exam_id)
+
+    def setup(self):
+        res = self.call("login", LOGIN, json={"username": self.username, "password": self.opts["password"]})
+        if res is None or res.status_code != 200:
+            raise RuntimeError("login failed")
+        self.http.headers["Authorization"] = f"Bearer {res.json()['access']}"
+
+        res = self.call("start_exam", START)
+        if res is None or res.status_code != 200:
+            raise RuntimeError("start exam failed")
+        return res.json()["id"]
+
+    def flush_loop(self, exam_id):
+        interval = self.opts["flush_interval"]
+        # candidates join at different moments, so their flush ticks are spread over one interval
+        next_tick = time.monotonic() + random.uniform(0, interval)
+        while True:
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            if time.monotonic() >= self.clock.deadline:
+                return
+            next_tick += interval
+            events = simulate_window(FLUSH_INTERVAL, self.opts["anomaly_rate"], timezone.now())
+            if not events:
+                continue  # flushBatch sends nothing for an empty window
+            batch_id = str(uuid.uuid4())
+            if self.opts["binary"]:
+                self.call("anomaly_batch", BATCH, data=wire.encode_batch(exam_id, events, batch_id),
+                          headers={"Content-Type": wire.MEDIA_TYPE, "Accept": wire.MEDIA_TYPE})
+            else:
+                payload = {"exam_id": exam_id, "batch_id": batch_id, "events": [
+                    {**ev, "first_ts": ev["first_ts"].isoformat(), "last_ts": ev["last_ts"].isoformat()}
+                    for ev in events
+                ]}
+                self.call("anomaly_batch", BATCH, json=payload)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test proctoring ingest against a running server: N candidates log in, start an exam "
+        "and flush anomaly batches at the WebcamProctor cadence. Reports throughput, p50/p95/p99 "
+        "latency and DB queries per request (start the server with PROCTOR_QUERY_COUNT_HEADER=1) "
+        "and saves the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--candidates", type=int, default=50)
+        parser.add_argument("--duration", type=float, default=120.0, help="Seconds of batch traffic.")
+        parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                            help="Seconds between flushes per candidate (lower it to compress time).")
+        parser.add_argument("--anomaly-rate", type=float, default=0.2,
+                            help="Share of frames that raise an anomaly.")
+        parser.add_argument("--binary", action="store_true", help="Send the packed wire format instead of JSON.")
+        parser.add_argument("--user-prefix", default="loadcand")
+        parser.add_argument("--password", default="loadtest-pw")
+        parser.add_argument("--create-users", action="store_true",
+                            help="Create the candidate accounts first (server must share this DATABASE_URL).")
+        parser.add_argument("--timeout", type=float, default=30.0)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--output", default=None,
+                            help="Results file (default var/bench/ingest-<timestamp>.json).")
+        parser.add_argument("--compare", default=None, help="Earlier results file to diff against.")
+        parser.add_argument("--revision", default=None,
+                            help="Revision the server runs, when it is not this checkout (default: git HEAD).")
+
+    def handle(self, *args, **opts):
+        if opts["seed"] is not None:
+            random.seed(opts["seed"])
+        usernames = [f"{opts['user_prefix']}{i:04d}" for i in range(opts["candidates"])]
+        if opts["create_users"]:
+            self.create_users(usernames, opts["password"])
+
+        samples = {}
+        lock = threading.Lock()
+
+        def record(endpoint, sample):
+            with lock:
+                samples.setdefault(endpoint, []).append(sample)
+
+        # logins and exam starts run first; only the batch phase counts towards its throughput
+        clock = SimpleNamespace(batches_at=None, deadline=None)
+        started = time.monotonic()
+
+        def begin_batches():
+            clock.batches_at = time.monotonic()
+            clock.deadline = clock.batches_at + opts["duration"]
+
+        ready = threading.Barrier(len(usernames), action=begin_batches)
+        workers = [Candidate(opts, name, ready, clock, record) for name in usernames]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        setup_s = clock.batches_at - started
+        batch_s = time.monotonic() - clock.batches_at
+
+        failures = [w.error for w in workers if w.error]
+        results = {
+            "revision": opts["revision"] or git_revision(),
+            "recorded_at": timezone.now().isoformat(),
+            "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+            "config": {k: opts[k] for k in (
+                "base_url", "candidates", "duration", "flush_interval", "anomaly_rate", "binary", "seed",
+            )},
+            "setup_s": round(setup_s, 2),
+            "batch_phase_s": round(batch_s, 2),
+            "failed_candidates": len(failures),
+            "endpoints": {
+                name: summarize(s, batch_s if name == "anomaly_batch" else setup_s)
+                for name, s in sorted(samples.items())
+            },
+        }
+        for message in failures[:5]:
+            self.stderr.write(message)
+
+        path = opts["output"] or os.path.join(
+            settings.BASE_DIR, "var", "bench", f"ingest-{timezone.now():%Y%m%dT%H%M%S}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+        self.report(results)
+        if opts["compare"]:
+            self.compare(results, opts["compare"])
+        self.stdout.write(f"results written to {path}")
+
+    def create_users(self, usernames, password):
+        User = get_user_model()
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        for name in usernames:
+            if name not in existing:
+                User.objects.create_user(name, password=password)
+        self.stdout.write(f"created {len(usernames) - len(existing)} candidate accounts")
+
+    def report(self, results):
+        self.stdout.write(f"{'endpoint':<14} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} "
+                          f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for name, r in results["endpoints"].items():
+            lat = r["latency_ms"]
+            self.stdout.write(
+                f"{name:<14} {r['requests']:>6} {r['errors']:>5} {r['throughput_rps']!s:>8} "
+                f"{lat['p50']!s:>8} {lat['p95']!s:>8} {lat['p99']!s:>8} "
+                f"{r['queries_per_request']['mean']!s:>8}"
+            )
+
+    def compare(self, results, baseline_path):
+        try:
+            with open(baseline_path) as fh:
+                baseline = json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"cannot read baseline {baseline_path}: {exc}")
+
+        before = baseline.get("endpoints", {}).get("anomaly_batch")
+        after = results["endpoints"].get("anomaly_batch")
+        if not before or not after:
+            self.stdout.write("no anomaly_batch results to compare")
+            return
+        self.stdout.write(f"anomaly_batch vs {baseline.get('revision') or baseline_path}:")
+        rows = [("throughput_rps", before["throughput_rps"], after["throughput_rps"])]
+        rows += [(f"{p} ms", before["latency_ms"][p], after["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        rows.append(("queries", before["queries_per_request"]["mean"], after["queries_per_request"]["mean"]))
+        for label, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+            self.stdout.write(f"  {label:<15} {old!s:>10} -> {new!s:>10} {change:>8}")
@@ -0,0 +1,29 @@
+# proctoring/middleware.py
+from django.db import connection
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+
+
+class QueryCountHeaderMiddleware:
+    """
+    Adds X-DB-Query-Count (statements run on the default connection while
+    handling the request) so the ingest load harness can report queries per
+    request from outside the server process. Only installed when
+    PROCTOR_QUERY_COUNT_HEADER is set; never enable it in production.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+        response[QUERY_COUNT_HEADER] = str(count)
+        return response
@@ -0,0 +1,51 @@
+# Generated by Django 6.0 on 2026-10-18 04:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctoring', '0004_proctoranomalyaggregate'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProctorRollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='proctoranomaly',
+            options={},
+        ),
+        migrations.AddField(
+            model_name='proctoranomaly',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='ProctorAnomalyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_id', models.IntegerField()),
+                ('event_type', models.CharField(choices=[('no_face', 'No face'), ('multiple_faces', 'Multiple faces'), ('phone_detected', 'Phone detected'), ('looking_away', 'Looking away')], max_length=64)),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proctor_anomaly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['exam_id', 'granularity', 'bucket_start'], name='proctor_rollup_exam_bucket')],
+                'unique_together': {('user', 'exam_id', 'event_type', 'granularity', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-18 04:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    CREATE INDEX CONCURRENTLY on PostgreSQL, so ProctorAnomaly stays writable
+    while the index builds; a plain AddIndex elsewhere (SQLite). Defined here
+    rather than taken from django.contrib.postgres, which needs psycopg even
+    on SQLite.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('proctoring', '0005_anomaly_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='proctoranomaly',
+            index=models.Index(fields=['exam_id', 'user', 'timestamp', 'id'], name='proctor_anom_exam_user_ts'),
+        ),
+        AddIndexConcurrently(
+            model_name='proctoranomaly',
+            index=models.Index(fields=['exam_id', 'timestamp', 'id'], name='proctor_anom_exam_ts'),
+        ),
+    ]
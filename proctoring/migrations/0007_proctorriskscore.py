@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 04:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctoring', '0006_anomaly_timeline_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProctorRiskScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_id', models.IntegerField()),
+                ('log_score', models.FloatField()),
+                ('event_count', models.IntegerField(default=0)),
+                ('last_event_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proctor_risk_scores', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['exam_id', '-log_score'], name='proctor_risk_exam_score')],
+                'unique_together': {('user', 'exam_id')},
+            },
+        ),
+    ]
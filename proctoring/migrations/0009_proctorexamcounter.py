@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctoring', '0008_proctorbatchreceipt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProctorExamCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_id', models.IntegerField()),
+                ('event_type', models.CharField(blank=True, max_length=64)),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('candidates', models.IntegerField(default=0)),
+                ('last_seen', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('exam_id', 'event_type', 'shard')},
+            },
+        ),
+    ]
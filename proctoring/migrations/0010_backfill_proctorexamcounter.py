@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 06:40
+
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import Mod
+
+SHARDS = 16  # proctoring.summary.SHARDS
+
+
+def rebuild_counters(apps, schema_editor):
+    """
+    Recompute ProctorExamCounter from ProctorAnomalyAggregate, which batch
+    ingest has always updated together with the counters. Existing counter
+    rows are replaced rather than added to, so this is exact even if
+    batches were ingested between 0009 and this migration.
+    """
+    Aggregate = apps.get_model('proctoring', 'ProctorAnomalyAggregate')
+    Counter = apps.get_model('proctoring', 'ProctorExamCounter')
+    sharded = Aggregate.objects.annotate(shard=Mod('user_id', SHARDS)).order_by()
+
+    rows = [
+        Counter(exam_id=row['exam_id'], event_type=row['event_type'], shard=row['shard'],
+                count=row['total'], candidates=row['users'], last_seen=row['last'])
+        for row in sharded.values('exam_id', 'event_type', 'shard').annotate(
+            total=Sum('count'), users=Count('user_id'), last=Max('last_seen'),
+        )
+    ]
+    rows += [
+        Counter(exam_id=row['exam_id'], event_type='', shard=row['shard'],
+                count=row['total'], candidates=row['users'], last_seen=row['last'])
+        for row in sharded.values('exam_id', 'shard').annotate(
+            total=Sum('count'), users=Count('user_id', distinct=True), last=Max('last_seen'),
+        )
+    ]
+    Counter.objects.all().delete()
+    Counter.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctoring', '0009_proctorexamcounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 07:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_candidates(apps, schema_editor):
+    """One row per (user, exam) that already has aggregates, so their next batch is not counted as new."""
+    Aggregate = apps.get_model('proctoring', 'ProctorAnomalyAggregate')
+    Candidate = apps.get_model('proctoring', 'ProctorExamCandidate')
+    pairs = Aggregate.objects.values_list('user_id', 'exam_id').order_by().distinct()
+    Candidate.objects.bulk_create(
+        (Candidate(user_id=user_id, exam_id=exam_id) for user_id, exam_id in pairs.iterator()),
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proctoring', '0010_backfill_proctorexamcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProctorExamCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_id', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'exam_id')},
+            },
+        ),
+        migrations.RunPython(backfill_candidates, migrations.RunPython.noop),
+    ]
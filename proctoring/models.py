@@ -19,10 +19,16 @@ class ProctorAnomaly(models.Model):
     event_type = models.CharField(max_length=64, choices=EVENT_TYPES)
     timestamp = models.DateTimeField()  # when the event occurred (from client)
     message = models.TextField(blank=True)
+    count = models.PositiveIntegerField(default=1)  # events folded into this row by a batch flush
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
-        ordering = ["-created_at"]
+        # no default ordering: unqualified queries on this table must not sort it
+        indexes = [
+            # timeline keyset scans: per candidate and exam-wide, ordered by (timestamp, id)
+            models.Index(fields=["exam_id", "user", "timestamp", "id"], name="proctor_anom_exam_user_ts"),
+            models.Index(fields=["exam_id", "timestamp", "id"], name="proctor_anom_exam_ts"),
+        ]
 
     def __str__(self):
         return f"{self.user} – {self.event_type} – exam {self.exam_id}"
@@ -45,3 +51,126 @@ class ProctorAnomalyAggregate(models.Model):
 
     def __str__(self):
         return f"{self.user} | exam {self.exam_id} | {self.event_type} = {self.count}"
+
+class ProctorAnomalyRollup(models.Model):
+    """
+    Compacted ProctorAnomaly counts per (user, exam_id, event_type) and
+    minute/hour bucket of the event timestamp. Maintained by
+    `manage.py compact_proctor_anomalies` (see proctoring.rollups).
+    """
+    MINUTE = "minute"
+    HOUR = "hour"
+    GRANULARITIES = [(MINUTE, "Minute"), (HOUR, "Hour")]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="proctor_anomaly_rollups",
+    )
+    exam_id = models.IntegerField()
+    event_type = models.CharField(max_length=64, choices=ProctorAnomaly.EVENT_TYPES)
+    granularity = models.CharField(max_length=8, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("user", "exam_id", "event_type", "granularity", "bucket_start")
+        indexes = [
+            models.Index(fields=["exam_id", "granularity", "bucket_start"], name="proctor_rollup_exam_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} | exam {self.exam_id} | {self.event_type} @ {self.bucket_start} ({self.granularity}) = {self.count}"
+
+class ProctorRollupWatermark(models.Model):
+    """Highest ProctorAnomaly id already folded into the rollups."""
+    name = models.CharField(max_length=64, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+class ProctorRiskScore(models.Model):
+    """
+    Time-decayed suspicion score per (user, exam_id), updated on every batch
+    ingest. `log_score` is stored in forward-decay form (see
+    proctoring.scoring) so rows compare directly: ordering by it ranks
+    candidates by their current decayed score.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="proctor_risk_scores",
+    )
+    exam_id = models.IntegerField()
+    log_score = models.FloatField()
+    event_count = models.IntegerField(default=0)
+    last_event_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "exam_id")
+        indexes = [
+            models.Index(fields=["exam_id", "-log_score"], name="proctor_risk_exam_score"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} | exam {self.exam_id} | log_score={self.log_score:.3f}"
+
+class ProctorBatchReceipt(models.Model):
+    """
+    Result of an applied client batch, kept for PROCTOR_DEDUPE_WINDOW_SECONDS
+    so a retried flush (same batch_id) is answered without new writes.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="proctor_batch_receipts",
+    )
+    exam_id = models.IntegerField()
+    batch_id = models.UUIDField()
+    response = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ("user", "exam_id", "batch_id")
+
+    def __str__(self):
+        return f"{self.user} | exam {self.exam_id} | batch {self.batch_id}"
+
+class ProctorExamCounter(models.Model):
+    """
+    Exam-wide event totals maintained by batch ingest (see proctoring.summary).
+    Split into `shard` rows by user id so concurrent flushes from one large
+    exam do not all lock the same row. event_type "" holds the all-types
+    totals, whose `candidates` is the number of distinct affected candidates.
+    """
+    exam_id = models.IntegerField()
+    event_type = models.CharField(max_length=64, blank=True)
+    shard = models.PositiveSmallIntegerField()
+    count = models.BigIntegerField(default=0)
+    candidates = models.IntegerField(default=0)
+    last_seen = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("exam_id", "event_type", "shard")
+
+    def __str__(self):
+        return f"exam {self.exam_id} | {self.event_type or '*'} [{self.shard}] = {self.count}"
+
+
+class ProctorExamCandidate(models.Model):
+    """
+    One row per candidate with anomalies in an exam. Batch ingest inserts it
+    with ON CONFLICT DO NOTHING, and only the flush that gets the row back
+    counts the candidate in ProctorExamCounter.candidates.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    exam_id = models.IntegerField()
+
+    class Meta:
+        unique_together = ("user", "exam_id")
+
+    def __str__(self):
+        return f"{self.user} | exam {self.exam_id}"
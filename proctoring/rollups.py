@@ -0,0 +1,165 @@
+# proctoring/rollups.py
+"""
+Incremental compaction of ProctorAnomaly into minute/hour rollups, plus
+chunked retention of raw rows.
+
+Compaction walks raw rows in id order from a persisted watermark
+(ProctorRollupWatermark), so old data is never rescanned. Rows newer than
+PROCTOR_COMPACTION_SETTLE_SECONDS are left for the next run to give
+in-flight transactions time to commit. Retention only deletes raw rows the
+watermark has already passed, so nothing is dropped before it is rolled up.
+
+Reads combine the rollups (everything up to the watermark) with the few raw
+rows past it, so counts stay exact whichever side of the retention horizon
+a range falls on.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .ingest import upsert_increment
+from .models import ProctorAnomaly, ProctorAnomalyRollup, ProctorBatchReceipt, ProctorRollupWatermark
+
+WATERMARK_NAME = "proctor_anomaly_rollup"
+ROLLUP_KEY = ("user", "exam_id", "event_type", "granularity", "bucket_start")
+
+
+def bucket_start(ts, granularity):
+    if granularity == ProctorAnomalyRollup.HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(second=0, microsecond=0)
+
+
+def bucket_end(ts, granularity):
+    """The first bucket boundary at or after ts."""
+    start = bucket_start(ts, granularity)
+    if start == ts:
+        return ts
+    return start + (timedelta(hours=1) if granularity == ProctorAnomalyRollup.HOUR else timedelta(minutes=1))
+
+
+def _fold(rows):
+    """rows: (user_id, exam_id, event_type, timestamp, count) -> rollup upsert rows."""
+    buckets = defaultdict(lambda: [0, None])
+    for user_id, exam_id, event_type, ts, count in rows:
+        for granularity in (ProctorAnomalyRollup.MINUTE, ProctorAnomalyRollup.HOUR):
+            acc = buckets[(user_id, exam_id, event_type, granularity, bucket_start(ts, granularity))]
+            acc[0] += count
+            if acc[1] is None or ts > acc[1]:
+                acc[1] = ts
+    return [key + (count, last_seen) for key, (count, last_seen) in buckets.items()]
+
+
+def compact_chunk(chunk_size):
+    """
+    Fold the next chunk of settled raw rows past the watermark into the
+    rollups and advance the watermark, atomically. Returns rows folded.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PROCTOR_COMPACTION_SETTLE_SECONDS)
+    with transaction.atomic():
+        watermark, _ = ProctorRollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        candidates = (
+            ProctorAnomaly.objects.filter(id__gt=watermark.last_id)
+            .order_by("id")
+            .values_list("id", "user_id", "exam_id", "event_type", "timestamp", "count", "created_at")
+            [:chunk_size]
+        )
+        rows = []
+        for row in candidates:
+            if row[6] >= cutoff:
+                break  # stop at the first unsettled row so the watermark never skips one
+            rows.append(row)
+        if not rows:
+            return 0
+
+        upsert_increment(ProctorAnomalyRollup, ROLLUP_KEY, _fold(r[1:6] for r in rows))
+        watermark.last_id = rows[-1][0]
+        watermark.save(update_fields=["last_id", "updated_at"])
+    return len(rows)
+
+
+def _delete_in_chunks(qs, chunk_size):
+    deleted = 0
+    while True:
+        ids = list(qs.order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        deleted += qs.model.objects.filter(id__in=ids).delete()[0]
+
+
+def apply_retention(chunk_size):
+    """
+    Delete compacted raw rows older than PROCTOR_RAW_RETENTION_DAYS,
+    minute rollups older than PROCTOR_MINUTE_ROLLUP_RETENTION_DAYS and batch
+    receipts past the dedupe window, in bounded chunks. A retention setting
+    of 0 keeps that data forever.
+    Returns (raw_deleted, minute_buckets_deleted, receipts_deleted).
+    """
+    now = timezone.now()
+    raw_deleted = minute_deleted = 0
+
+    raw_days = settings.PROCTOR_RAW_RETENTION_DAYS
+    if raw_days:
+        watermark = ProctorRollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+        if watermark:
+            raw_deleted = _delete_in_chunks(
+                ProctorAnomaly.objects.filter(
+                    id__lte=watermark.last_id, created_at__lt=now - timedelta(days=raw_days)
+                ),
+                chunk_size,
+            )
+
+    minute_days = settings.PROCTOR_MINUTE_ROLLUP_RETENTION_DAYS
+    if minute_days:
+        minute_deleted = _delete_in_chunks(
+            ProctorAnomalyRollup.objects.filter(
+                granularity=ProctorAnomalyRollup.MINUTE,
+                bucket_start__lt=now - timedelta(days=minute_days),
+            ),
+            chunk_size,
+        )
+
+    receipts_deleted = _delete_in_chunks(
+        ProctorBatchReceipt.objects.filter(
+            created_at__lt=now - timedelta(seconds=settings.PROCTOR_DEDUPE_WINDOW_SECONDS)
+        ),
+        chunk_size,
+    )
+    return raw_deleted, minute_deleted, receipts_deleted
+
+
+def event_counts(exam_id, start, end, granularity=ProctorAnomalyRollup.HOUR, user_id=None):
+    """
+    Event counts per (bucket_start, event_type) for every bucket that overlaps
+    [start, end): the range is widened to bucket boundaries, because rolled-up
+    history cannot be split inside a bucket, and raw rows are counted over the
+    same widened range. Compacted history comes from the rollups; only raw
+    rows past the watermark are read from ProctorAnomaly.
+    """
+    watermark = ProctorRollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+    last_id = watermark.last_id if watermark else 0
+    start, end = bucket_start(start, granularity), bucket_end(end, granularity)
+
+    rollups = ProctorAnomalyRollup.objects.filter(
+        exam_id=exam_id, granularity=granularity, bucket_start__gte=start, bucket_start__lt=end,
+    )
+    raw = ProctorAnomaly.objects.filter(
+        exam_id=exam_id, id__gt=last_id, timestamp__gte=start, timestamp__lt=end,
+    )
+    if user_id is not None:
+        rollups = rollups.filter(user_id=user_id)
+        raw = raw.filter(user_id=user_id)
+
+    counts = defaultdict(int)
+    for bucket, event_type, count in rollups.values_list("bucket_start", "event_type", "count"):
+        counts[(bucket, event_type)] += count
+    for ts, event_type, count in raw.values_list("timestamp", "event_type", "count"):
+        counts[(bucket_start(ts, granularity), event_type)] += count
+
+    return [
+        {"bucket_start": bucket.isoformat(), "event_type": event_type, "count": count}
+        for (bucket, event_type), count in sorted(counts.items())
+    ]
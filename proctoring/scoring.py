@@ -0,0 +1,125 @@
+# proctoring/scoring.py
+"""
+Incremental, time-decayed suspicion score per (user, exam_id).
+
+Every batch adds weight(event_type) * count, and the total decays
+exponentially with PROCTOR_RISK_HALF_LIFE_SECONDS. Instead of decaying each
+stored score on every read we use forward decay: a contribution made at time
+t is stored as w * exp(lam * (t - EPOCH)), and the score at `now` is the sum
+times exp(-lam * (now - EPOCH)). The common factor is the same for every
+row, so the stored value ranks candidates without any recomputation.
+
+The sum is kept as its natural log (`log_score`) so it grows linearly with
+time instead of overflowing a float.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import ProctorRiskScore
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+UPSERT_CHUNK_SIZE = 500
+
+# _logaddexp(stored, added) in SQL; below -40 the smaller term cannot change a double (and
+# PostgreSQL's EXP raises on underflow rather than returning 0)
+LOGADDEXP_SQL = (
+    "CASE WHEN {old} >= {new} THEN {old} + CASE WHEN {new} - {old} < -40 THEN 0 "
+    "ELSE LN(1 + EXP({new} - {old})) END "
+    "ELSE {new} + CASE WHEN {old} - {new} < -40 THEN 0 ELSE LN(1 + EXP({old} - {new})) END END"
+)
+
+
+def decay_rate():
+    return math.log(2) / settings.PROCTOR_RISK_HALF_LIFE_SECONDS
+
+
+def _elapsed(ts):
+    return (ts - EPOCH).total_seconds()
+
+
+def _logaddexp(a, b):
+    if a is None:
+        return b
+    hi, lo = (a, b) if a >= b else (b, a)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+def log_contribution(event_type, count, at):
+    """Forward-decayed log weight of `count` events seen at `at`, or None if it adds nothing."""
+    weight = settings.PROCTOR_RISK_WEIGHTS.get(event_type, 1.0) * count
+    if weight <= 0:
+        return None
+    return math.log(weight) + decay_rate() * _elapsed(at)
+
+
+def current_score(log_score, now=None):
+    """Decayed score as of `now` for a stored log_score."""
+    now = now or timezone.now()
+    return math.exp(log_score - decay_rate() * _elapsed(now))
+
+
+def update_scores(increments, at=None):
+    """
+    increments: {(user_id, exam_id): [(event_type, count), ...]}.
+
+    Folds each key's events into its score with one upsert per
+    UPSERT_CHUNK_SIZE keys, whatever the number of events. The log-sum-exp
+    runs in the conflict clause against the stored row, so two writes that
+    both find no row yet add up instead of one overwriting the other.
+    """
+    at = at or timezone.now()
+    rows = []
+    for (user_id, exam_id), events in increments.items():
+        log_add, n = None, 0
+        for event_type, count in events:
+            contribution = log_contribution(event_type, count, at)
+            if contribution is not None:
+                log_add = _logaddexp(log_add, contribution)
+                n += count
+        if log_add is not None:
+            rows.append((user_id, exam_id, log_add, n, connection.ops.adapt_datetimefield_value(at)))
+    if not rows:
+        return
+
+    opts = ProctorRiskScore._meta
+    qn = connection.ops.quote_name
+    table = qn(opts.db_table)
+    user_col, exam_col, score_col, n_col, at_col = (
+        qn(opts.get_field(name).column) for name in ("user", "exam_id", "log_score", "event_count", "last_event_at")
+    )
+    sql_head = f"INSERT INTO {table} ({user_col}, {exam_col}, {score_col}, {n_col}, {at_col}) VALUES "
+    sql_tail = (
+        f" ON CONFLICT ({user_col}, {exam_col}) DO UPDATE SET "
+        f"{score_col} = " + LOGADDEXP_SQL.format(old=f"{table}.{score_col}", new=f"EXCLUDED.{score_col}")
+        + f", {n_col} = {table}.{n_col} + EXCLUDED.{n_col}, {at_col} = CASE "
+        f"WHEN EXCLUDED.{at_col} > {table}.{at_col} THEN EXCLUDED.{at_col} ELSE {table}.{at_col} END"
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+            sql = sql_head + ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk)) + sql_tail
+            cursor.execute(sql, [value for row in chunk for value in row])
+
+
+def top_risk(exam_id, limit, now=None):
+    """The `limit` riskiest candidates of an exam: one indexed query, no recomputation."""
+    now = now or timezone.now()
+    rows = (
+        ProctorRiskScore.objects.filter(exam_id=exam_id)
+        .select_related("user")
+        .order_by("-log_score")[:limit]
+    )
+    return [
+        {
+            "user": row.user_id,
+            "username": row.user.username,
+            "score": round(current_score(row.log_score, now), 4),
+            "event_count": row.event_count,
+            "last_event_at": row.last_event_at.isoformat(),
+        }
+        for row in rows
+    ]
@@ -11,8 +11,24 @@ class ProctorAnomalySerializer(serializers.ModelSerializer):
         user = self.context["request"].user
         return ProctorAnomaly.objects.create(user=user, **validated_data)
 
+class ProctorAnomalyTimelineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProctorAnomaly
+        fields = ["id", "user", "exam_id", "event_type", "timestamp", "count", "message"]
+
 class ProctorAnomalyAggregateSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProctorAnomalyAggregate
         fields = ["id", "user", "exam_id", "event_type", "count", "last_seen", "created_at"]
         read_only_fields = ["id", "created_at"]
+
+class AnomalyBatchEventSerializer(serializers.Serializer):
+    event_type = serializers.ChoiceField(choices=ProctorAnomaly.EVENT_TYPES)
+    count = serializers.IntegerField(min_value=0, default=0)
+    first_ts = serializers.DateTimeField(required=False, allow_null=True, default=None)
+    last_ts = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+class AnomalyBatchSerializer(serializers.Serializer):
+    exam_id = serializers.IntegerField()
+    batch_id = serializers.UUIDField(required=False, allow_null=True, default=None)  # client retry key
+    events = AnomalyBatchEventSerializer(many=True)
@@ -0,0 +1,120 @@
+# proctoring/summary.py
+"""
+Materialized per-exam proctoring summary for reviewer dashboards.
+
+Batch ingest bumps ProctorExamCounter rows (events per type, affected
+candidates, last seen) in the same transaction as the aggregates, so a
+summary read is a SUM over at most SHARDS rows per event type plus one
+indexed query for the latest events. The rendered summary is cached for
+PROCTOR_SUMMARY_CACHE_SECONDS together with its ETag, so reviewers polling
+the same exam are answered from cache (and with 304 when nothing changed).
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Sum
+
+from .models import ProctorAnomaly, ProctorExamCounter
+
+SHARDS = 16
+ALL_TYPES = ""
+
+
+def counter_rows(user_id, exam_id, events, new_types, new_candidate):
+    """
+    Counter upsert rows (exam_id, event_type, shard, count, candidates, last_seen)
+    for one candidate's coalesced events. `new_types` are the event types this
+    write created the candidate's aggregates for, and `new_candidate` whether
+    it created their ProctorExamCandidate row (see proctoring.ingest.claim_new_keys).
+    """
+    shard = user_id % SHARDS
+    rows = []
+    total, last = 0, None
+    for ev in events:
+        first = 1 if ev["event_type"] in new_types else 0
+        rows.append((exam_id, ev["event_type"], shard, ev["count"], first, ev["last_ts"]))
+        total += ev["count"]
+        if ev["last_ts"] and (last is None or ev["last_ts"] > last):
+            last = ev["last_ts"]
+    rows.append((exam_id, ALL_TYPES, shard, total, 1 if new_candidate else 0, last))
+    return rows
+
+
+def bump_counters(rows):
+    """Fold counter rows sharing a key, then apply them with one upsert."""
+    from .ingest import upsert_increment  # ingest imports this module
+
+    merged = {}
+    for exam_id, event_type, shard, count, candidates, last_seen in rows:
+        key = (exam_id, event_type, shard)
+        cur = merged.get(key)
+        if cur is None:
+            merged[key] = [count, candidates, last_seen]
+        else:
+            cur[0] += count
+            cur[1] += candidates
+            if last_seen and (cur[2] is None or last_seen > cur[2]):
+                cur[2] = last_seen
+    upsert_increment(
+        ProctorExamCounter, ("exam_id", "event_type", "shard"),
+        (key + tuple(val) for key, val in merged.items()),
+        add_fields=("count", "candidates"),
+    )
+
+
+def build_summary(exam_id):
+    totals = {
+        row["event_type"]: row
+        for row in ProctorExamCounter.objects.filter(exam_id=exam_id)
+        .values("event_type")
+        .annotate(count=Sum("count"), candidates=Sum("candidates"), last_seen=Max("last_seen"))
+        .order_by()
+    }
+    overall = totals.pop(ALL_TYPES, None) or {"count": 0, "candidates": 0, "last_seen": None}
+
+    latest = (
+        ProctorAnomaly.objects.filter(exam_id=exam_id)
+        .select_related("user")
+        .order_by("-timestamp", "-id")[:settings.PROCTOR_SUMMARY_LATEST_EVENTS]
+    )
+    return {
+        "exam_id": exam_id,
+        "total_events": overall["count"],
+        "affected_candidates": overall["candidates"],
+        "last_seen": overall["last_seen"].isoformat() if overall["last_seen"] else None,
+        "by_event_type": [
+            {
+                "event_type": event_type,
+                "count": row["count"],
+                "candidates": row["candidates"],
+                "last_seen": row["last_seen"].isoformat() if row["last_seen"] else None,
+            }
+            for event_type, row in sorted(totals.items())
+        ],
+        "latest_events": [
+            {
+                "id": a.id,
+                "user": a.user_id,
+                "username": a.user.username,
+                "event_type": a.event_type,
+                "count": a.count,
+                "timestamp": a.timestamp.isoformat(),
+            }
+            for a in latest
+        ],
+    }
+
+
+def cached_summary(exam_id):
+    """(etag, payload) for an exam, rebuilt at most once per cache lifetime."""
+    key = f"proctor:summary:{exam_id}"
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    payload = build_summary(exam_id)
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    entry = (f'"{digest}"', payload)
+    cache.set(key, entry, timeout=settings.PROCTOR_SUMMARY_CACHE_SECONDS)
+    return entry
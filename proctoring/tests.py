@@ -1,3 +1,512 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import wire
+from .buffer import FileBuffer, reset_buffer
+from .ingest import apply_records, batch_record, claim_new_keys
+from .management.commands.loadtest_proctor_ingest import percentile, summarize
+from .models import (
+    ProctorAnomaly, ProctorAnomalyAggregate, ProctorAnomalyRollup, ProctorExamCandidate, ProctorExamCounter,
+    ProctorRiskScore, ProctorRollupWatermark,
+)
+from .rollups import event_counts
+from .scoring import current_score, update_scores
+from .summary import build_summary
+from .ws import proctor_socket
+
+BATCH_URL = "/api/proctor/anomaly/batch/"
+
+
+def make_events(n, last_ts="2025-01-01T10:00:30Z"):
+    types = [t for t, _ in ProctorAnomaly.EVENT_TYPES]
+    return [
+        {"event_type": types[i % len(types)], "count": 2,
+         "first_ts": "2025-01-01T10:00:00Z", "last_ts": last_ts}
+        for i in range(n)
+    ]
+
+
+class AnomalyBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_batch(self, events, exam_id=7):
+        return self.client.post(BATCH_URL, {"exam_id": exam_id, "events": events}, format="json")
+
+    def test_upsert_increments_count_and_moves_last_seen_forward(self):
+        self.post_batch([{"event_type": "no_face", "count": 3, "last_ts": "2025-01-01T10:00:30Z"}])
+        res = self.post_batch([
+            {"event_type": "no_face", "count": 2, "last_ts": "2025-01-01T09:00:00Z"},
+            {"event_type": "phone_detected", "count": 1, "last_ts": "2025-01-01T10:01:00Z"},
+        ])
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["aggregates"], [
+            {"event_type": "no_face", "count": 5, "last_seen": "2025-01-01T10:00:30+00:00"},
+            {"event_type": "phone_detected", "count": 1, "last_seen": "2025-01-01T10:01:00+00:00"},
+        ])
+        self.assertEqual(ProctorAnomalyAggregate.objects.count(), 2)
+        self.assertEqual(ProctorAnomaly.objects.count(), 3)
+
+    def test_duplicate_event_types_in_one_batch_are_coalesced(self):
+        res = self.post_batch([
+            {"event_type": "looking_away", "count": 1, "last_ts": "2025-01-01T10:00:00Z"},
+            {"event_type": "looking_away", "count": 4, "last_ts": "2025-01-01T10:00:10Z"},
+        ])
+
+        self.assertEqual(res.data["aggregates"], [
+            {"event_type": "looking_away", "count": 5, "last_seen": "2025-01-01T10:00:10+00:00"},
+        ])
+
+    def test_rejects_unknown_event_type(self):
+        res = self.post_batch([{"event_type": "bogus", "count": 1}])
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(ProctorAnomalyAggregate.objects.exists())
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        counts = []
+        for n in (1, 4, 40):
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.post_batch(make_events(n))
+            self.assertEqual(res.status_code, 200)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(len(set(counts)), 1, counts)
+        # savepoint + locked read + new-type insert + new-candidate insert + upsert + score upsert
+        # + counter upsert + bulk insert + release
+        self.assertEqual(counts[0], 9)
+
+
+class BufferedIngestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(reset_buffer)
+        reset_buffer()
+
+    def buffered(self, **extra):
+        return override_settings(
+            PROCTOR_INGEST_MODE="buffered", PROCTOR_BUFFER_REDIS_URL=None,
+            PROCTOR_BUFFER_DIR=self.tmp.name, **extra,
+        )
+
+    def test_batches_are_queued_then_drained_in_one_pass(self):
+        with self.buffered():
+            for _ in range(3):
+                res = self.client.post(BATCH_URL, {"exam_id": 7, "events": make_events(2)}, format="json")
+                self.assertEqual(res.status_code, 202)
+            self.assertFalse(ProctorAnomalyAggregate.objects.exists())
+
+            call_command("drain_proctor_buffer", "--once", stdout=io.StringIO())
+
+        counts = dict(ProctorAnomalyAggregate.objects.values_list("event_type", "count"))
+        self.assertEqual(counts, {"no_face": 6, "multiple_faces": 6})
+        self.assertEqual(ProctorAnomaly.objects.count(), 6)
+
+    def test_full_buffer_returns_503_with_retry_after(self):
+        with self.buffered(PROCTOR_BUFFER_MAX_BYTES=1, PROCTOR_BUFFER_RETRY_AFTER=9):
+            self.client.post(BATCH_URL, {"exam_id": 7, "events": make_events(1)}, format="json")
+            res = self.client.post(BATCH_URL, {"exam_id": 7, "events": make_events(1)}, format="json")
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "9")
+
+    def test_disk_appends_are_fsynced_before_they_are_acked(self):
+        buffer = FileBuffer(self.tmp.name, max_bytes=0)
+        with mock.patch("proctoring.buffer.os.fsync") as fsync:
+            buffer.append({"kind": "batch"})
+            self.assertEqual(fsync.call_count, 2)  # the new log file and its directory entry
+            buffer.append({"kind": "batch"})
+            self.assertEqual(fsync.call_count, 3)
+            FileBuffer(self.tmp.name, max_bytes=0, fsync=False).append({"kind": "batch"})
+            self.assertEqual(fsync.call_count, 3)
+
+    def test_failed_append_releases_the_batch_claim(self):
+        body = {"exam_id": 7, "batch_id": str(uuid.uuid4()), "events": make_events(1)}
+        with self.buffered():
+            with mock.patch.object(FileBuffer, "append", side_effect=OSError("disk gone")):
+                with self.assertRaises(OSError):
+                    self.client.post(BATCH_URL, body, format="json")
+            self.assertEqual(self.client.post(BATCH_URL, body, format="json").status_code, 202)
+            call_command("drain_proctor_buffer", "--once", stdout=io.StringIO())
+
+        self.assertEqual(ProctorAnomalyAggregate.objects.get().count, 2)
+
+
+@override_settings(PROCTOR_COMPACTION_SETTLE_SECONDS=0, PROCTOR_RAW_RETENTION_DAYS=30,
+                   PROCTOR_MINUTE_ROLLUP_RETENTION_DAYS=60)
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        old = timezone.now() - timedelta(days=40)
+        self.old_ts = old.replace(minute=10, second=0, microsecond=0)
+        ProctorAnomaly.objects.bulk_create([
+            ProctorAnomaly(user=self.user, exam_id=7, event_type="no_face", count=3,
+                           timestamp=self.old_ts + timedelta(minutes=i), created_at=old)
+            for i in range(3)
+        ])
+
+    def test_compaction_is_incremental_and_retention_keeps_counts_readable(self):
+        last_id = ProctorAnomaly.objects.latest("id").id
+        call_command("compact_proctor_anomalies", stdout=io.StringIO())
+        self.assertEqual(ProctorRollupWatermark.objects.get().last_id, last_id)
+        self.assertFalse(ProctorAnomaly.objects.exists())  # past retention, already rolled up
+
+        hourly = ProctorAnomalyRollup.objects.get(granularity=ProctorAnomalyRollup.HOUR)
+        self.assertEqual(hourly.count, 9)
+        self.assertEqual(ProctorAnomalyRollup.objects.filter(granularity=ProctorAnomalyRollup.MINUTE).count(), 3)
+
+        # a new raw row is folded once; old rows are never rescanned
+        ProctorAnomaly.objects.create(user=self.user, exam_id=7, event_type="no_face", timestamp=self.old_ts)
+        call_command("compact_proctor_anomalies", "--skip-retention", stdout=io.StringIO())
+        call_command("compact_proctor_anomalies", "--skip-retention", stdout=io.StringIO())
+        hourly.refresh_from_db()
+        self.assertEqual(hourly.count, 10)
+
+        counts = event_counts(7, self.old_ts - timedelta(hours=1), self.old_ts + timedelta(hours=1))
+        self.assertEqual(counts, [
+            {"bucket_start": hourly.bucket_start.isoformat(), "event_type": "no_face", "count": 10},
+        ])
+
+    def test_raw_and_compacted_ranges_are_both_bucket_aligned(self):
+        # starts after the first row, inside its minute and its hour
+        start, end = self.old_ts + timedelta(seconds=30), self.old_ts + timedelta(minutes=1, seconds=30)
+        before = event_counts(7, start, end, ProctorAnomalyRollup.MINUTE)
+        call_command("compact_proctor_anomalies", "--skip-retention", stdout=io.StringIO())
+        self.assertEqual(event_counts(7, start, end, ProctorAnomalyRollup.MINUTE), before)
+        self.assertEqual([b["count"] for b in before], [3, 3])
+        self.assertEqual(event_counts(7, start, end)[0]["count"], 9)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user("rev", password="pw", is_staff=True)
+        self.cand = User.objects.create_user("cand", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.reviewer)
+        ts = timezone.now().replace(microsecond=0)
+        # pairs of rows share a timestamp so the id tie-breaker matters
+        ProctorAnomaly.objects.bulk_create([
+            ProctorAnomaly(user=self.cand, exam_id=7, event_type="no_face", timestamp=ts + timedelta(seconds=i // 2))
+            for i in range(7)
+        ])
+
+    def test_cursor_walks_every_row_once_in_keyset_order(self):
+        seen, cursor = [], None
+        while True:
+            params = {"user": self.cand.id, "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            res = self.client.get("/api/proctor/exams/7/timeline/", params)
+            self.assertEqual(res.status_code, 200)
+            seen.extend(r["id"] for r in res.data["results"])
+            cursor = res.data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = list(ProctorAnomaly.objects.order_by("timestamp", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.cand)
+        self.assertEqual(self.client.get("/api/proctor/exams/7/timeline/").status_code, 403)
+
+
+class RiskScoreTests(TestCase):
+    def setUp(self):
+        self.reviewer = User.objects.create_user("rev", password="pw", is_staff=True)
+        self.client = APIClient()
+
+    def flush(self, user, events):
+        self.client.force_authenticate(user)
+        return self.client.post(BATCH_URL, {"exam_id": 7, "events": events}, format="json")
+
+    def test_scores_accumulate_and_rank_by_weight(self):
+        calm = User.objects.create_user("calm", password="pw")
+        phone = User.objects.create_user("phone", password="pw")
+        self.flush(calm, [{"event_type": "looking_away", "count": 2}])
+        self.flush(phone, [{"event_type": "phone_detected", "count": 1}])
+        self.flush(phone, [{"event_type": "phone_detected", "count": 1}])
+
+        self.client.force_authenticate(self.reviewer)
+        res = self.client.get("/api/proctor/exams/7/risk/", {"limit": 5})
+
+        self.assertEqual([r["username"] for r in res.data["results"]], ["phone", "calm"])
+        self.assertAlmostEqual(res.data["results"][0]["score"], 10.0, places=2)
+        self.assertEqual(res.data["results"][0]["event_count"], 2)
+
+    def test_upserts_add_to_the_stored_score(self):
+        user = User.objects.create_user("cand", password="pw")
+        at = timezone.now()
+        with self.assertNumQueries(1):
+            update_scores({(user.id, 7): [("no_face", 4)]}, at=at)
+        update_scores({(user.id, 7): [("no_face", 4)]}, at=at)
+
+        row = ProctorRiskScore.objects.get()
+        self.assertAlmostEqual(current_score(row.log_score, at), 8.0)
+        self.assertEqual(row.event_count, 8)
+
+    def test_score_halves_after_one_half_life(self):
+        user = User.objects.create_user("cand", password="pw")
+        at = timezone.now()
+        update_scores({(user.id, 7): [("no_face", 4)]}, at=at)
+        row = ProctorRiskScore.objects.get()
+        later = at + timedelta(seconds=settings.PROCTOR_RISK_HALF_LIFE_SECONDS)
+        self.assertAlmostEqual(current_score(row.log_score, later), 2.0)
+
+
+# each socket runs its sync calls on its own thread, so the data must be committed to be seen there
+class WebSocketIngestTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def talk(self, frames):
+        comm = ApplicationCommunicator(proctor_socket, {"type": "websocket", "path": "/ws/proctor/"})
+        await comm.send_input({"type": "websocket.connect"})
+        replies = [await comm.receive_output()]  # accept
+        for frame in frames:
+            await comm.send_input({"type": "websocket.receive", "text": json.dumps(frame)})
+            replies.append(await comm.receive_output(timeout=5))
+        await comm.send_input({"type": "websocket.disconnect", "code": 1000})
+        await comm.wait()
+        return replies
+
+    def converse(self, frames):
+        return async_to_sync(self.talk)(frames)
+
+    def test_authenticates_once_and_acks_each_batch(self):
+        replies = self.converse([
+            {"type": "auth", "token": self.token},
+            {"type": "batch", "seq": 1, "exam_id": 7, "events": make_events(2)},
+            {"type": "batch", "seq": 2, "exam_id": 7, "events": make_events(1)},
+        ])
+
+        self.assertEqual(replies[0]["type"], "websocket.accept")
+        self.assertEqual(json.loads(replies[1]["text"]), {"type": "ready"})
+        ack = json.loads(replies[3]["text"])
+        self.assertEqual((ack["type"], ack["seq"]), ("ack", 2))
+        self.assertEqual(ack["aggregates"][0]["count"], 4)
+
+    def test_transient_ingest_failure_asks_for_a_resend(self):
+        with mock.patch("proctoring.ws.record_batch", side_effect=RuntimeError("db restarting")):
+            replies = self.converse([
+                {"type": "auth", "token": self.token},
+                {"type": "batch", "seq": 1, "exam_id": 7, "events": make_events(1)},
+            ])
+        self.assertEqual(json.loads(replies[2]["text"]),
+                         {"type": "error", "seq": 1, "detail": "ingest failed", "retry": True})
+
+    def test_bad_token_closes_socket(self):
+        replies = self.converse([{"type": "auth", "token": "nope"}])
+        self.assertEqual(replies[1], {"type": "websocket.close", "code": 4401})
+
+    def test_sockets_ingest_concurrently(self):
+        # both batches must be inside record_batch at once; serialized sockets would break the barrier
+        barrier = threading.Barrier(2, timeout=2)
+
+        def meet(*args, **kwargs):
+            barrier.wait()
+            return []
+
+        frames = [
+            {"type": "auth", "token": self.token},
+            {"type": "batch", "seq": 1, "exam_id": 7, "events": make_events(1)},
+        ]
+
+        async def both():
+            return await asyncio.gather(self.talk(frames), self.talk(frames))
+
+        with mock.patch("proctoring.ws.record_batch", side_effect=meet):
+            results = async_to_sync(both)()
+
+        for replies in results:
+            self.assertEqual(json.loads(replies[2]["text"]), {"type": "ack", "seq": 1, "aggregates": []})
+
+
+class BinaryWireFormatTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_packed_batch_round_trips_through_the_endpoint(self):
+        last = parse_datetime("2025-01-01T10:00:30.250Z")
+        body = wire.encode_batch(7, [
+            {"event_type": "phone_detected", "count": 3, "first_ts": None, "last_ts": last},
+        ])
+        res = self.client.post(BATCH_URL, body, content_type=wire.MEDIA_TYPE, HTTP_ACCEPT=wire.MEDIA_TYPE)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], wire.MEDIA_TYPE)
+        self.assertEqual(wire.decode_response(res.content), {"aggregates": [
+            {"event_type": "phone_detected", "count": 3, "last_seen": "2025-01-01T10:00:30.250000+00:00"},
+        ]})
+
+    def test_truncated_body_is_a_400(self):
+        body = wire.encode_batch(7, [{"event_type": "no_face", "count": 1}])[:-3]
+        res = self.client.post(BATCH_URL, body, content_type=wire.MEDIA_TYPE)
+        self.assertEqual(res.status_code, 400)
+
+
+class IdempotentBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("cand", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.batch_id = str(uuid.uuid4())
+        cache.clear()
+
+    def post(self):
+        return self.client.post(
+            BATCH_URL, {"exam_id": 7, "batch_id": self.batch_id, "events": make_events(2)}, format="json",
+        )
+
+    def test_replay_is_answered_from_cache_without_queries(self):
+        first = self.post()
+        with self.assertNumQueries(0):
+            replay = self.post()
+
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(ProctorAnomalyAggregate.objects.get(event_type="no_face").count, 2)
+
+    def test_replay_after_cache_expiry_rolls_back_and_returns_stored_result(self):
+        first = self.post()
+        cache.clear()
+        replay = self.post()
+
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(ProctorAnomalyAggregate.objects.get(event_type="no_face").count, 2)
+        self.assertEqual(ProctorAnomaly.objects.count(), 2)
+        self.assertEqual(ProctorRiskScore.objects.get().event_count, 4)
+
+
+class ExamSummaryTests(TestCase):
+    URL = "/api/proctor/exams/7/summary/"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.reviewer = User.objects.create_user("rev", password="pw", is_staff=True)
+        self.client = APIClient()
+
+    def flush(self, user, events):
+        self.client.force_authenticate(user)
+        self.client.post(BATCH_URL, {"exam_id": 7, "events": events}, format="json")
+
+    def test_counts_events_and_distinct_candidates(self):
+        a = User.objects.create_user("a", password="pw")
+        b = User.objects.create_user("b", password="pw")
+        self.flush(a, make_events(2))
+        self.flush(a, make_events(1))
+        self.flush(b, make_events(1, last_ts="2025-01-01T11:00:00Z"))
+
+        self.client.force_authenticate(self.reviewer)
+        res = self.client.get(self.URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["total_events"], 8)
+        self.assertEqual(res.data["affected_candidates"], 2)
+        self.assertEqual(res.data["last_seen"], "2025-01-01T11:00:00+00:00")
+        by_type = {row["event_type"]: (row["count"], row["candidates"]) for row in res.data["by_event_type"]}
+        self.assertEqual(by_type, {"no_face": (6, 2), "multiple_faces": (2, 1)})
+        self.assertEqual(res.data["latest_events"][0]["username"], "b")
+
+    def test_buffered_drain_feeds_the_same_counters(self):
+        a = User.objects.create_user("a", password="pw")
+        records = [batch_record(a.id, 7, [
+            {"event_type": "no_face", "count": 3, "last_ts": parse_datetime("2025-01-01T10:00:00Z")},
+        ]) for _ in range(2)]
+        apply_records(records)
+
+        summary = build_summary(7)
+        self.assertEqual(summary["total_events"], 6)
+        self.assertEqual(summary["affected_candidates"], 1)
+
+    def test_migration_backfills_counters_from_existing_aggregates(self):
+        a = User.objects.create_user("a", password="pw")
+        b = User.objects.create_user("b", password="pw")
+        self.flush(a, make_events(2))
+        self.flush(b, make_events(1, last_ts="2025-01-01T11:00:00Z"))
+        expected = build_summary(7)
+        ProctorExamCounter.objects.all().delete()  # as before the counters existed
+        ProctorExamCandidate.objects.all().delete()
+
+        backfill = importlib.import_module("proctoring.migrations.0010_backfill_proctorexamcounter")
+        backfill.rebuild_counters(django_apps, None)
+        importlib.import_module("proctoring.migrations.0011_proctorexamcandidate").backfill_candidates(
+            django_apps, None,
+        )
+        self.assertEqual(build_summary(7), expected)
+
+        self.flush(a, make_events(1))  # a known candidate is not counted again
+        summary = build_summary(7)
+        self.assertEqual((summary["total_events"], summary["affected_candidates"]), (8, 2))
+
+    def test_new_keys_are_claimed_by_one_write_only(self):
+        a = User.objects.create_user("a", password="pw")
+        pairs, keys = [(a.id, 7)], [(a.id, 7, "no_face"), (a.id, 7, "multiple_faces")]
+
+        self.assertEqual(claim_new_keys(pairs, keys), (set(keys), set(pairs)))
+        # a racing flush that read before the rows existed still gets nothing back
+        self.assertEqual(claim_new_keys(pairs, keys + [(a.id, 7, "phone_detected")]),
+                         ({(a.id, 7, "phone_detected")}, set()))
+
+    def test_matching_etag_returns_304_from_cache(self):
+        self.flush(User.objects.create_user("a", password="pw"), make_events(1))
+        self.client.force_authenticate(self.reviewer)
+        etag = self.client.get(self.URL)["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+
+
+class LoadHarnessTests(TestCase):
+    @modify_settings(MIDDLEWARE={"append": "proctoring.middleware.QueryCountHeaderMiddleware"})
+    def test_query_count_header_matches_queries_run(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("cand", password="pw"))
+        with CaptureQueriesContext(connection) as ctx:
+            res = client.post(BATCH_URL, {"exam_id": 7, "events": make_events(2)}, format="json")
+
+        self.assertEqual(int(res["X-DB-Query-Count"]), len(ctx.captured_queries))
+
+    def test_summarize_reports_percentiles_and_errors(self):
+        samples = [(i / 1000, 200, 8) for i in range(1, 100)] + [(1.0, 500, None)]
+        result = summarize(samples, elapsed=10)
+
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(result["errors"], 1)
+        self.assertEqual(result["throughput_rps"], 9.9)
+        self.assertEqual(result["latency_ms"]["p50"], 50.0)
+        self.assertEqual(result["latency_ms"]["p99"], 99.0)
+        self.assertEqual(result["queries_per_request"], {"mean": 8.0, "max": 8})
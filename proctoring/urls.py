@@ -1,8 +1,13 @@
 # proctoring/urls.py
 from django.urls import path
-from .views import log_anomaly, log_anomaly_batch
+from .views import log_anomaly, log_anomaly_batch, ingest_stats, exam_event_counts, exam_timeline, exam_top_risk, exam_summary
 
 urlpatterns = [
     path("anomaly/", log_anomaly),
     path("anomaly/batch/", log_anomaly_batch),
+    path("ingest/stats/", ingest_stats),
+    path("exams/<int:exam_id>/counts/", exam_event_counts),
+    path("exams/<int:exam_id>/timeline/", exam_timeline),
+    path("exams/<int:exam_id>/risk/", exam_top_risk),
+    path("exams/<int:exam_id>/summary/", exam_summary),
 ]
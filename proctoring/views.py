@@ -1,83 +1,236 @@
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+import base64
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils.dateparse import parse_datetime
-from .serializers import ProctorAnomalySerializer, ProctorAnomalyAggregateSerializer
-from .models import ProctorAnomaly, ProctorAnomalyAggregate
+from rest_framework.settings import api_settings
+from .serializers import ProctorAnomalySerializer, AnomalyBatchSerializer, ProctorAnomalyTimelineSerializer
+from .ingest import (
+    record_batch, batch_record, anomaly_record, claim_buffered_batch, release_buffered_batch,
+)
+from .buffer import BufferFull, buffering_enabled, get_buffer
+from .models import ProctorAnomaly, ProctorAnomalyRollup
+from .rollups import event_counts
+from .scoring import top_risk
+from .summary import cached_summary
+from .wire import ProctorBatchParser, ProctorBatchRenderer
+
+TIMELINE_DEFAULT_LIMIT = 100
+TIMELINE_MAX_LIMIT = 500
+RISK_MAX_LIMIT = 200
+
+
+def _query_ts(request, name):
+    """Aware datetime from an ISO query param, or None if absent/invalid."""
+    try:
+        value = parse_datetime(request.query_params.get(name, ""))
+    except ValueError:
+        return None
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _encode_cursor(anomaly):
+    raw = f"{anomaly.timestamp.isoformat()}|{anomaly.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """(timestamp, id) keyset position, or None if the cursor is malformed."""
+    try:
+        ts, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        ts = parse_datetime(ts)
+        return (ts, int(pk)) if ts else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _enqueue(record):
+    """Append to the write-behind buffer; returns a 503 response when it is full."""
+    try:
+        get_buffer().append(record)
+    except BufferFull:
+        return Response(
+            {"detail": "Anomaly ingest buffer is full, retry later"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(settings.PROCTOR_BUFFER_RETRY_AFTER)},
+        )
+    return None
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def log_anomaly(request):
     serializer = ProctorAnomalySerializer(data=request.data, context={"request": request})
-    if serializer.is_valid():
-        anomaly = serializer.save()
-        return Response(ProctorAnomalySerializer(anomaly).data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if buffering_enabled():
+        rejected = _enqueue(anomaly_record(request.user.pk, serializer.validated_data))
+        if rejected:
+            return rejected
+        return Response({"queued": 1}, status=status.HTTP_202_ACCEPTED)
+
+    anomaly = serializer.save()
+    return Response(ProctorAnomalySerializer(anomaly).data, status=status.HTTP_201_CREATED)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@parser_classes([*api_settings.DEFAULT_PARSER_CLASSES, ProctorBatchParser])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, ProctorBatchRenderer])
 def log_anomaly_batch(request):
     """
     Expected payload:
     {
       "exam_id": 123,
       "user_id": 42,           # optional (we will use request.user)
+      "batch_id": "<uuid>",    # optional, makes retries idempotent
       "events": [
          { "event_type": "no_face", "count": 3, "first_ts": "...", "last_ts": "..." },
          ...
       ]
     }
-    Response returns updated aggregates list.
+    Response returns updated aggregates list
+    (or 202 {"queued": n} when PROCTOR_INGEST_MODE is "buffered").
+
+    Also accepts/returns the packed binary format from proctoring.wire when
+    Content-Type / Accept is application/x-proctor-batch.
     """
-    user = request.user
-    data = request.data
-    exam_id = data.get("exam_id")
-    events = data.get("events", [])
-
-    if not exam_id or not isinstance(events, list):
-        return Response({"detail": "exam_id and events required"}, status=status.HTTP_400_BAD_REQUEST)
-
-    updated_aggregates = []
-
-    for ev in events:
-        event_type = ev.get("event_type")
-        count = int(ev.get("count", 0))
-        first_ts = ev.get("first_ts")
-        last_ts = ev.get("last_ts")
-
-        # update/create aggregate
-        agg, created = ProctorAnomalyAggregate.objects.get_or_create(
-            user=user, exam_id=exam_id, event_type=event_type,
-            defaults={"count": 0, "last_seen": parse_datetime(last_ts) if last_ts else None}
-        )
+    serializer = AnomalyBatchSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    exam_id = serializer.validated_data["exam_id"]
+    events = serializer.validated_data["events"]
+    batch_id = serializer.validated_data["batch_id"]
 
-        # increment count and update last_seen
-        agg.count = (agg.count or 0) + count
-        if last_ts:
-            parsed = parse_datetime(last_ts)
-            if parsed:
-                agg.last_seen = parsed
-        agg.save()
-
-        # Create a single ProctorAnomaly log entry for this aggregated event
-        try:
-            ts_parsed = parse_datetime(last_ts) if last_ts else None
-            ProctorAnomaly.objects.create(
-                user=user,
-                exam_id=exam_id,
-                event_type=event_type,
-                timestamp=ts_parsed or None,
-                message=f"Batch reported: count={count}, window_first={first_ts}, window_last={last_ts}"
-            )
-        except Exception:
-            # don't fail the whole batch for logging error
-            pass
-
-        updated_aggregates.append({
-            "event_type": agg.event_type,
-            "count": agg.count,
-            "last_seen": agg.last_seen.isoformat() if agg.last_seen else None,
-        })
+    if buffering_enabled():
+        # a retried batch_id that is already queued is acknowledged without queueing it again
+        if claim_buffered_batch(request.user.pk, exam_id, batch_id):
+            # any failure to queue gives the claim back, or the retry would be acked and dropped
+            try:
+                rejected = _enqueue(batch_record(request.user.pk, exam_id, events, batch_id))
+            except Exception:
+                release_buffered_batch(request.user.pk, exam_id, batch_id)
+                raise
+            if rejected:
+                release_buffered_batch(request.user.pk, exam_id, batch_id)
+                return rejected
+        return Response({"queued": len(events)}, status=status.HTTP_202_ACCEPTED)
 
+    # one transaction: a locked read and a single upsert on the aggregates plus one bulk insert of log rows;
+    # a replayed batch_id is answered from its stored result
+    updated_aggregates = record_batch(request.user, exam_id, events, batch_id)
     return Response({"aggregates": updated_aggregates}, status=status.HTTP_200_OK)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def ingest_stats(request):
+    """Write-behind buffer depth and lag (age of the oldest undrained record)."""
+    if not buffering_enabled():
+        return Response({"mode": "sync"})
+    return Response({"mode": "buffered", **get_buffer().stats()})
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def exam_event_counts(request, exam_id):
+    """
+    GET /api/proctor/exams/<exam_id>/counts/?from=<iso>&to=<iso>&granularity=hour|minute&user=<id>
+    Bucketed event counts (default: last 24 hours, hourly), served from the rollups.
+    Results are bucket-aligned: every bucket overlapping [from, to) is counted in full.
+    """
+    now = timezone.now()
+    start = _query_ts(request, "from") or now - timedelta(days=1)
+    end = _query_ts(request, "to") or now
+    granularity = request.query_params.get("granularity", ProctorAnomalyRollup.HOUR)
+    if granularity not in dict(ProctorAnomalyRollup.GRANULARITIES):
+        return Response({"detail": "granularity must be minute or hour"}, status=status.HTTP_400_BAD_REQUEST)
+    user_id = request.query_params.get("user")
+    if user_id is not None and not user_id.isdigit():
+        return Response({"detail": "user must be an id"}, status=status.HTTP_400_BAD_REQUEST)
+
+    buckets = event_counts(exam_id, start, end, granularity, int(user_id) if user_id else None)
+    return Response({"exam_id": exam_id, "granularity": granularity, "buckets": buckets})
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def exam_timeline(request, exam_id):
+    """
+    GET /api/proctor/exams/<exam_id>/timeline/?user=<id>&event_type=<type>&from=<iso>&to=<iso>&limit=<n>&cursor=<c>
+    Raw anomalies in (timestamp, id) order, keyset-paginated: each page is one
+    index range scan, so cost does not depend on how deep the cursor is.
+    Response: {"results": [...], "next_cursor": "<c>" | null}
+    """
+    qs = ProctorAnomaly.objects.filter(exam_id=exam_id)
+
+    user_id = request.query_params.get("user")
+    if user_id is not None:
+        if not user_id.isdigit():
+            return Response({"detail": "user must be an id"}, status=status.HTTP_400_BAD_REQUEST)
+        qs = qs.filter(user_id=int(user_id))
+    event_type = request.query_params.get("event_type")
+    if event_type:
+        qs = qs.filter(event_type=event_type)
+    start = _query_ts(request, "from")
+    if start:
+        qs = qs.filter(timestamp__gte=start)
+    end = _query_ts(request, "to")
+    if end:
+        qs = qs.filter(timestamp__lt=end)
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        position = _decode_cursor(cursor)
+        if position is None:
+            return Response({"detail": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        ts, pk = position
+        qs = qs.filter(Q(timestamp__gt=ts) | Q(timestamp=ts, id__gt=pk))
+
+    try:
+        limit = int(request.query_params.get("limit", TIMELINE_DEFAULT_LIMIT))
+    except ValueError:
+        limit = TIMELINE_DEFAULT_LIMIT
+    limit = max(1, min(limit, TIMELINE_MAX_LIMIT))
+
+    # one extra row tells us whether there is a next page without a COUNT(*)
+    rows = list(qs.order_by("timestamp", "id")[:limit + 1])
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return Response({
+        "results": ProctorAnomalyTimelineSerializer(rows[:limit], many=True).data,
+        "next_cursor": next_cursor,
+    })
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def exam_top_risk(request, exam_id):
+    """
+    GET /api/proctor/exams/<exam_id>/risk/?limit=<k>
+    Top-k candidates by current decayed suspicion score (one indexed query).
+    """
+    try:
+        limit = int(request.query_params.get("limit", 10))
+    except ValueError:
+        limit = 10
+    limit = max(1, min(limit, RISK_MAX_LIMIT))
+    return Response({"exam_id": exam_id, "results": top_risk(exam_id, limit)})
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def exam_summary(request, exam_id):
+    """
+    GET /api/proctor/exams/<exam_id>/summary/
+    Event totals per type, affected candidates and the latest events, read from
+    the materialized counters and cached briefly. Send the returned ETag back as
+    If-None-Match to get a 304 while nothing has changed.
+    """
+    etag, payload = cached_summary(exam_id)
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(payload, headers={"ETag": etag})
@@ -0,0 +1,166 @@
+# proctoring/wire.py
+"""
+Compact binary encoding for anomaly batches, negotiated by content type
+(`application/x-proctor-batch`) next to the default JSON.
+
+Request body (little-endian):
+    header  "PB" | version u8 | exam_id u32 | n_events u16
+            version 2 appends batch_id (16 raw UUID bytes) for idempotent retries
+    event   type_code u8 | flags u8 | count u32 | first_ms i64 | last_ms i64
+            flags bit 0: first_ms present, bit 1: last_ms present
+
+Response body:
+    header  "PA" | version u8 | kind u8 | ...
+    kind A  n u16, then per aggregate: type_code u8 | flags u8 | count u32 | last_seen_ms i64
+    kind Q  queued u32                       (buffered ingest)
+    kind J  UTF-8 JSON of any other payload  (validation errors, detail messages)
+
+Timestamps are epoch milliseconds in UTC. Event type codes are fixed here,
+not derived from EVENT_TYPES order, so adding a type never renumbers
+existing ones.
+"""
+import json
+import struct
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+MEDIA_TYPE = "application/x-proctor-batch"
+VERSION = 1
+
+EVENT_TYPE_CODES = {
+    "no_face": 1,
+    "multiple_faces": 2,
+    "phone_detected": 3,
+    "looking_away": 4,
+}
+EVENT_TYPES_BY_CODE = {code: name for name, code in EVENT_TYPE_CODES.items()}
+
+REQ_HEADER = struct.Struct("<2sBIH")
+REQ_BATCH_ID = struct.Struct("<16s")
+REQ_EVENT = struct.Struct("<BBIqq")
+RESP_HEADER = struct.Struct("<2sBc")
+RESP_COUNT = struct.Struct("<H")
+RESP_AGG = struct.Struct("<BBIq")
+RESP_QUEUED = struct.Struct("<I")
+
+HAS_FIRST = 1
+HAS_LAST = 2
+
+
+def to_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+def from_ms(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def encode_batch(exam_id, events, batch_id=None):
+    """Client-side encoder (used by tests and the benchmark); timestamps are aware datetimes or None."""
+    if batch_id:
+        out = [REQ_HEADER.pack(b"PB", 2, exam_id, len(events)), REQ_BATCH_ID.pack(uuid.UUID(str(batch_id)).bytes)]
+    else:
+        out = [REQ_HEADER.pack(b"PB", VERSION, exam_id, len(events))]
+    for ev in events:
+        first, last = ev.get("first_ts"), ev.get("last_ts")
+        flags = (HAS_FIRST if first else 0) | (HAS_LAST if last else 0)
+        out.append(REQ_EVENT.pack(
+            EVENT_TYPE_CODES[ev["event_type"]], flags, ev.get("count", 0),
+            to_ms(first) if first else 0, to_ms(last) if last else 0,
+        ))
+    return b"".join(out)
+
+
+def decode_batch(data):
+    """Bytes -> the dict shape AnomalyBatchSerializer validates (datetimes already parsed)."""
+    if len(data) < REQ_HEADER.size:
+        raise ValueError("truncated header")
+    magic, version, exam_id, n = REQ_HEADER.unpack_from(data, 0)
+    if magic != b"PB" or version not in (1, 2):
+        raise ValueError("unknown batch format")
+    offset = REQ_HEADER.size
+    batch_id = None
+    if version == 2:
+        if len(data) < offset + REQ_BATCH_ID.size:
+            raise ValueError("truncated header")
+        batch_id = str(uuid.UUID(bytes=REQ_BATCH_ID.unpack_from(data, offset)[0]))
+        offset += REQ_BATCH_ID.size
+    if len(data) != offset + n * REQ_EVENT.size:
+        raise ValueError("length does not match event count")
+
+    events = []
+    for code, flags, count, first_ms, last_ms in REQ_EVENT.iter_unpack(data[offset:]):
+        events.append({
+            # unknown codes fail ChoiceField validation downstream with a normal 400
+            "event_type": EVENT_TYPES_BY_CODE.get(code, f"code:{code}"),
+            "count": count,
+            "first_ts": from_ms(first_ms) if flags & HAS_FIRST else None,
+            "last_ts": from_ms(last_ms) if flags & HAS_LAST else None,
+        })
+    return {"exam_id": exam_id, "batch_id": batch_id, "events": events}
+
+
+def encode_response(data):
+    if isinstance(data, dict) and set(data) == {"aggregates"}:
+        out = [RESP_HEADER.pack(b"PA", VERSION, b"A"), RESP_COUNT.pack(len(data["aggregates"]))]
+        for agg in data["aggregates"]:
+            last_seen = agg.get("last_seen")
+            if isinstance(last_seen, str):
+                last_seen = datetime.fromisoformat(last_seen)
+            out.append(RESP_AGG.pack(
+                EVENT_TYPE_CODES.get(agg["event_type"], 0),
+                HAS_LAST if last_seen else 0,
+                agg["count"],
+                to_ms(last_seen) if last_seen else 0,
+            ))
+        return b"".join(out)
+    if isinstance(data, dict) and set(data) == {"queued"}:
+        return RESP_HEADER.pack(b"PA", VERSION, b"Q") + RESP_QUEUED.pack(data["queued"])
+    return RESP_HEADER.pack(b"PA", VERSION, b"J") + json.dumps(data, default=str).encode()
+
+
+def decode_response(data):
+    """Inverse of encode_response (for clients and tests)."""
+    magic, version, kind = RESP_HEADER.unpack_from(data, 0)
+    if magic != b"PA" or version != VERSION:
+        raise ValueError("unknown response format")
+    body = data[RESP_HEADER.size:]
+    if kind == b"A":
+        (n,) = RESP_COUNT.unpack_from(body, 0)
+        return {"aggregates": [
+            {
+                "event_type": EVENT_TYPES_BY_CODE.get(code),
+                "count": count,
+                "last_seen": from_ms(ms).isoformat() if flags & HAS_LAST else None,
+            }
+            for code, flags, count, ms in RESP_AGG.iter_unpack(body[RESP_COUNT.size:RESP_COUNT.size + n * RESP_AGG.size])
+        ]}
+    if kind == b"Q":
+        return {"queued": RESP_QUEUED.unpack_from(body, 0)[0]}
+    return json.loads(body)
+
+
+class ProctorBatchParser(BaseParser):
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return decode_batch(stream.read())
+        except (ValueError, struct.error, OverflowError) as exc:
+            raise ParseError(f"Malformed proctor batch - {exc}")
+
+
+class ProctorBatchRenderer(BaseRenderer):
+    media_type = MEDIA_TYPE
+    format = "pbatch"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return encode_response(data)
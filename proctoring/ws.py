@@ -0,0 +1,153 @@
+# proctoring/ws.py
+"""
+WebSocket ingest channel for webcam proctor batches (raw ASGI, routed from
+backend/asgi.py at /ws/proctor/).
+
+Protocol (JSON text frames):
+  client -> {"type": "auth", "token": "<access JWT>"}
+  server -> {"type": "ready"}
+  client -> {"type": "batch", "seq": 1, "batch_id": "<uuid>", "exam_id": 123, "events": [...]}
+  server -> {"type": "ack", "seq": 1, "aggregates": [...]}          (sync mode)
+            {"type": "ack", "seq": 1, "queued": n}                  (buffered mode)
+            {"type": "error", "seq": 1, "errors": {...}}
+            {"type": "error", "seq": 1, "retry": true}             (transient failure: resend it)
+
+The JWT is checked once per connection; the socket is closed with 4401 when
+the token is rejected or expires, and the client falls back to the HTTP
+batch endpoint. Batches go through the same validation and write path as
+log_anomaly_batch.
+"""
+import json
+import logging
+import time
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import close_old_connections
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+
+from .buffer import BufferFull, buffering_enabled, get_buffer
+from .ingest import batch_record, claim_buffered_batch, record_batch, release_buffered_batch
+from .serializers import AnomalyBatchSerializer
+
+logger = logging.getLogger(__name__)
+
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_TRY_AGAIN = 1013  # buffer full: client falls back to HTTP and gets Retry-After there
+MAX_FRAME_BYTES = 64 * 1024
+
+
+def _with_fresh_connection(fn):
+    # long-lived sockets never fire request_started/finished, so recycle DB connections per call;
+    # thread-sensitive calls run on the socket's own thread (see proctor_socket), keeping its
+    # connection affinity without serializing every socket on the one shared sync thread
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=True)
+
+
+@_with_fresh_connection
+def _authenticate(raw_token):
+    auth = JWTAuthentication()
+    validated = auth.get_validated_token(raw_token)
+    return auth.get_user(validated), validated.get("exp")
+
+
+@_with_fresh_connection
+def _ingest(user, data):
+    serializer = AnomalyBatchSerializer(data=data)
+    if not serializer.is_valid():
+        return {"errors": serializer.errors}
+    exam_id = serializer.validated_data["exam_id"]
+    events = serializer.validated_data["events"]
+    batch_id = serializer.validated_data["batch_id"]
+    if buffering_enabled():
+        if claim_buffered_batch(user.pk, exam_id, batch_id):
+            try:
+                get_buffer().append(batch_record(user.pk, exam_id, events, batch_id))
+            except Exception:  # BufferFull, or the buffer itself failing
+                release_buffered_batch(user.pk, exam_id, batch_id)
+                raise
+        return {"queued": len(events)}
+    return {"aggregates": record_batch(user, exam_id, events, batch_id)}
+
+
+async def _send(send, payload):
+    await send({"type": "websocket.send", "text": json.dumps(payload)})
+
+
+async def _close(send, code):
+    await send({"type": "websocket.close", "code": code})
+
+
+async def proctor_socket(scope, receive, send):
+    async with ThreadSensitiveContext():
+        await _serve(scope, receive, send)
+
+
+async def _serve(scope, receive, send):
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    await send({"type": "websocket.accept"})
+
+    user, expires_at = None, None
+    while True:
+        message = await receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+        text = message.get("text")
+        if text is None and message.get("bytes") is not None:
+            text = message["bytes"].decode("utf-8", "replace")
+        if not text or len(text) > MAX_FRAME_BYTES:
+            await _send(send, {"type": "error", "detail": "empty or oversized frame"})
+            continue
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            await _send(send, {"type": "error", "detail": "invalid JSON"})
+            continue
+        if not isinstance(frame, dict):
+            await _send(send, {"type": "error", "detail": "frame must be an object"})
+            continue
+
+        if user is None:
+            if frame.get("type") != "auth":
+                await _close(send, CLOSE_UNAUTHORIZED)
+                return
+            try:
+                user, expires_at = await _authenticate(str(frame.get("token", "")).encode())
+            except (InvalidToken, TokenError, AuthenticationFailed):
+                await _close(send, CLOSE_UNAUTHORIZED)
+                return
+            await _send(send, {"type": "ready"})
+            continue
+
+        if expires_at and time.time() >= expires_at:
+            await _close(send, CLOSE_UNAUTHORIZED)
+            return
+
+        if frame.get("type") != "batch":
+            await _send(send, {"type": "error", "seq": frame.get("seq"), "detail": "unknown frame type"})
+            continue
+
+        try:
+            result = await _ingest(user, frame)
+        except BufferFull:
+            await _close(send, CLOSE_TRY_AGAIN)
+            return
+        except Exception:
+            # e.g. the database or buffer backend is briefly unavailable; the batch is safe to resend
+            logger.exception("websocket batch ingest failed")
+            await _send(send, {"type": "error", "seq": frame.get("seq"), "detail": "ingest failed", "retry": True})
+            continue
+
+        if "errors" in result:
+            await _send(send, {"type": "error", "seq": frame.get("seq"), **result})
+        else:
+            await _send(send, {"type": "ack", "seq": frame.get("seq"), **result})
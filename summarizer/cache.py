@@ -0,0 +1,74 @@
+# summarizer/cache.py
+"""
+Content-addressed summary cache.
+
+A summary is keyed by sha256 over (normalized text, tokens, model chain), so
+resubmitting the same document is answered without calling the LLM. Lookups
+go to the Django cache first, then to Summarization rows by their indexed
+content_hash (a database hit is copied back into the cache). Only LLM
+summaries are cached and hashed; extractive fallbacks, and long-document
+summaries built partly from them, are not, so an outage never pins a
+degraded summary.
+"""
+import hashlib
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Summarization
+
+KEY_PREFIX = "summarizer:summary:"
+STATS_PREFIX = "summarizer:cache:stats:"
+OUTCOMES = ("memory", "db", "miss")
+
+
+def normalize(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def content_hash(text, tokens, model):
+    """Hex sha256 of the summary request; `text` should already be normalized."""
+    return hashlib.sha256(f"{model}\x00{tokens}\x00{text}".encode()).hexdigest()
+
+
+def lookup(digest, use_db=True):
+    """(summary, "memory" | "db") for a cached summary, else (None, "miss")."""
+    summary = cache.get(KEY_PREFIX + digest)
+    if summary is not None:
+        return summary, "memory"
+    if not use_db:
+        return None, "miss"
+    summary = (
+        Summarization.objects.filter(content_hash=digest)
+        .order_by("-id").values_list("summary_text", flat=True).first()
+    )
+    if summary is not None:
+        store(digest, summary)
+        return summary, "db"
+    return None, "miss"
+
+
+def store(digest, summary):
+    cache.set(KEY_PREFIX + digest, summary, timeout=settings.SUMMARIZER_CACHE_SECONDS)
+
+
+def count(outcome):
+    key = STATS_PREFIX + outcome
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add and incr; the counter restarts
+        cache.set(key, 1, timeout=None)
+
+
+def stats():
+    values = cache.get_many([STATS_PREFIX + outcome for outcome in OUTCOMES])
+    counts = {outcome: values.get(STATS_PREFIX + outcome, 0) for outcome in OUTCOMES}
+    lookups = sum(counts.values())
+    return {
+        "memory_hits": counts["memory"],
+        "db_hits": counts["db"],
+        "misses": counts["miss"],
+        "hit_ratio": round((counts["memory"] + counts["db"]) / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,126 @@
+# summarizer/extractive.py
+"""
+Extractive summaries: TextRank over TF-IDF sentence vectors.
+
+Sentences are segmented with abbreviation, initial and decimal handling,
+and every word is mapped to an integer id in a single pass. The sentence x
+term TF-IDF matrix (sublinear tf, smoothed idf, rows L2-normalized) is kept
+in coordinate form, so its products are np.bincount calls over the nonzeros.
+
+TextRank runs PageRank on the cosine-similarity graph W = X Xt with the
+diagonal removed, without ever building W: W p = X (Xt p) - diag(X Xt) p
+costs O(nonzeros) per iteration, so the cost grows with input size, not
+with sentences squared. The top sentences are returned in document order.
+"""
+import re
+import string
+from itertools import chain
+
+import numpy as np
+
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+MIN_SENTENCE_TOKENS = 3  # shorter fragments are only picked when nothing else is left
+
+# punctuation becomes whitespace, so str.split tokenizes at C speed (a regex tokenizer is ~5x slower)
+PUNCTUATION = str.maketrans({ch: " " for ch in string.punctuation + "“”‘’«»–—…•·"})
+# candidate boundary: terminal punctuation (plus closing quotes/brackets), whitespace, then a
+# sentence start; paragraph breaks always end a sentence
+BOUNDARY_RE = re.compile(r"[.!?…]+[\"'”’)\]]*\s+(?=[\"'“‘(\[]?[A-Z0-9])|\n\s*\n")
+ABBREVIATIONS = frozenset("""
+    mr mrs ms dr prof sr jr st mt vs etc fig figs no nos vol vols ed eds al approx dept est inc ltd co corp
+    jan feb mar apr jun jul aug sep sept oct nov dec mon tue wed thu fri sat sun e.g i.e cf gen gov sen rep
+    u.s u.k a.m p.m
+""".split())
+STOP_WORDS = frozenset("""
+    a about above after again against all am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her
+    here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+    now of off on once only or other our ours ourselves out over own same she should so some such than that the
+    their theirs them themselves then there these they this those through to too under until up very was we
+    were what when where which while who whom why will with would you your yours yourself yourselves also
+""".split())
+
+
+def split_sentences(text):
+    """Sentences of `text`, stripped, in order."""
+    sentences, start = [], 0
+    for match in BOUNDARY_RE.finditer(text):
+        if match.group()[0] == ".":
+            before = text[start:match.start()].rsplit(None, 1)
+            word = before[-1].lower().lstrip("\"'“‘([") if before else ""
+            if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue  # "Dr. Smith", "e.g. Paris", "J. Smith"
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def tfidf(sentences):
+    """
+    (rows, cols, values, n_terms, lengths): the L2-normalized TF-IDF matrix
+    of the sentences in coordinate form, its width, and the number of
+    (non-stop-word) tokens per sentence.
+    """
+    tokens = [sentence.lower().translate(PUNCTUATION).split() for sentence in sentences]
+    n = len(sentences)
+    flat = list(chain.from_iterable(tokens))
+    vocabulary = {term: i for i, term in enumerate(dict.fromkeys(flat))}
+    n_terms = max(1, len(vocabulary))
+    ids = np.fromiter(map(vocabulary.__getitem__, flat), dtype=np.int64, count=len(flat))
+    sentence_of = np.repeat(np.arange(n, dtype=np.int64), np.fromiter(map(len, tokens), dtype=np.int64, count=n))
+
+    # stop words are dropped by id, deciding once per distinct term
+    content = np.fromiter((term not in STOP_WORDS for term in vocabulary), dtype=bool, count=len(vocabulary))
+    keep = content[ids]
+    ids, sentence_of = ids[keep], sentence_of[keep]
+    lengths = np.bincount(sentence_of, minlength=n)
+
+    pairs, tf = np.unique(sentence_of * n_terms + ids, return_counts=True)
+    rows, cols = pairs // n_terms, pairs % n_terms
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log((1 + n) / (1 + df)) + 1
+    values = (1 + np.log(tf)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=n))
+    values /= norms[rows]
+    return rows, cols, values, n_terms, lengths
+
+
+def textrank(rows, cols, values, n, n_terms):
+    """PageRank scores of the n sentences on their cosine-similarity graph (never materialized)."""
+
+    def similarity_times(v):
+        xt_v = np.bincount(cols, weights=values * v[rows], minlength=n_terms)
+        return np.bincount(rows, weights=values * xt_v[cols], minlength=n) - self_similarity * v
+
+    self_similarity = np.bincount(rows, weights=values * values, minlength=n)  # 1 for non-empty rows
+    degree = similarity_times(np.ones(n))
+    dangling = degree <= 1e-12
+    inv_degree = np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, degree))
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        spread = similarity_times(scores * inv_degree)
+        updated = (1 - DAMPING) / n + DAMPING * (spread + scores[dangling].sum() / n)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize(text, max_sentences=3):
+    """The `max_sentences` most central sentences of `text`, in document order ("" for empty text)."""
+    sentences = split_sentences(text)
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+    rows, cols, values, n_terms, lengths = tfidf(sentences)
+    scores = textrank(rows, cols, values, len(sentences), n_terms)
+    scores[lengths < MIN_SENTENCE_TOKENS] -= 1.0  # fragments rank below every real sentence
+    top = np.sort(np.argpartition(-scores, max_sentences - 1)[:max_sentences])
+    return " ".join(sentences[i] for i in top)
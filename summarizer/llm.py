@@ -0,0 +1,324 @@
+# summarizer/llm.py
+"""
+LLM client for summaries: pooled keep-alive HTTP, hedged fallback and a
+circuit breaker per model.
+
+Models are tried in order. The primary gets a head start of its recent
+SUMMARIZER_HEDGE_PERCENTILE latency; if it has not answered by then, the
+next model is called as well and the first good answer wins. An error moves
+on to the next model at once, and the whole call gives up after
+SUMMARIZER_LLM_TIMEOUT seconds. SUMMARIZER_BREAKER_FAILURES consecutive
+failures open a model's breaker: it is skipped for
+SUMMARIZER_BREAKER_COOLDOWN_SECONDS, then a single trial call decides
+whether it closes again.
+
+Breakers and latency/error stats live in the client, so they are per worker
+process.
+
+stream() relays a summary piece by piece as the model generates it (Gemini's
+streamGenerateContent over SSE). Streams are not hedged: once text has been
+relayed the model cannot change, so the next model is only tried when one
+fails before its first piece. Models without a streaming endpoint answer in
+one piece.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Models to try, in order (adjust to your account)
+MODEL_GEMINI = "gemini-2.5-flash"
+MODEL_BIS = "text-bison-001"    # fallback
+
+LATENCY_WINDOW = 200  # recent successful calls kept per model for the hedge percentile
+MIN_LATENCY_SAMPLES = 20  # below this, hedge after SUMMARIZER_HEDGE_DEFAULT_SECONDS
+CONNECT_TIMEOUT = 3.05
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+def _gemini_request(model, prompt, tokens):
+    return f"v1beta/models/{model}:generateContent", {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "maxOutputTokens": tokens,
+    }
+
+
+def _bison_request(model, prompt, tokens):
+    return f"v1beta2/models/{model}:generateText", {"prompt": {"text": prompt}, "maxOutputTokens": tokens}
+
+
+def _gemini_stream_request(model, prompt, tokens):
+    path, body = _gemini_request(model, prompt, tokens)
+    return path.replace(":generateContent", ":streamGenerateContent"), body
+
+
+REQUEST_BUILDERS = {MODEL_GEMINI: _gemini_request, MODEL_BIS: _bison_request}
+STREAM_BUILDERS = {MODEL_GEMINI: _gemini_stream_request}
+
+
+def extract_text(resp_json):
+    # Try common shapes; return first found string or "".
+    if not resp_json:
+        return ""
+    try:
+        if isinstance(resp_json, dict):
+            # candidate patterns
+            if "candidates" in resp_json and isinstance(resp_json["candidates"], list):
+                first = resp_json["candidates"][0]
+                for k in ("output", "content", "text"):
+                    if k in first:
+                        v = first[k]
+                        if isinstance(v, str):
+                            return v
+                        if isinstance(v, dict) and "text" in v:
+                            return v["text"]
+                        if isinstance(v, dict) and isinstance(v.get("parts"), list):
+                            for p in v["parts"]:
+                                if isinstance(p, dict) and "text" in p:
+                                    return p["text"]
+                        if isinstance(v, list) and len(v) and isinstance(v[0], dict):
+                            for p in v:
+                                if "text" in p:
+                                    return p["text"]
+            if "outputs" in resp_json and isinstance(resp_json["outputs"], list):
+                out0 = resp_json["outputs"][0]
+                if isinstance(out0, dict):
+                    if "output" in out0 and isinstance(out0["output"], str):
+                        return out0["output"]
+                    content = out0.get("content")
+                    if isinstance(content, list):
+                        for c in content:
+                            if isinstance(c, dict) and "text" in c:
+                                return c["text"]
+            for key in ("summary", "result"):
+                if key in resp_json and isinstance(resp_json[key], str):
+                    return resp_json[key]
+        return ""
+    except Exception:
+        logger.exception("extract failed")
+        return ""
+
+
+class ModelHealth:
+    """Latency/error stats and circuit breaker for one model."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def is_open(self):
+        return self.consecutive_failures >= settings.SUMMARIZER_BREAKER_FAILURES
+
+    def allow(self):
+        """False while the breaker is open; once the cooldown is over, lets one trial call through."""
+        with self.lock:
+            if not self.is_open():
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            self.open_until = now + settings.SUMMARIZER_BREAKER_COOLDOWN_SECONDS
+            return True
+
+    def success(self, latency):
+        with self.lock:
+            self.calls += 1
+            self.latencies.append(latency)
+            self.consecutive_failures = 0
+
+    def failure(self):
+        with self.lock:
+            self.calls += 1
+            self.errors += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures == settings.SUMMARIZER_BREAKER_FAILURES:
+                self.open_until = time.monotonic() + settings.SUMMARIZER_BREAKER_COOLDOWN_SECONDS
+
+    def percentile(self, pct):
+        with self.lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self):
+        with self.lock:
+            enough = len(self.latencies) >= MIN_LATENCY_SAMPLES
+        delay = self.percentile(settings.SUMMARIZER_HEDGE_PERCENTILE) if enough else None
+        return max(settings.SUMMARIZER_HEDGE_MIN_SECONDS,
+                   delay if delay is not None else settings.SUMMARIZER_HEDGE_DEFAULT_SECONDS)
+
+    def stats(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "circuit": "open" if self.is_open() else "closed",
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class LLMClient:
+    def __init__(self, base_url=None, models=(MODEL_GEMINI, MODEL_BIS)):
+        self.base_url = (base_url or settings.SUMMARIZER_LLM_BASE_URL).rstrip("/")
+        self.models = tuple(models)
+        self.health = {model: ModelHealth() for model in self.models}
+        pool_size = settings.SUMMARIZER_LLM_POOL_SIZE
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.models), pool_maxsize=pool_size)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm")
+
+    def call(self, model, prompt, tokens, api_key, timeout):
+        """One request to one model; records its latency or failure. Raises LLMError."""
+        path, body = REQUEST_BUILDERS[model](model, prompt, tokens)
+        health = self.health[model]
+        started = time.perf_counter()
+        try:
+            resp = self.http.post(f"{self.base_url}/{path}", params={"key": api_key}, json=body,
+                                  timeout=(CONNECT_TIMEOUT, timeout))
+            if resp.status_code != 200:
+                raise LLMError(f"{model}: HTTP {resp.status_code} {resp.text[:200]}")
+            text = extract_text(resp.json()).strip()
+            if not text:
+                raise LLMError(f"{model}: empty response")
+        except (requests.RequestException, ValueError, LLMError) as exc:
+            health.failure()
+            logger.warning("LLM call to %s failed after %.2fs: %s", model, time.perf_counter() - started, exc)
+            raise exc if isinstance(exc, LLMError) else LLMError(f"{model}: {exc}") from exc
+        health.success(time.perf_counter() - started)
+        return text
+
+    def summarize(self, prompt, tokens, api_key):
+        """First good answer from the model chain (hedged, see module docstring). Raises LLMError."""
+        deadline = time.monotonic() + settings.SUMMARIZER_LLM_TIMEOUT
+        queue = list(self.models)
+        pending, errors = {}, []
+
+        def launch():
+            """Start the next model whose breaker lets it through; None if none is left."""
+            # allow() only here: a half-open model's single trial must not go to a call never made
+            while queue:
+                model = queue.pop(0)
+                if self.health[model].allow():
+                    timeout = max(0.1, deadline - time.monotonic())
+                    pending[self.executor.submit(self.call, model, prompt, tokens, api_key, timeout)] = model
+                    return model
+                errors.append(f"{model}: circuit open")
+            return None
+
+        latest = launch()
+        if latest is None:
+            raise LLMError("every LLM provider is unavailable (circuit open)")
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_for = min(self.health[latest].hedge_delay(), remaining) if queue else remaining
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            if not done:
+                hedge = launch()
+                if hedge:
+                    logger.info("LLM %s slower than %.2fs, hedging to %s", latest, wait_for, hedge)
+                    latest = hedge
+                continue
+            for future in done:
+                pending.pop(future)
+                try:
+                    return future.result()
+                except LLMError as exc:
+                    errors.append(str(exc))
+            if queue and not pending:
+                latest = launch() or latest
+        raise LLMError("; ".join(errors) or f"no LLM answer within {settings.SUMMARIZER_LLM_TIMEOUT}s")
+
+    def stream(self, prompt, tokens, api_key):
+        """
+        Generator of summary pieces from the first model that starts answering
+        (see module docstring). The read timeout applies between pieces.
+        Raises LLMError.
+        """
+        errors = []
+        for model in self.models:
+            if not self.health[model].allow():
+                errors.append(f"{model}: circuit open")
+                continue
+            if model not in STREAM_BUILDERS:
+                try:
+                    yield self.call(model, prompt, tokens, api_key, settings.SUMMARIZER_LLM_TIMEOUT)
+                    return
+                except LLMError as exc:
+                    errors.append(str(exc))
+                    continue
+            relayed = False
+            try:
+                for piece in self._stream_model(model, prompt, tokens, api_key):
+                    relayed = True
+                    yield piece
+                return
+            except LLMError as exc:
+                if relayed:
+                    raise
+                errors.append(str(exc))
+        raise LLMError("; ".join(errors) or "no LLM model configured")
+
+    def _stream_model(self, model, prompt, tokens, api_key):
+        path, body = STREAM_BUILDERS[model](model, prompt, tokens)
+        health = self.health[model]
+        started = time.perf_counter()
+        relayed = False
+        try:
+            with self.http.post(f"{self.base_url}/{path}", params={"key": api_key, "alt": "sse"}, json=body,
+                                timeout=(CONNECT_TIMEOUT, settings.SUMMARIZER_LLM_TIMEOUT), stream=True) as resp:
+                if resp.status_code != 200:
+                    raise LLMError(f"{model}: HTTP {resp.status_code} {resp.text[:200]}")
+                resp.encoding = "utf-8"  # SSE is always UTF-8; requests would guess ISO-8859-1 for text/*
+                # chunk_size=None: each chunk of the (chunked) response as it arrives, not 512-byte reads
+                for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    piece = extract_text(json.loads(line[5:]))
+                    if piece:
+                        relayed = True
+                        yield piece
+            if not relayed:
+                raise LLMError(f"{model}: empty response")
+        except (requests.RequestException, ValueError, LLMError) as exc:
+            health.failure()
+            logger.warning("LLM stream from %s failed after %.2fs: %s", model, time.perf_counter() - started, exc)
+            raise exc if isinstance(exc, LLMError) else LLMError(f"{model}: {exc}") from exc
+        health.success(time.perf_counter() - started)
+
+    def stats(self):
+        return {model: health.stats() for model, health in self.health.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def default_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
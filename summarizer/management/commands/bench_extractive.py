@@ -0,0 +1,103 @@
+import json
+import math
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from summarizer import extractive
+
+
+def legacy_summary(text, max_sentences=3):
+    # fallback_extractive_summary as it was before summarizer/extractive.py, kept for comparison
+    sentences = [s.strip() for s in text.replace("\n", " ").split(".") if s.strip()]
+    if not sentences:
+        return ""
+    words = []
+    for s in sentences:
+        for w in s.lower().split():
+            w = "".join(ch for ch in w if ch.isalnum())
+            if w:
+                words.append(w)
+    freqs = Counter(words)
+    sent_scores = []
+    for i, s in enumerate(sentences):
+        score = 0
+        for w in s.lower().split():
+            w = "".join(ch for ch in w if ch.isalnum())
+            if w:
+                score += freqs.get(w, 0)
+        if len(s.split()) > 0:
+            score = score / math.log(len(s.split()) + 1)
+        sent_scores.append((score, i, s))
+    sent_scores.sort(reverse=True)
+    top = sorted(sent_scores[:max_sentences], key=lambda x: x[1])
+    summary = ". ".join([s for (_, _, s) in top])
+    if summary and not summary.endswith("."):
+        summary = summary + "."
+    return summary
+
+
+def make_document(size_bytes, seed=0):
+    """Prose-like text: Zipf-distributed words from a 20k vocabulary, 8-30 words per sentence."""
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(20000)]
+    weights = [1 / (i + 1) for i in range(len(vocabulary))]
+    sentences, size = [], 0
+    while size < size_bytes:
+        words = rng.choices(vocabulary, weights, k=rng.randint(8, 30))
+        sentence = " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = "Compare the TextRank extractive summarizer with the previous word-frequency fallback."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000,4000000",
+                            help="Comma-separated document sizes in bytes.")
+        parser.add_argument("--file", default=None, help="Benchmark this text file instead of generated text.")
+        parser.add_argument("--sentences", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per size; the best is reported.")
+        parser.add_argument("--json", action="store_true", help="Emit machine-readable results.")
+
+    def handle(self, *args, **opts):
+        if opts["file"]:
+            try:
+                with open(opts["file"], encoding="utf-8") as fh:
+                    documents = [fh.read()]
+            except OSError as exc:
+                raise CommandError(str(exc))
+        else:
+            documents = [make_document(int(n)) for n in opts["sizes"].split(",") if n]
+
+        results = []
+        for text in documents:
+            k = opts["sentences"]
+            results.append({
+                "bytes": len(text.encode()),
+                "sentences": len(extractive.split_sentences(text)),
+                "legacy_s": round(best_of(lambda: legacy_summary(text, k), opts["repeat"]), 4),
+                "textrank_s": round(best_of(lambda: extractive.summarize(text, k), opts["repeat"]), 4),
+            })
+            results[-1]["speedup"] = round(results[-1]["legacy_s"] / results[-1]["textrank_s"], 2)
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'bytes':>10} {'sentences':>10} {'legacy s':>10} {'textrank s':>11} {'speedup':>8}")
+        for r in results:
+            self.stdout.write(f"{r['bytes']:>10} {r['sentences']:>10} {r['legacy_s']:>10} "
+                              f"{r['textrank_s']:>11} {r['speedup']:>8}")
@@ -0,0 +1,132 @@
+# summarizer/mapreduce.py
+"""
+Map-reduce summaries for long documents.
+
+Text over SUMMARIZER_CHUNK_TOKENS (estimated) is cut on sentence boundaries
+into chunks of at most that many tokens. Chunks are summarized concurrently
+by up to SUMMARIZER_MAP_WORKERS threads, so wall-clock time grows with
+chunks / workers rather than with chunks. The partial summaries are then
+combined by one more call; if they are themselves too long for one prompt,
+they are mapped again first.
+
+Every map and reduce result is cached by content hash (see
+summarizer/cache.py), so an edited document only re-summarizes the chunks
+that changed. A chunk whose LLM call fails gets the extractive fallback
+instead of failing the whole document; the result is then degraded
+(is_degraded) and the caller must not cache it as an LLM summary.
+"""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import cache as summary_cache
+from .llm import MODEL_BIS, MODEL_GEMINI
+
+logger = logging.getLogger(__name__)
+
+MAP_MODEL_KEY = f"{MODEL_GEMINI}|{MODEL_BIS}|map"
+REDUCE_MODEL_KEY = f"{MODEL_GEMINI}|{MODEL_BIS}|reduce"
+MAP_INSTRUCTION = ("This is one part of a longer document. Summarize it concisely in about {tokens} tokens, "
+                   "keeping names, figures and conclusions")
+REDUCE_INSTRUCTION = ("These are summaries of consecutive parts of one document. Combine them into a single "
+                      "concise summary of about {tokens} tokens")
+
+MAX_ROUNDS = 3
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose; only used to size chunks
+    return len(text) // 4 + 1
+
+
+def is_long(text):
+    return estimate_tokens(text) > settings.SUMMARIZER_CHUNK_TOKENS
+
+
+def is_degraded(info):
+    """True if summarize_long's info shows extractive partials in the summary."""
+    return bool(info and info["fallback_chunks"])
+
+
+def split_chunks(text, max_tokens):
+    """
+    Consecutive chunks of whole sentences, each at most `max_tokens`
+    (estimated); a sentence longer than that is cut between words.
+    """
+    chunks, current, size = [], [], 0
+    for sentence in SENTENCE_END.split(text):
+        pieces = [sentence]
+        if estimate_tokens(sentence) > max_tokens:
+            words, pieces, piece = sentence.split(), [], []
+            for word in words:
+                if piece and estimate_tokens(" ".join(piece + [word])) > max_tokens:
+                    pieces.append(" ".join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                pieces.append(" ".join(piece))
+        for piece in pieces:
+            cost = estimate_tokens(piece) + 1
+            if current and size + cost > max_tokens:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += cost
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _cached_call(summarize, text, tokens, instruction, model_key):
+    """summarize(text, tokens, instruction) through the summary cache; returns (summary, was_cached)."""
+    digest = summary_cache.content_hash(text, tokens, model_key)
+    summary, _ = summary_cache.lookup(digest, use_db=False)
+    if summary is not None:
+        return summary, True
+    summary = summarize(text, tokens, instruction.format(tokens=tokens))
+    summary_cache.store(digest, summary)
+    return summary, False
+
+
+def summarize_long(text, tokens, summarize, fallback):
+    """
+    summarize(text, tokens, instruction) -> str calls the LLM (raising on
+    failure); fallback(text) -> str is the extractive summary for a chunk.
+    Returns (summary, {"chunks", "cached_chunks", "fallback_chunks", "rounds"}).
+    """
+    max_tokens = settings.SUMMARIZER_CHUNK_TOKENS
+    partial_tokens = settings.SUMMARIZER_PARTIAL_TOKENS
+    info = {"chunks": 0, "cached_chunks": 0, "fallback_chunks": 0, "rounds": 0}
+
+    def map_chunk(chunk):
+        try:
+            return _cached_call(summarize, chunk, partial_tokens, MAP_INSTRUCTION, MAP_MODEL_KEY)
+        except Exception as exc:
+            logger.warning("chunk summary failed, using extractive fallback: %s", exc)
+            return None, False
+
+    chunks = split_chunks(text, max_tokens)
+    while True:
+        info["rounds"] += 1
+        info["chunks"] += len(chunks)
+        unique = list(dict.fromkeys(chunks))  # repeated boilerplate is summarized once
+        with ThreadPoolExecutor(max_workers=max(1, min(settings.SUMMARIZER_MAP_WORKERS, len(unique)))) as pool:
+            results = dict(zip(unique, pool.map(map_chunk, unique)))
+        partials = []
+        for chunk in chunks:
+            summary, cached = results[chunk]
+            if summary is None:
+                info["fallback_chunks"] += 1
+                summary = fallback(chunk)
+            info["cached_chunks"] += cached
+            partials.append(summary)
+        combined = "\n\n".join(partials)
+        if estimate_tokens(combined) <= max_tokens or len(partials) == 1 or info["rounds"] >= MAX_ROUNDS:
+            break
+        chunks = split_chunks(combined, max_tokens)  # partials still too long for one prompt: map them again
+
+    summary, _ = _cached_call(summarize, combined, tokens, REDUCE_INSTRUCTION, REDUCE_MODEL_KEY)
+    return summary, info
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 05:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('summarizer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summarization',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -10,6 +10,8 @@ class Summarization(models.Model):
     tokens_requested = models.IntegerField(default=100)
     created_at = models.DateTimeField(auto_now_add=True)
     client_ip = models.GenericIPAddressField(null=True, blank=True)
+    # sha256 of (text, tokens, model) for LLM summaries, see summarizer/cache.py; blank for fallbacks
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)
 
     def __str__(self):
         return f"{self.email or 'anon'} - {self.created_at.isoformat()[:19]}"
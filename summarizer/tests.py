@@ -1,3 +1,336 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .extractive import split_sentences, summarize as extractive_summary
+from .llm import MODEL_BIS, MODEL_GEMINI, LLMClient, LLMError
+from .mapreduce import estimate_tokens, split_chunks, summarize_long
+from .models import Summarization
+
+SUMMARIZE_URL = '/api/summarizer/summarize/'
+STREAM_URL = '/api/summarizer/summarize/stream/'
+TEXT = 'The committee met on Monday. It approved the budget. Members thanked the chair.'
+
+
+@mock.patch('summarizer.views.SAVE_TO_DB', True)
+@mock.patch('summarizer.views.RATE_LIMIT_PER_HOUR', 2)
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+
+    def summarize(self, text=TEXT, tokens=100):
+        return self.client.post(SUMMARIZE_URL, {'text': text, 'tokens': tokens}, format='json')
+
+    @mock.patch('summarizer.views.call_gemini_summarize', return_value='Budget approved.')
+    def test_resubmission_skips_llm_and_rate_limit(self, llm):
+        first = self.summarize()
+        self.assertEqual((first.data['cache'], first.data['remaining']), ('miss', 1))
+
+        again = self.summarize('  The committee met on Monday.\nIt approved the budget.   Members thanked the chair. ')
+        self.assertEqual(again.data['summary'], 'Budget approved.')
+        self.assertEqual((again.data['cache'], again.data['remaining']), ('memory', 1))
+        self.assertEqual(llm.call_count, 1)
+
+        self.assertEqual(self.summarize(tokens=50).data['cache'], 'miss')  # tokens are part of the key
+        self.assertEqual(llm.call_count, 2)
+        self.assertEqual(self.summarize().status_code, 200)  # still free with the limit used up
+
+    @mock.patch('summarizer.views.call_gemini_summarize', return_value='Budget approved.')
+    def test_saved_rows_back_the_cache(self, llm):
+        self.summarize()
+        cache.clear()
+
+        res = self.summarize()
+        self.assertEqual((res.data['cache'], res.data['summary']), ('db', 'Budget approved.'))
+        self.assertEqual(self.summarize().data['cache'], 'memory')
+        self.assertEqual(llm.call_count, 1)
+
+        admin = APIClient()
+        admin.force_authenticate(User.objects.create_user('admin', password='pw', is_staff=True))
+        self.assertEqual(admin.get('/api/summarizer/cache-stats/').data,
+                         {'memory_hits': 1, 'db_hits': 1, 'misses': 0, 'hit_ratio': 1.0})
+
+    @override_settings(SUMMARIZER_CHUNK_TOKENS=20, SUMMARIZER_PARTIAL_TOKENS=5)
+    def test_long_documents_with_extractive_chunks_are_not_cached(self):
+        def flaky(text, tokens, instruction=None):
+            if 'budget' in text and instruction and 'one part' in instruction:
+                raise LLMError('chunk timed out')
+            return 'partial'
+
+        text = ' '.join([TEXT] * 3 + ['Snow fell across the northern valleys overnight.'])
+        with mock.patch('summarizer.views.call_gemini_summarize', side_effect=flaky):
+            res = self.summarize(text)
+            self.assertTrue(res.data['used_gemini'])
+            self.assertGreater(res.data['long_document']['fallback_chunks'], 0)
+            self.assertEqual(self.summarize(text).data['cache'], 'miss')
+        self.assertFalse(Summarization.objects.exclude(content_hash='').exists())
+
+    @mock.patch('summarizer.views.call_gemini_summarize', side_effect=RuntimeError('LLM down'))
+    def test_fallback_summaries_are_not_cached(self, llm):
+        self.assertFalse(self.summarize().data['used_gemini'])
+        self.assertEqual(self.summarize().data['cache'], 'miss')
+        self.assertEqual(llm.call_count, 2)
+        self.assertFalse(Summarization.objects.exclude(content_hash='').exists())
+
+
+def pieces(*texts, error=None):
+    yield from texts
+    if error:
+        raise LLMError(error)
+
+
+@mock.patch('summarizer.views.SAVE_TO_DB', True)
+@mock.patch('summarizer.views.RATE_LIMIT_PER_HOUR', 1)
+class SummaryStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    async def stream(self, **body):
+        res = await self.async_client.post(STREAM_URL, body, content_type='application/json')
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        content = b''.join([chunk async for chunk in res.streaming_content]).decode()
+        events = []
+        for block in content.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    async def test_pieces_are_relayed_then_saved_and_cached(self):
+        with mock.patch('summarizer.views.stream_gemini_summarize',
+                        side_effect=lambda text, tokens: pieces('Budget ', 'approved.')) as llm:
+            events = await self.stream(text=TEXT, email='a@example.com')
+            self.assertEqual(events[:3], [('meta', {'cache': 'miss', 'remaining': 0}),
+                                          ('delta', {'text': 'Budget '}), ('delta', {'text': 'approved.'})])
+            self.assertEqual(events[3][0], 'done')
+            self.assertEqual(events[3][1], {'summary': 'Budget approved.', 'saved': True, 'remaining': 0,
+                                            'used_gemini': True, 'cache': 'miss'})
+            row = await Summarization.objects.aget()
+            self.assertEqual((row.email, row.summary_text), ('a@example.com', 'Budget approved.'))
+            self.assertEqual(len(row.content_hash), 64)
+
+            # a cache hit is one piece and costs nothing against the (used up) limit
+            events = await self.stream(text=TEXT)
+            self.assertEqual([name for name, _ in events], ['meta', 'delta', 'done'])
+            self.assertEqual((events[1][1]['text'], events[2][1]['cache']), ('Budget approved.', 'memory'))
+            self.assertEqual(llm.call_count, 1)
+
+        res = await self.async_client.post(STREAM_URL, {'text': 'Something else.'}, content_type='application/json')
+        self.assertEqual(res.status_code, 429)
+
+    def test_refused_outside_asgi(self):
+        res = self.client.post(STREAM_URL, {'text': TEXT}, content_type='application/json')
+        self.assertEqual(res.status_code, 501)
+
+    async def test_failure_mid_stream_ends_with_the_extractive_summary(self):
+        with mock.patch('summarizer.views.stream_gemini_summarize',
+                        side_effect=lambda text, tokens: pieces('Budget ', error='connection reset')):
+            name, done = (await self.stream(text=TEXT))[-1]
+        self.assertEqual(name, 'done')
+        self.assertFalse(done['used_gemini'])
+        self.assertIn('connection reset', done['error'])
+        self.assertEqual(done['summary'], 'The committee met on Monday. Members thanked the chair.')
+        self.assertFalse(await Summarization.objects.exclude(content_hash='').aexists())
+
+    async def test_text_is_required(self):
+        res = await self.async_client.post(STREAM_URL, {'text': '  '}, content_type='application/json')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual((await self.async_client.get(STREAM_URL)).status_code, 405)
+
+
+class ExtractiveTests(SimpleTestCase):
+    def test_segmenter_keeps_abbreviations_initials_and_decimals(self):
+        text = ('Dr. Smith met J. Jones in the U.S. on Monday. Costs rose 3.5 percent, e.g. for fuel. '
+                '"Is it enough?" she asked! Fine.\n\nA heading\n\nThe end.')
+        self.assertEqual(split_sentences(text), [
+            'Dr. Smith met J. Jones in the U.S. on Monday.',
+            'Costs rose 3.5 percent, e.g. for fuel.',
+            '"Is it enough?" she asked!',
+            'Fine.',
+            'A heading',
+            'The end.',
+        ])
+
+    def test_textrank_picks_central_sentences_in_document_order(self):
+        text = (
+            'The city council approved the new transit budget on Tuesday. '
+            'My cat prefers the sunny windowsill. '
+            'The transit budget funds new buses and longer council-approved routes. '
+            'Bananas are yellow. '
+            'Council members said the budget for transit buses was overdue.'
+        )
+        summary = extractive_summary(text, 2)
+        self.assertNotIn('cat', summary)
+        self.assertNotIn('Bananas', summary)
+        self.assertTrue(summary.startswith('The city council') or summary.startswith('The transit budget'))
+        self.assertEqual(extractive_summary('Only one sentence here.', 3), 'Only one sentence here.')
+        self.assertEqual(extractive_summary('', 3), '')
+
+
+@override_settings(SUMMARIZER_CHUNK_TOKENS=100, SUMMARIZER_MAP_WORKERS=4, SUMMARIZER_PARTIAL_TOKENS=20)
+class MapReduceTests(SimpleTestCase):
+    # sentences of 96 characters: 4 per 100-token chunk
+    @staticmethod
+    def document(n):
+        return ' '.join(f'Sentence {i:02d} reports that the quarterly figures for region {i:02d} '
+                        f'were reviewed by the board today.' for i in range(n))
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.calls = []
+
+    def slow_llm(self, text, tokens, instruction):
+        self.calls.append(instruction)
+        time.sleep(0.2)
+        return f'[{len(text)} chars in {tokens}]'
+
+    def test_chunks_end_on_sentences_within_the_token_budget(self):
+        chunks = split_chunks(self.document(16), 100)
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(c.endswith('today.') and estimate_tokens(c) <= 100 for c in chunks))
+        self.assertEqual(' '.join(chunks), self.document(16))
+        self.assertTrue(all(estimate_tokens(c) <= 10 for c in split_chunks('x' * 30 + ' y' * 40, 10)))
+
+    def test_chunks_run_in_parallel_and_are_cached(self):
+        doc = self.document(32)  # 8 chunks
+        started = time.monotonic()
+        summary, info = summarize_long(doc, 60, self.slow_llm, lambda chunk: 'extract')
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(info, {'chunks': 8, 'cached_chunks': 0, 'fallback_chunks': 0, 'rounds': 1})
+        self.assertEqual(len(self.calls), 9)
+        self.assertIn('in 60]', summary)
+        self.assertLess(elapsed, 1.2)  # 2 waves of 4 + the reduce, vs 1.8 s one after another
+
+        self.calls.clear()
+        _, info = summarize_long(doc + ' One more sentence.', 60, self.slow_llm, lambda chunk: 'extract')
+        self.assertEqual((info['chunks'], info['cached_chunks']), (9, 8))
+        self.assertEqual(len(self.calls), 2)  # the new chunk and the reduce
+
+    def test_failed_chunks_fall_back_to_extractive(self):
+        def flaky(text, tokens, instruction):
+            if text.startswith('Sentence 04'):
+                raise LLMError('boom')
+            return 'partial'
+
+        _, info = summarize_long(self.document(16), 60, flaky, lambda chunk: 'extract')
+        self.assertEqual(info['fallback_chunks'], 1)
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Answers like the Gemini / text-bison endpoints; `behaviour[model]` = (delay seconds, HTTP status)."""
+    protocol_version = 'HTTP/1.1'  # streams are sent chunked, as Gemini does
+    behaviour = {}
+    hits = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        model = MODEL_GEMINI if MODEL_GEMINI in self.path else MODEL_BIS
+        self.hits[model] = self.hits.get(model, 0) + 1
+        delay, code = self.behaviour.get(model, (0, 200))
+        time.sleep(delay)
+        if 'streamGenerateContent' in self.path and code == 200:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for piece in ('summary ', 'from ', model):
+                event = f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': piece}]}}]})}\r\n\r\n"
+                event = event.encode()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(event), event))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        if model == MODEL_GEMINI:
+            body = {'candidates': [{'content': {'parts': [{'text': f'summary from {model}'}]}}]}
+        else:
+            body = {'candidates': [{'output': f'summary from {model}'}]}
+        payload = json.dumps(body if code == 200 else {'error': 'unavailable'}).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(SUMMARIZER_LLM_TIMEOUT=3, SUMMARIZER_HEDGE_DEFAULT_SECONDS=0.2, SUMMARIZER_HEDGE_MIN_SECONDS=0.05,
+                   SUMMARIZER_BREAKER_FAILURES=2, SUMMARIZER_BREAKER_COOLDOWN_SECONDS=60)
+class LLMClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubProvider)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubProvider.behaviour, StubProvider.hits = {}, {}
+        self.client = LLMClient(base_url=f'http://127.0.0.1:{self.server.server_port}')
+        self.addCleanup(self.client.executor.shutdown, wait=False)
+
+    def summarize(self):
+        return self.client.summarize('Summarize: text', 50, 'test-key')
+
+    def test_slow_primary_is_hedged_to_the_fallback(self):
+        StubProvider.behaviour = {MODEL_GEMINI: (1.5, 200)}
+        started = time.monotonic()
+        self.assertEqual(self.summarize(), f'summary from {MODEL_BIS}')
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(StubProvider.hits, {MODEL_GEMINI: 1, MODEL_BIS: 1})
+
+        StubProvider.behaviour = {}
+        self.assertEqual(self.summarize(), f'summary from {MODEL_GEMINI}')
+        self.assertEqual(StubProvider.hits[MODEL_BIS], 1)  # a fast primary needs no hedge
+
+    def test_breaker_skips_a_failing_provider(self):
+        StubProvider.behaviour = {MODEL_GEMINI: (0, 503)}
+        for _ in range(3):
+            self.assertEqual(self.summarize(), f'summary from {MODEL_BIS}')
+
+        self.assertEqual(StubProvider.hits, {MODEL_GEMINI: 2, MODEL_BIS: 3})
+        stats = self.client.stats()
+        self.assertEqual((stats[MODEL_GEMINI]['circuit'], stats[MODEL_GEMINI]['errors']), ('open', 2))
+        self.assertEqual((stats[MODEL_BIS]['calls'], stats[MODEL_BIS]['error_rate']), (3, 0.0))
+
+    def test_stream_relays_pieces_and_falls_back_before_the_first(self):
+        stream = self.client.stream('Summarize: text', 50, 'test-key')
+        self.assertEqual(list(stream), ['summary ', 'from ', MODEL_GEMINI])
+
+        StubProvider.behaviour = {MODEL_GEMINI: (0, 503)}
+        stream = self.client.stream('Summarize: text', 50, 'test-key')
+        self.assertEqual(list(stream), [f'summary from {MODEL_BIS}'])  # no streaming endpoint: one piece
+        self.assertEqual(self.client.stats()[MODEL_GEMINI]['errors'], 1)
+
+    def test_half_open_fallback_keeps_its_trial_when_not_called(self):
+        fallback = self.client.health[MODEL_BIS]
+        fallback.consecutive_failures, fallback.open_until = 2, 0.0  # open, cooldown over
+        self.assertEqual(self.summarize(), f'summary from {MODEL_GEMINI}')
+        self.assertNotIn(MODEL_BIS, StubProvider.hits)
+        self.assertTrue(fallback.allow())  # the trial call is still available
+
+    def test_all_providers_failing_raises(self):
+        StubProvider.behaviour = {MODEL_GEMINI: (0, 500), MODEL_BIS: (0, 429)}
+        with self.assertRaisesMessage(LLMError, 'HTTP 429'):
+            self.summarize()
+        self.assertRaises(LLMError, self.summarize)
+        with self.assertRaisesMessage(LLMError, 'circuit open'):
+            self.summarize()
+        self.assertEqual(StubProvider.hits, {MODEL_GEMINI: 2, MODEL_BIS: 2})
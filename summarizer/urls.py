@@ -1,6 +1,9 @@
 from django.urls import path
-from .views import summarize_view
+from .views import cache_stats_view, llm_stats_view, summarize_stream_view, summarize_view
 
 urlpatterns = [
     path('summarize/', summarize_view),
+    path('summarize/stream/', summarize_stream_view),
+    path('cache-stats/', cache_stats_view),
+    path('llm-stats/', llm_stats_view),
 ]
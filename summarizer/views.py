@@ -1,19 +1,25 @@
 # summarizer/views.py
+import json
 import os
 import time
 import logging
-import math
-from collections import Counter, defaultdict
+from contextlib import suppress
+
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 
+from . import cache as summary_cache
+from . import extractive, llm, mapreduce
 from .models import Summarization
-import requests
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +28,7 @@ API_KEY = getattr(settings, "GOOGLE_GENERATIVE_API_KEY", None)
 SAVE_TO_DB = getattr(settings, "SUMMARIZER_SAVE_TO_DB", True)
 RATE_LIMIT_PER_HOUR = getattr(settings, "RATE_LIMIT_PER_HOUR", 5)
 
-# Models to try (adjust to your account)
-MODEL_GEMINI = "gemini-2.5-flash"      # change to available model
-MODEL_BIS = "text-bison-001"    # fallback
+MODEL_CHAIN = f"{llm.MODEL_GEMINI}|{llm.MODEL_BIS}"  # part of the summary cache key
 
 
 def get_client_ip(request):
@@ -55,126 +59,52 @@ def check_rate_limit(ip: str):
     return True, RATE_LIMIT_PER_HOUR - (count + 1), window - elapsed
 
 
-def _extract_text_from_gemini_response(resp_json):
-    # Try common shapes; return first found string or "".
-    if not resp_json:
-        return ""
-    try:
-        if isinstance(resp_json, dict):
-            # candidate patterns
-            if "candidates" in resp_json and isinstance(resp_json["candidates"], list):
-                first = resp_json["candidates"][0]
-                for k in ("output", "content", "text"):
-                    if k in first:
-                        v = first[k]
-                        if isinstance(v, str):
-                            return v
-                        if isinstance(v, dict) and "text" in v:
-                            return v["text"]
-                        if isinstance(v, list) and len(v) and isinstance(v[0], dict):
-                            for p in v:
-                                if "text" in p:
-                                    return p["text"]
-            if "outputs" in resp_json and isinstance(resp_json["outputs"], list):
-                out0 = resp_json["outputs"][0]
-                if isinstance(out0, dict):
-                    if "output" in out0 and isinstance(out0["output"], str):
-                        return out0["output"]
-                    content = out0.get("content")
-                    if isinstance(content, list):
-                        for c in content:
-                            if isinstance(c, dict) and "text" in c:
-                                return c["text"]
-            for key in ("summary", "result"):
-                if key in resp_json and isinstance(resp_json[key], str):
-                    return resp_json[key]
-        return ""
-    except Exception:
-        logger.exception("extract failed")
-        return ""
+def rate_limit_remaining(ip: str):
+    """Requests left this hour, without charging one."""
+    entry = cache.get(f"summarizer:rate:{ip}") if ip else None
+    if not entry or int(time.time()) - entry[1] >= 3600:
+        return RATE_LIMIT_PER_HOUR
+    return max(0, RATE_LIMIT_PER_HOUR - entry[0])
 
 
-def call_gemini_summarize(text: str, tokens: int):
+def call_gemini_summarize(text: str, tokens: int, instruction: str = None):
     """
-    Try Gemini generateContent, then text-bison generateText.
+    Gemini first, text-bison hedged behind it (see summarizer/llm.py).
     Raise exceptions with useful messages on failure.
     """
+    return llm.default_client().summarize(summary_prompt(text, tokens, instruction), tokens, API_KEY)
+
+
+def stream_gemini_summarize(text: str, tokens: int):
+    """Iterator of summary pieces as the model generates them (see LLMClient.stream)."""
+    return llm.default_client().stream(summary_prompt(text, tokens), tokens, API_KEY)
+
+
+def summary_prompt(text, tokens, instruction=None):
     if not API_KEY:
         raise RuntimeError("GOOGLE_GENERATIVE_API_KEY not set")
+    instruction = instruction or f"Summarize the following text concisely in about {tokens} tokens"
+    return f"{instruction}:\n\n{text}"
 
-    prompt = f"Summarize the following text concisely in about {tokens} tokens:\n\n{text}"
 
-    # 1) Gemini-style (v1beta) generateContent
-    try:
-        gemini_url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_GEMINI}:generateContent?key={API_KEY}"
-        body = {
-            "contents": [
-                {"role": "user", "parts": [{"text": prompt}]}
-            ],
-            "maxOutputTokens": tokens
-        }
-        resp = requests.post(gemini_url, json=body, timeout=60)
-        if resp.status_code == 200:
-            data = resp.json()
-            s = _extract_text_from_gemini_response(data)
-            if s:
-                return s.strip()
-        # capture response for debug
-        logger.warning("Gemini call status=%s body=%s", resp.status_code, resp.text)
-    except Exception as e:
-        logger.exception("Gemini request failed: %s", e)
-
-    # 2) text-bison fallback (v1beta2)
+def save_summary(email, prepped_text, summary_text, tokens, ip, digest):
+    """True if the summary was saved (only when SUMMARIZER_SAVE_TO_DB is on)."""
+    if not SAVE_TO_DB:
+        return False
     try:
-        bis_url = f"https://generativelanguage.googleapis.com/v1beta2/models/{MODEL_BIS}:generateText?key={API_KEY}"
-        body = {"prompt": {"text": prompt}, "maxOutputTokens": tokens}
-        resp = requests.post(bis_url, json=body, timeout=60)
-        if resp.status_code == 200:
-            data = resp.json()
-            s = _extract_text_from_gemini_response(data)
-            if s:
-                return s.strip()
-        logger.warning("text-bison call status=%s body=%s", resp.status_code, resp.text)
-    except Exception as e:
-        logger.exception("text-bison request failed: %s", e)
-
-    raise RuntimeError("LLM calls failed or returned empty. Check API key, model names and logs.")
-
-
-# Simple extractive fallback summarizer (keeps API independent behavior).
-# Not as good as LLM but ensures endpoint works when API fails.
+        Summarization.objects.create(email=email, input_text=prepped_text,
+                                     summary_text=summary_text, tokens_requested=tokens, client_ip=ip,
+                                     content_hash=digest)
+        return True
+    except Exception:
+        logger.exception("Failed to save summarization to DB")
+        return False
+
+
+# Extractive fallback: TextRank over TF-IDF sentence vectors (summarizer/extractive.py).
+# It carries all traffic while the LLM is down, so it has to stay cheap on large inputs.
 def fallback_extractive_summary(text: str, max_sentences: int = 3):
-    # Split into sentences naively (periods). For better results use nltk/punkt.
-    sentences = [s.strip() for s in text.replace("\n", " ").split(".") if s.strip()]
-    if not sentences:
-        return ""
-    # Build word frequencies (simple)
-    words = []
-    for s in sentences:
-        for w in s.lower().split():
-            w = "".join(ch for ch in w if ch.isalnum())
-            if w:
-                words.append(w)
-    freqs = Counter(words)
-    # Score sentences by sum of word frequencies (TF approximation)
-    sent_scores = []
-    for i, s in enumerate(sentences):
-        score = 0
-        for w in s.lower().split():
-            w = "".join(ch for ch in w if ch.isalnum())
-            if w:
-                score += freqs.get(w, 0)
-        # normalize by length
-        if len(s.split()) > 0:
-            score = score / math.log(len(s.split()) + 1)
-        sent_scores.append((score, i, s))
-    # pick top N sentences
-    sent_scores.sort(reverse=True)
-    top = sorted(sent_scores[:max_sentences], key=lambda x: x[1])  # keep original order
-    summary = ". ".join([s for (_, _, s) in top])
-    if summary and not summary.endswith("."):
-        summary = summary + "."
-    return summary
+    return extractive.summarize(text, max_sentences)
 
 
 @csrf_exempt
@@ -192,42 +122,185 @@ def summarize_view(request):
         return Response({"detail": "Text is required"}, status=status.HTTP_400_BAD_REQUEST)
 
     ip = get_client_ip(request)
-    allowed, remaining, reset = check_rate_limit(ip)
-    if not allowed:
-        return Response({"detail": "Rate limit exceeded", "remaining": remaining, "reset_seconds": reset},
-                        status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-    prepped_text = " ".join(text.split())
-    summary_text = None
-    used_gemini = False
+    prepped_text = summary_cache.normalize(text)
+    digest = summary_cache.content_hash(prepped_text, tokens, MODEL_CHAIN)
+    summary_text, cache_status = summary_cache.lookup(digest)
+    summary_cache.count(cache_status)
+    used_gemini = summary_text is not None
     error_details = None
 
+    # cache hits are free: no LLM call and no rate-limit charge
+    if used_gemini:
+        remaining = rate_limit_remaining(ip)
+    else:
+        allowed, remaining, reset = check_rate_limit(ip)
+        if not allowed:
+            return Response({"detail": "Rate limit exceeded", "remaining": remaining, "reset_seconds": reset},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS)
+
     # Try external LLM first; if it fails, use fallback
-    try:
-        summary_text = call_gemini_summarize(prepped_text, tokens)
-        used_gemini = True
-    except Exception as e:
-        logger.exception("LLM summarization failed, falling back: %s", e)
-        error_details = str(e)
-        # Use extractive fallback
-        summary_text = fallback_extractive_summary(prepped_text, max_sentences= max(1, min(5, tokens // 50)))
-
-    saved = False
-    if SAVE_TO_DB:
+    long_document = None
+    if summary_text is None:
         try:
-            Summarization.objects.create(email=email, input_text=prepped_text,
-                                         summary_text=summary_text, tokens_requested=tokens, client_ip=ip)
-            saved = True
-        except Exception:
-            logger.exception("Failed to save summarization to DB")
+            if mapreduce.is_long(prepped_text):
+                summary_text, long_document = mapreduce.summarize_long(
+                    prepped_text, tokens, call_gemini_summarize, fallback_extractive_summary,
+                )
+            else:
+                summary_text = call_gemini_summarize(prepped_text, tokens)
+            used_gemini = True
+            if mapreduce.is_degraded(long_document):
+                digest = ""  # partly extractive: neither cached nor findable by hash
+            else:
+                summary_cache.store(digest, summary_text)
+        except Exception as e:
+            logger.exception("LLM summarization failed, falling back: %s", e)
+            error_details = str(e)
+            # Use extractive fallback
+            summary_text = fallback_extractive_summary(prepped_text, max_sentences= max(1, min(5, tokens // 50)))
+
+    saved = save_summary(email, prepped_text, summary_text, tokens, ip, digest if used_gemini else "")
 
     response_payload = {
         "summary": summary_text,
         "saved": saved,
         "remaining": remaining,
         "used_gemini": used_gemini,
+        "cache": cache_status,
     }
+    if long_document:
+        response_payload["long_document"] = long_document
     if error_details and not used_gemini:
         response_payload["error"] = error_details
 
     return Response(response_payload, status=200)
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def relay(pieces):
+    """Async iteration over a blocking iterator; each next() runs on an executor thread."""
+    next_piece = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (piece := await next_piece(pieces, None)) is not None:
+            yield piece
+    finally:
+        with suppress(ValueError):  # still blocked in a read: it is closed once that returns
+            pieces.close()
+
+
+async def summary_events(email, prepped_text, tokens, ip, digest, summary_text, cache_status, remaining):
+    """SSE body of summarize_stream_view: meta, then delta pieces, then done."""
+    yield sse_event("meta", {"cache": cache_status, "remaining": remaining})
+    used_gemini = summary_text is not None
+    error_details = long_document = None
+    if used_gemini:
+        yield sse_event("delta", {"text": summary_text})
+    else:
+        try:
+            if mapreduce.is_long(prepped_text):
+                # the chunks are summarized concurrently; only the combined summary is relayed
+                summary_text, long_document = await sync_to_async(mapreduce.summarize_long, thread_sensitive=False)(
+                    prepped_text, tokens, call_gemini_summarize, fallback_extractive_summary,
+                )
+                yield sse_event("delta", {"text": summary_text})
+            else:
+                pieces = []
+                async for piece in relay(stream_gemini_summarize(prepped_text, tokens)):
+                    pieces.append(piece)
+                    yield sse_event("delta", {"text": piece})
+                summary_text = "".join(pieces).strip()
+            used_gemini = True
+            if mapreduce.is_degraded(long_document):
+                digest = ""  # partly extractive: neither cached nor findable by hash
+            else:
+                await sync_to_async(summary_cache.store)(digest, summary_text)
+        except Exception as e:
+            logger.exception("LLM summarization failed, falling back: %s", e)
+            error_details = str(e)
+            summary_text = await sync_to_async(fallback_extractive_summary, thread_sensitive=False)(
+                prepped_text, max_sentences=max(1, min(5, tokens // 50)),
+            )
+
+    saved = await sync_to_async(save_summary)(email, prepped_text, summary_text, tokens, ip,
+                                              digest if used_gemini else "")
+    payload = {
+        "summary": summary_text,
+        "saved": saved,
+        "remaining": remaining,
+        "used_gemini": used_gemini,
+        "cache": cache_status,
+    }
+    if long_document:
+        payload["long_document"] = long_document
+    if error_details and not used_gemini:
+        payload["error"] = error_details
+    yield sse_event("done", payload)
+
+
+@csrf_exempt
+@require_POST
+async def summarize_stream_view(request):
+    """
+    Streaming variant of summarize_view: the summary is sent as Server-Sent
+    Events while the LLM writes it ("meta", "delta" pieces, then "done" with
+    the same payload as summarize_view; its summary is authoritative, e.g.
+    after a fallback). Only served under backend.asgi, where waiting on the
+    LLM holds no request thread; under WSGI Django would buffer the whole
+    body, so it answers 501 and clients use summarize/ instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"detail": "Streaming needs the ASGI server; use summarize/"},
+                            status=status.HTTP_501_NOT_IMPLEMENTED)
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({"detail": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST)
+    email = data.get("email")
+    text = data.get("text")
+    try:
+        tokens = int(data.get("tokens", 100))
+    except Exception:
+        tokens = 100
+
+    if not isinstance(text, str) or not text.strip():
+        return JsonResponse({"detail": "Text is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    ip = get_client_ip(request)
+    prepped_text = summary_cache.normalize(text)
+    digest = summary_cache.content_hash(prepped_text, tokens, MODEL_CHAIN)
+    summary_text, cache_status = await sync_to_async(summary_cache.lookup)(digest)
+    await sync_to_async(summary_cache.count)(cache_status)
+    if summary_text is not None:
+        remaining = await sync_to_async(rate_limit_remaining)(ip)
+    else:
+        allowed, remaining, reset = await sync_to_async(check_rate_limit)(ip)
+        if not allowed:
+            return JsonResponse({"detail": "Rate limit exceeded", "remaining": remaining, "reset_seconds": reset},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+    response = StreamingHttpResponse(
+        summary_events(email, prepped_text, tokens, ip, digest, summary_text, cache_status, remaining),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx: pass events through unbuffered
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def cache_stats_view(request):
+    """Summary cache hit/miss counters since the cache was last cleared."""
+    return Response(summary_cache.stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def llm_stats_view(request):
+    """Per-model LLM latency, errors and breaker state, for the worker process that answers."""
+    return Response(llm.default_client().stats())